@@ -0,0 +1,125 @@
+import sqlite3
+import time
+import numpy as np # type: ignore
+import sighting_frames
+
+#Queryable history of every sighting in an SQLite database (WAL mode, so readers don't block the writer).
+#Sightings are buffered and written in one transaction per batch; every batch also updates
+#   devices: one row per address with its name, first/last seen and sighting count
+#   hourly:  per address and hour, count and min/max/sum of RSSI
+#so "devices seen in the last 5 minutes" and hourly RSSI stats never scan the sightings table, and
+#"sightings of X between 10:00 and 11:00" is a range scan of the (address, time) index.
+#   archive = Archive("sightings.db")
+#   archive.add(t, addresses, rssis, names, observer)
+#   times, rssi = archive.sightings(address, start, end)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sightings (time REAL NOT NULL, address INTEGER NOT NULL, rssi INTEGER NOT NULL, observer INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS sightings_address_time ON sightings (address, time);
+CREATE TABLE IF NOT EXISTS devices (address INTEGER PRIMARY KEY, name TEXT NOT NULL, first_seen REAL NOT NULL,
+                                    last_seen REAL NOT NULL, count INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS devices_last_seen ON devices (last_seen);
+CREATE TABLE IF NOT EXISTS hourly (address INTEGER NOT NULL, hour INTEGER NOT NULL, count INTEGER NOT NULL,
+                                   rssi_min INTEGER NOT NULL, rssi_max INTEGER NOT NULL, rssi_sum INTEGER NOT NULL,
+                                   PRIMARY KEY (address, hour)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS hourly_hour ON hourly (hour);
+"""
+
+class Archive:
+    def __init__(self, path, batch_size=5000, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size #sightings buffered before a transaction is forced
+        self.flush_interval = flush_interval #seconds a sighting may wait in the buffer
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL") #WAL keeps the database consistent, a crash may lose the last batch
+        self.db.executescript(SCHEMA)
+        self._pending = [] #(times, addresses, rssis, names, observer) per add()
+        self._count = 0
+        self._last_flush = time.monotonic()
+
+    def add(self, t, addresses, rssis, names, observer=0): #names per sample; t a time or one per sample
+        addresses = np.array(addresses, dtype=np.uint64) #a copy, buffered past the caller's use of its arrays
+        if len(addresses) == 0:
+            return
+        times = np.broadcast_to(np.asarray(t, dtype=np.float64), addresses.shape)
+        self._pending.append((times, addresses, np.asarray(rssis, dtype=np.int64), names, observer))
+        self._count += len(addresses)
+        if self._count >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def add_frame(self, t, frame, observer=0):
+        self.add(t, frame.sightings["address"], frame.sightings["rssi"], sighting_frames.frame_names(frame), observer)
+
+    def flush(self): #write everything buffered in one transaction
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        pending, self._pending, self._count = self._pending, [], 0
+        times = np.concatenate([p[0] for p in pending])
+        addresses = np.concatenate([p[1] for p in pending])
+        rssis = np.concatenate([p[2] for p in pending])
+        observers = np.concatenate([np.full(len(p[1]), p[4], dtype=np.int64) for p in pending])
+        names = dict() #address -> a name seen in this batch
+        for p in pending:
+            for address, name in zip(p[1].tolist(), p[3]):
+                if name != "None":
+                    names[address] = name
+        with self.db: #one transaction
+            self.db.executemany("INSERT INTO sightings VALUES (?, ?, ?, ?)",
+                                zip(times.tolist(), addresses.tolist(), rssis.tolist(), observers.tolist()))
+            self._roll_up(times, addresses, rssis, names)
+
+    def _roll_up(self, times, addresses, rssis, names): #fold the batch into devices and hourly, grouped with NumPy first
+        unique, inverse, counts = np.unique(addresses, return_inverse=True, return_counts=True)
+        first = np.full(len(unique), np.inf)
+        last = np.full(len(unique), -np.inf)
+        np.minimum.at(first, inverse, times)
+        np.maximum.at(last, inverse, times)
+        self.db.executemany(
+            "INSERT INTO devices VALUES (?, ?, ?, ?, ?) ON CONFLICT (address) DO UPDATE SET "
+            "name = CASE WHEN excluded.name != 'None' THEN excluded.name ELSE name END, "
+            "first_seen = min(first_seen, excluded.first_seen), last_seen = max(last_seen, excluded.last_seen), "
+            "count = count + excluded.count",
+            ((a, names.get(a, "None"), f, l, n) for a, f, l, n in zip(unique.tolist(), first.tolist(), last.tolist(), counts.tolist())))
+        hours = (times // 3600).astype(np.int64)
+        keys = np.stack([addresses.astype(np.int64), hours], axis=1)
+        groups, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        lows = np.full(len(groups), 127, dtype=np.int64)
+        highs = np.full(len(groups), -128, dtype=np.int64)
+        np.minimum.at(lows, inverse, rssis)
+        np.maximum.at(highs, inverse, rssis)
+        sums = np.bincount(inverse, weights=rssis, minlength=len(groups)).astype(np.int64)
+        self.db.executemany(
+            "INSERT INTO hourly VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (address, hour) DO UPDATE SET "
+            "count = count + excluded.count, rssi_min = min(rssi_min, excluded.rssi_min), "
+            "rssi_max = max(rssi_max, excluded.rssi_max), rssi_sum = rssi_sum + excluded.rssi_sum",
+            zip(groups[:, 0].tolist(), groups[:, 1].tolist(), counts.tolist(), lows.tolist(), highs.tolist(), sums.tolist()))
+
+    def sightings(self, address, start=None, end=None, limit=None): #(times, rssi) of one device, oldest first; the newest limit if given
+        rows = self.db.execute(
+            "SELECT time, rssi FROM sightings WHERE address = ? AND time >= ? AND time <= ? ORDER BY time DESC" +
+            ("" if limit is None else " LIMIT ?"),
+            (address, -np.inf if start is None else start, np.inf if end is None else end) + (() if limit is None else (limit,))).fetchall()
+        data = np.array(rows[::-1], dtype=np.float64).reshape(-1, 2)
+        return data[:, 0], data[:, 1].astype(np.int8)
+
+    def recent_devices(self, seconds, now=None): #[(address, name, last seen, sightings)] seen in the last seconds, newest first
+        now = time.time() if now is None else now
+        return self.db.execute("SELECT address, name, last_seen, count FROM devices WHERE last_seen >= ? ORDER BY last_seen DESC",
+                               (now - seconds,)).fetchall()
+
+    def device(self, address): #(name, first seen, last seen, sightings) or None
+        return self.db.execute("SELECT name, first_seen, last_seen, count FROM devices WHERE address = ?", (address,)).fetchone()
+
+    def hourly(self, address=None, start=None, end=None): #[(address, hour start time, count, min, max, mean RSSI)]
+        query = "SELECT address, hour * 3600, count, rssi_min, rssi_max, CAST(rssi_sum AS REAL) / count FROM hourly WHERE hour >= ? AND hour <= ?"
+        args = (-(1 << 62) if start is None else int(start // 3600), 1 << 62 if end is None else int(end // 3600))
+        if address is not None:
+            query += " AND address = ?"
+            args += (address,)
+        return self.db.execute(query + " ORDER BY address, hour", args).fetchall()
+
+    def close(self):
+        self.flush()
+        self.db.close()
@@ -0,0 +1,181 @@
+#asyncio front end for reciever_modular: scanning, connecting and notifications as awaitables and
+#async iterators, so many observers and the processing pipeline can share one event loop.
+#simplepyble calls back on its own threads; every callback is handed to the loop with call_soon_threadsafe
+#and buffered in a bounded asyncio.Queue, so a slow consumer gets backpressure instead of unbounded memory.
+#   async for t, data in async_receiver.notifications(peripheral):
+#       ...
+import asyncio
+import time
+import reciever_modular
+import sighting_frames
+
+#Thread-to-loop bridge with a bounded buffer. overflow="drop_oldest" never blocks the BLE thread and counts
+#what it had to drop; overflow="block" makes the BLE thread wait for room (true backpressure on the link).
+class _Bridge:
+    def __init__(self, loop, maxsize, overflow):
+        if overflow not in ("drop_oldest", "block"):
+            raise ValueError(f"Unknown overflow policy {overflow}")
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.overflow = overflow
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, item): #called from any thread
+        if self.closed:
+            return
+        if self.overflow == "block":
+            asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+        else:
+            self.loop.call_soon_threadsafe(self._put, item)
+
+    def _put(self, item):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+    def close(self): #wake the consumer up with the end marker
+        self.closed = True
+        self.loop.call_soon_threadsafe(self._put, _END)
+
+_END = object()
+
+
+async def _run(function, *args): #blocking simplepyble call on the default executor
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+async def get_adapters():
+    return await _run(reciever_modular.get_available_adapters)
+
+async def connect(peripheral):
+    await _run(peripheral.connect)
+    return peripheral
+
+async def disconnect(peripheral):
+    await _run(peripheral.disconnect)
+
+
+#async iterator over peripherals as the scan finds them, stops after timeout seconds (None scans until closed)
+class Scan:
+    def __init__(self, adapter, timeout=5.0, maxsize=256):
+        self.adapter = adapter
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._bridge = None
+        self._timer = None
+
+    def __aiter__(self):
+        return self
+
+    async def _start(self):
+        loop = asyncio.get_running_loop()
+        self._bridge = _Bridge(loop, self.maxsize, "drop_oldest")
+        self.adapter.set_callback_on_scan_found(self._bridge.push)
+        await _run(self.adapter.scan_start)
+        if self.timeout is not None:
+            self._timer = loop.call_later(self.timeout, lambda: loop.create_task(self.aclose()))
+
+    async def __anext__(self):
+        if self._bridge is None:
+            await self._start()
+        item = await self._bridge.queue.get()
+        if item is _END:
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self):
+        if self._bridge is None or self._bridge.closed:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self.adapter.set_callback_on_scan_found(lambda peripheral: None)
+        self._bridge.close()
+        await _run(self.adapter.scan_stop)
+
+def scan(adapter, timeout=5.0):
+    return Scan(adapter, timeout)
+
+
+#async iterator of (receive time, raw bytes) notifications of one characteristic
+class Notifications:
+    def __init__(self, peripheral, service_uuid, characteristic_uuid, maxsize=1024, overflow="drop_oldest"):
+        self.peripheral = peripheral
+        self.service_uuid = service_uuid
+        self.characteristic_uuid = characteristic_uuid
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._bridge = None
+
+    @property
+    def dropped(self): #notifications discarded because the consumer fell behind
+        return 0 if self._bridge is None else self._bridge.dropped
+
+    def __aiter__(self):
+        return self
+
+    async def _start(self):
+        self._bridge = _Bridge(asyncio.get_running_loop(), self.maxsize, self.overflow)
+        bridge = self._bridge
+        await _run(reciever_modular.subscribe, self.peripheral, self.service_uuid, self.characteristic_uuid,
+                   lambda data: bridge.push((time.time(), data)))
+
+    async def __anext__(self):
+        if self._bridge is None:
+            await self._start()
+        item = await self._bridge.queue.get()
+        if item is _END:
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self):
+        if self._bridge is None or self._bridge.closed:
+            return
+        self._bridge.close() #stop queueing before unsubscribing, late callbacks are ignored
+        try:
+            await _run(self.peripheral.unsubscribe, self.service_uuid, self.characteristic_uuid)
+        except RuntimeError:
+            pass #already disconnected
+
+def notifications(peripheral, service_uuid=reciever_modular.OBSERVER_SERVICE_UUID,
+                  characteristic_uuid=reciever_modular.OBSERVER_CHARACTERISTIC_UUID, maxsize=1024, overflow="drop_oldest"):
+    return Notifications(peripheral, service_uuid, characteristic_uuid, maxsize, overflow)
+
+async def sightings(peripheral, maxsize=1024): #decoded frames as (receive time, frame)
+    stream = notifications(peripheral, maxsize=maxsize)
+    try:
+        async for t, data in stream:
+            try:
+                yield t, sighting_frames.decode_frame(data)
+            except ValueError:
+                continue
+    finally:
+        await stream.aclose()
+
+
+async def observe(duration=10.0, name=reciever_modular.OBSERVER_NAME): #connect to every observer found and count sightings
+    adapters = await get_adapters()
+    if len(adapters) == 0:
+        raise RuntimeError("No Bluetooth adapter available.")
+    observers = []
+    async for peripheral in scan(adapters[0], timeout=5.0):
+        if peripheral.identifier() == name:
+            observers.append(peripheral)
+    await asyncio.gather(*(connect(p) for p in observers))
+    counts = {p.address(): 0 for p in observers}
+
+    async def count(peripheral):
+        async for t, frame in sightings(peripheral):
+            counts[peripheral.address()] += len(frame.sightings)
+
+    tasks = [asyncio.create_task(count(p)) for p in observers]
+    await asyncio.sleep(duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.gather(*(disconnect(p) for p in observers), return_exceptions=True)
+    return counts
+
+if __name__ == "__main__":
+    for address, count in asyncio.run(observe()).items():
+        print(f"{address}: {count} sightings")
@@ -0,0 +1,178 @@
+#End-to-end benchmark of the desktop pipeline: frame decoding, device store updates, log insertion and
+#graph updates, fed with synthetic notification streams at increasing rates and device counts.
+#Runs headless on the Agg backend:
+#   python benchmark.py
+#   python benchmark.py --rates 1000 10000 --devices 100 1000 --seconds 5 --json bench.json
+import argparse
+import json
+import os
+import time
+import numpy as np # type: ignore
+import matplotlib # type: ignore
+matplotlib.use("Agg")
+from matplotlib.figure import Figure # type: ignore
+from matplotlib.backends.backend_agg import FigureCanvasAgg # type: ignore
+import device_store
+import log_view
+import rssi_filter
+import rssi_graph
+import sighting_frames
+
+FPS = 20 #frames per second of the GUI render loop being modelled
+STAGES = ["decode", "filter", "store", "log", "render"]
+
+#Same insert/delete/see calls LogView makes on the ScrolledText, kept in memory. A real Tk Text
+#is used instead when a display is available (see make_text); run_case destroys its root when done.
+class MemoryText:
+    def __init__(self):
+        self.lines = [""]
+
+    def insert(self, index, text):
+        parts = text.split("\n")
+        self.lines[-1] += parts[0]
+        self.lines.extend(parts[1:])
+
+    def delete(self, start, end):
+        del self.lines[:int(end.split(".")[0]) - 1]
+
+    def see(self, index):
+        pass
+
+def make_text():
+    if os.environ.get("DISPLAY"):
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+        return tk.Text(root)
+    return MemoryText()
+
+def rss_bytes(): #current resident memory, peak on platforms without /proc, 0 where neither is available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        pass
+    try:
+        import resource #Unix only
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def synthetic_frames(rate, devices, seconds, payload_max, seed=0): #list of (arrival time, frame bytes)
+    rng = np.random.default_rng(seed)
+    addresses = rng.integers(0, 1 << 48, size=devices, dtype=np.uint64)
+    base = rng.uniform(-95, -40, size=devices)
+    names = [f"dev-{i}" if i % 3 == 0 else "None" for i in range(devices)]
+    frames = []
+    per_tick = rate / FPS
+    for tick in range(int(seconds * FPS)):
+        n = int(per_tick * (tick + 1)) - int(per_tick * tick)
+        picks = rng.integers(0, devices, size=n)
+        rssi = np.clip(base[picks] + rng.normal(0, 4, size=n), -127, 0).astype(np.int8)
+        for frame in sighting_frames.encode_frames(addresses[picks], rssi, [names[i] for i in picks.tolist()], payload_max):
+            frames.append((tick / FPS, frame))
+    return frames
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+    return {"p50": p50, "p95": p95, "p99": p99, "max": max(samples) * 1000}
+
+def run_case(rate, devices, seconds, payload_max, capacity, summary, smoothing=None):
+    frames = synthetic_frames(rate, devices, seconds, payload_max)
+    store = device_store.DeviceStore(capacity=capacity, max_devices=max(devices, 1), smoothed=smoothing is not None)
+    smoother = rssi_filter.RssiFilter(smoothing) if smoothing else None
+    text = make_text()
+    log = log_view.LogView(text)
+    log.summary = summary
+    fig = Figure(figsize=(10, 4), dpi=100)
+    ax = fig.add_subplot()
+    graph = rssi_graph.RssiGraph(FigureCanvasAgg(fig), ax)
+    graph.reset_limits()
+    timings = {stage: [] for stage in STAGES}
+    sightings = 0
+    rss_start = rss_bytes()
+    busy = 0.0
+    graphed = None
+    i = 0
+    for tick in range(int(seconds * FPS)): #one GUI frame: everything that arrived in it, then one render
+        frame_start = time.perf_counter()
+        while i < len(frames) and frames[i][0] <= tick / FPS:
+            t = time.perf_counter()
+            frame = sighting_frames.decode_frame(frames[i][1])
+            names = sighting_frames.frame_names(frame)
+            timings["decode"].append(time.perf_counter() - t)
+            smoothed = None
+            if smoother is not None:
+                t = time.perf_counter()
+                smoothed = smoother.update(frame.sightings["address"], frame.sightings["rssi"], tick / FPS)[0]
+                timings["filter"].append(time.perf_counter() - t)
+            t = time.perf_counter()
+            store.add_batch(frame.sightings["address"], names, frame.sightings["rssi"], smoothed=smoothed)
+            timings["store"].append(time.perf_counter() - t)
+            t = time.perf_counter()
+            log.add_sightings(names, frame.sightings["address"].tolist(), frame.sightings["rssi"].tolist())
+            timings["log"].append(time.perf_counter() - t)
+            sightings += len(frame.sightings)
+            if graphed is None:
+                graphed = int(frame.sightings["address"][0])
+            i += 1
+        t = time.perf_counter()
+        log.flush() #the one insert per frame into the widget
+        timings["log"].append(time.perf_counter() - t)
+        if graphed is not None:
+            t = time.perf_counter()
+            times, rssi = store.series(graphed)
+            graph.plot(graphed, rssi, x=times - times[0], version=store.version(graphed)) #time axis like the app
+            graph.draw()
+            timings["render"].append(time.perf_counter() - t)
+        busy += time.perf_counter() - frame_start
+    result = {
+        "rate": rate,
+        "devices": devices,
+        "sightings": sightings,
+        "notifications": len(frames),
+        "throughput": sightings / busy if busy > 0 else 0.0, #sightings per second of processing time
+        "load": busy / seconds, #fraction of wall time the pipeline would keep one core busy
+        "latency_ms": {stage: percentiles(samples) for stage, samples in timings.items() if samples}, #stages that ran
+        "memory_growth_mb": (rss_bytes() - rss_start) / 1e6,
+    }
+    if not isinstance(text, MemoryText): #each case gets its own Tk root, left over ones would count in the next case's memory
+        text.master.destroy()
+    return result
+
+def print_case(result):
+    print(f"rate {result['rate']:>8}/s  devices {result['devices']:>6}  sightings {result['sightings']:>8}  "
+          f"throughput {result['throughput']:>10.0f}/s  load {result['load'] * 100:6.1f}%  "
+          f"memory +{result['memory_growth_mb']:.1f} MB")
+    for stage, p in result["latency_ms"].items():
+        print(f"    {stage:<7} p50 {p['p50']:8.3f} ms  p95 {p['p95']:8.3f} ms  p99 {p['p99']:8.3f} ms  max {p['max']:8.3f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the decode/store/log/render pipeline headless.")
+    parser.add_argument("--rates", type=int, nargs="+", default=[500, 2000, 10000, 50000], help="sightings per second")
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 100, 1000], help="distinct devices")
+    parser.add_argument("--seconds", type=float, default=3.0, help="simulated seconds per case")
+    parser.add_argument("--payload", type=int, default=244, help="notification payload size in bytes")
+    parser.add_argument("--capacity", type=int, default=10_000, help="samples kept per device")
+    parser.add_argument("--summary", action="store_true", help="benchmark the log in summary mode")
+    parser.add_argument("--smoothing", choices=rssi_filter.METHODS, help="also run the RSSI filter stage")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for devices in args.devices:
+        for rate in args.rates:
+            result = run_case(rate, devices, args.seconds, args.payload, args.capacity, args.summary, args.smoothing)
+            print_case(result)
+            results.append(result)
+            if result["load"] > 1.0:
+                print(f"    saturated at {rate}/s with {devices} devices, skipping higher rates")
+                break
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
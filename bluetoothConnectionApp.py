@@ -1,306 +1,795 @@
+import time         #used for adding delays during serial read
+STARTED = time.perf_counter() #for the startup report, before any of the imports below
+import sys
+import argparse
 import reciever_modular         # Bluetooth functions # type: ignore
-import serial                   # type: ignore #serial library to handle comm with the Pico
-import serial.tools.list_ports  # type: ignore #tool for listing available serial ports
+import sighting_frames          # decoder for the Pico's sighting frames
+import device_store             # bounded per-device RSSI history
 import tkinter as tk            # GUI library
-from tkinter import ttk, messagebox, scrolledtext  #more Tkinter widgets for better UI
+from tkinter import ttk, messagebox, scrolledtext, filedialog, simpledialog  #more Tkinter widgets for better UI
 import threading    #Allows concurrent execution to read serial data without freezing the GUI
-import time         #used for adding delays during serial read
-from matplotlib.figure import Figure # type: ignore
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg # type: ignore
-from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk # type: ignore
 import numpy as np # type: ignore
-
-#Global variables
-ser = None
-adapter = None #selected adapter
-peripherals = [] #found peripherals
-peripheral = None #selected peripheral
-service_characteristics = [] #available service/characteristic pairs from peripheral
-service = None #selected service-characteristic pair
-found_addresses = dict() #collection of our addresses stored as a dict
-results = [] #collection of address/name strings to display
-displayed = False #display check
-
-#GUI Setup
-#creates the main app window, sets the window title, and window size
-root = tk.Tk()                      
-root.title("Bluetooth Device Scanner")  
-root.geometry("800x600")  
-
-#UI Elements
-#Creates frame to hold UI 
-main_frame = ttk.Frame(root, padding=10)
-main_frame.pack(fill=tk.BOTH, expand=True) #fill the window
-
-label_title = ttk.Label(main_frame, text="Bluetooth Device Scanner", font=("Arial", 16))
-label_title.pack(pady=5)  #padding
-
-#Notification Area
-notification_area = scrolledtext.ScrolledText(main_frame, width=70, height=15)  #text area for logs
-notification_area.pack(pady=5)
-
-#combobox frame
-combobox_frame = ttk.Frame(main_frame)
-combobox_frame.pack(pady=5)
-
-#Peripheral combobox
-peripheral_boxvar = tk.StringVar()
-peripheral_box = ttk.Combobox(combobox_frame, textvariable=peripheral_boxvar, width=30, height=5)
-peripheral_box['state'] = 'readonly'
-peripheral_box.pack(side=tk.LEFT, padx=5, pady=5)
-
-#service/characteristic combobox
-service_boxvar = tk.StringVar()
-service_box = ttk.Combobox(combobox_frame, textvariable=service_boxvar, width=30, height=5)
-service_box['state'] = 'readonly'
-service_box.pack(side=tk.LEFT, padx=5, pady=5)
-
-#found addresses combobox
-address_boxvar = tk.StringVar()
-address_box = ttk.Combobox(combobox_frame, textvariable=address_boxvar, width=30, height=5)
-address_box['state'] = 'readonly'
-address_box.pack(side=tk.LEFT, padx=5, pady=5)
-
-graph_frame = ttk.Frame(main_frame)
-
-fig = Figure(figsize=(10, 10), dpi=100)
-ax = fig.add_subplot()
-fig.suptitle("Device's RSSI over Time")
-ax.set_ylabel("RSSI (dpm)")
-canvas = FigureCanvasTkAgg(fig, master=graph_frame)  # A tk.DrawingArea.
-canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-
-# -------------- SERIAL STUFF ------------------
-# Initialize Serial Connection
-def detect_pico():
-    ports = serial.tools.list_ports.comports()  #get list of available serial ports
-    for port in ports:
-        if "Pico" in port.description or "USB Serial Device" in port.description:
-            return port.device  #return the port name if a Pico is detected
-    return None                 #return None if no Pico is found
-
-def initialize_serial():
-    global ser
-    pico_port = detect_pico()  #try detect the Pico
-    if pico_port:
+import log_view                 # bounded, batched notification log
+import recording                # binary capture files
+import instrumentation          # per-stage latency histograms
+import rssi_filter              # batched RSSI smoothing and presence detection
+import device_registry          # sorted, searchable device list
+#matplotlib (with rssi_graph and rssi_heatmap), pyserial, the SQLite archive and the receiver process are imported
+#when first used, so the window comes up without waiting for them
+
+#Settings
+HISTORY_CAPACITY = 10_000 #samples kept per device
+MAX_DEVICES = 2048 #devices kept at once, the least recently seen is dropped beyond this
+DEVICE_TIMEOUT = 600.0 #seconds without a sighting before a device is forgotten
+SMOOTHING = "ema" #"ema", "median" or "kalman" (see rssi_filter.py), None to plot raw RSSI only
+PRESENCE_ENTER = -80.0 #smoothed RSSI at which a device counts as arrived...
+PRESENCE_LEAVE = -90.0 #...and below which (or after PRESENCE_TIMEOUT seconds unseen) it has departed
+PRESENCE_TIMEOUT = 30.0
+DEVICE_LIST_LIMIT = 500 #most devices listed at once, narrow it down with the filter
+DEVICE_ORDERS = {"Last seen": "last_seen", "Strongest": "strongest", "Most seen": "most_seen"}
+OVERLAY_COLORS = [f"C{i}" for i in range(10)] #matplotlib's color cycle, one color per overlaid device
+HEATMAP_ROWS = 200 #devices in the heatmap, the top of the device list in its current order and filter
+HEATMAP_INTERVAL = 1.0 #seconds between heatmap updates
+HEATMAP_WINDOW = 300.0 #seconds shown when no device is graphed to set the time axis
+INCREMENTAL_RENDER = True #update persistent lines with blitting instead of clearing and replotting every frame
+DECIMATE_GRAPH = True #plot at most 2 points per pixel of the visible window (incremental mode only)
+SCAN_TIMEOUT = 5.0 #longest scan for peripherals, in seconds
+STOP_SCAN_ON_OBSERVER = True #end the scan as soon as an observer Pico shows up
+MAX_FPS = 20 #GUI updates per second, all notifications received in between are handled in one update
+STATS_INTERVAL = 1.0 #seconds between updates of the per-observer throughput line
+LOG_MAX_LINES = 5000 #older lines are dropped from the notification area
+ARCHIVE_HISTORY_HOURS = 24.0 #default span loaded by "Load History"
+RECEIVER_PROCESS = False #decode in a separate process (shm_pipeline.py); Start Observing then connects to every observer by itself
+
+#Everything received goes through here: decoding, the device store, the device list's registry, smoothing and the
+#optional recording and archive. No widgets are involved, so it works without a display or a Tk root:
+#   ingest = Ingest()
+#   ingest.deconstruct_data(notification)  #raw bytes of one notification
+#   times, rssi = ingest.found_addresses.series(address)
+#Application adds the window on top of it.
+class Ingest:
+    def __init__(self, log=None):
+        self.log = log #log_view.LogView, or anything with its write/add_sightings/add_aggregates; None logs nothing
+        self.smoother = rssi_filter.RssiFilter(SMOOTHING, enter=PRESENCE_ENTER, leave=PRESENCE_LEAVE, timeout=PRESENCE_TIMEOUT) if SMOOTHING else None
+        self.found_addresses = device_store.DeviceStore(HISTORY_CAPACITY, MAX_DEVICES, DEVICE_TIMEOUT, smoothed=self.smoother is not None) #RSSI history keyed by 48-bit address
+        self.registry = device_registry.DeviceRegistry() #names, sort orders and search for the device list
+        self.recorder = None #recording.Recorder while recording
+        self.sighting_archive = None #archive.Archive while archiving
+
+    def deconstruct_data(self, data, t=None, observer_id=0): #decode one notification into the store and log, returns whether the device list changed
+        return self.ingest_frame(sighting_frames.decode_frame(data), time.time() if t is None else t, observer_id)
+
+    def ingest_frame(self, frame, t, observer_id=0): #one notification carries a batch of sightings
+        return self.ingest_sightings(frame.sightings["address"], sighting_frames.frame_names(frame), frame.sightings["rssi"], t, observer_id, frame.aggregates)
+
+    def ingest_sightings(self, addresses, names, rssis, t, observer_id=0, aggregates=None): #names per sighting; returns whether the device list changed
+        if self.log is not None:
+            started = instrumentation.start()
+            if aggregates is not None: #the Pico is in aggregation mode, one record per device per scan window
+                self.log.add_aggregates(names, aggregates)
+            else:
+                self.log.add_sightings(names, addresses.tolist(), rssis.tolist())
+            instrumentation.record("log", started, len(addresses))
+        if self.recorder is not None:
+            started = instrumentation.start()
+            self.recorder.write(t, addresses, rssis, names, observer_id)
+            instrumentation.record("write", started, len(addresses))
+        if self.sighting_archive is not None:
+            started = instrumentation.start()
+            self.sighting_archive.add(t, addresses, rssis, names, observer_id)
+            instrumentation.record("archive", started, len(addresses))
+
+        smoothed = None
+        if self.smoother is not None:
+            started = instrumentation.start()
+            smoothed, events = self.smoother.update(addresses, rssis, t)
+            instrumentation.record("filter", started, len(addresses))
+            self.log_presence(events)
+
+        started = instrumentation.start()
+        self.found_addresses.add_batch(addresses, names, rssis, t, smoothed)
+        changed = self.registry.update(addresses, names, rssis if smoothed is None else smoothed, t) #new or renamed devices
+        if self.found_addresses.due_for_eviction():
+            evicted = self.found_addresses.evict()
+            self.forget(evicted)
+            changed = len(evicted) > 0 or changed
+        instrumentation.record("store", started, len(addresses))
+        return changed
+
+    def forget(self, addresses): #devices evicted from the store
+        if self.smoother is not None:
+            self.smoother.forget(addresses)
+        self.registry.remove(addresses)
+
+    def expire(self, now=None): #about once a second: presence timeouts, and no quiet device's last sightings left buffered
+        if self.sighting_archive is not None:
+            self.sighting_archive.flush()
+        if self.smoother is not None:
+            self.log_presence(self.smoother.expire(time.time() if now is None else now))
+
+    def log_presence(self, events): #arrivals and departures from the smoother
+        if self.log is None:
+            return
+        for t, address, event in events:
+            name = self.found_addresses.name(address) if address in self.found_addresses else "None"
+            self.log.write(f"{event.upper()}: Name: {name}, Address: {sighting_frames.format_address(address)}\n")
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.sighting_archive is not None:
+            self.sighting_archive.close()
+            self.sighting_archive = None
+
+
+class Application(Ingest):
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        self.ser = None
+        self.adapter = None #selected adapter
+        self.peripherals = [] #found peripherals
+        self.peripheral = None #selected peripheral
+        self.sessions = reciever_modular.SessionManager() #every observer we're connected to, one session each
+        self.session = None #session of the selected peripheral
+        self.service_characteristics = [] #available service/characteristic pairs from peripheral
+        self.service = None #selected service-characteristic pair
+        self.visible = [] #addresses shown in address_box, parallel to its values
+        self.visible_labels = [] #address_box's values
+        self.displayed = False #display check
+        self.graphed = [] #addresses of the devices on the graph; a single device is drawn raw with its smoothed curve on top
+        self.heatmap = None #rssi_heatmap.RssiHeatmap while "Heatmap" is on
+        self.last_heatmap = 0.0
+        self.last_stats = 0.0
+        self.time_origin = time.time() #the graph's x axis is seconds since this, on the desktop's clock
+        self.receiver = None #shm_pipeline.ReceiverProcess while observing in that mode
+        self.scan_config = reciever_modular.ScanConfig() #last scan settings applied from the Scan Settings dialog
+        self.fig = self.ax = self.canvas = self.graph = None #created with the first graph
+        self.heatmap_ax = None
+        self._build()
+
+    #GUI Setup
+    def _build(self):
+        root = self.root
+        root.title("Bluetooth Device Scanner")
+        root.geometry("800x600")
+
+        #UI Elements
+        #Creates frame to hold UI
+        main_frame = ttk.Frame(root, padding=10)
+        main_frame.pack(fill=tk.BOTH, expand=True) #fill the window
+
+        label_title = ttk.Label(main_frame, text="Bluetooth Device Scanner", font=("Arial", 16))
+        label_title.pack(pady=5)  #padding
+
+        #Notification Area
+        notification_area = scrolledtext.ScrolledText(main_frame, width=70, height=15)  #text area for logs
+        notification_area.pack(pady=5)
+        self.log = log_view.LogView(notification_area, max_lines=LOG_MAX_LINES) #use log.write instead of inserting into notification_area
+        self.summary_mode = tk.BooleanVar(value=False)
+        summary_check = ttk.Checkbutton(main_frame, text="Summary mode (sightings per second)", variable=self.summary_mode,
+                                        command=lambda: self.log.set_summary(self.summary_mode.get()))
+        summary_check.pack()
+        self.observer_status = ttk.Label(main_frame, text="") #sightings per second of each observer
+        self.observer_status.pack()
+        self.instrumentation_mode = tk.BooleanVar(value=False)
+        instrumentation_check = ttk.Checkbutton(main_frame, text="Pipeline timings", variable=self.instrumentation_mode, command=self.toggle_instrumentation)
+        instrumentation_check.pack()
+        self.pipeline_status = ttk.Label(main_frame, text="", font=("Courier", 9), justify=tk.LEFT) #per-stage latencies, shown while timings are on
+
+        #combobox frame
+        combobox_frame = ttk.Frame(main_frame)
+        combobox_frame.pack(pady=5)
+
+        #Peripheral combobox
+        self.peripheral_box = ttk.Combobox(combobox_frame, width=30, height=5, state='readonly')
+        self.peripheral_box.pack(side=tk.LEFT, padx=5, pady=5)
+
+        #service/characteristic combobox
+        self.service_box = ttk.Combobox(combobox_frame, width=30, height=5, state='readonly')
+        self.service_box.pack(side=tk.LEFT, padx=5, pady=5)
+
+        #found addresses combobox
+        self.address_box = ttk.Combobox(combobox_frame, width=30, height=5, state='readonly')
+        self.address_box.pack(side=tk.LEFT, padx=5, pady=5)
+
+        #device list filter (address prefix or part of a name) and sort order
+        filter_frame = ttk.Frame(main_frame)
+        filter_frame.pack()
+        ttk.Label(filter_frame, text="Filter devices:").pack(side=tk.LEFT)
+        self.filter_boxvar = tk.StringVar()
+        filter_box = ttk.Entry(filter_frame, textvariable=self.filter_boxvar, width=20)
+        filter_box.pack(side=tk.LEFT, padx=5)
+        self.order_boxvar = tk.StringVar(value="Last seen")
+        self.order_box = ttk.Combobox(filter_frame, textvariable=self.order_boxvar, values=list(DEVICE_ORDERS), width=12, state='readonly')
+        self.order_box.pack(side=tk.LEFT, padx=5)
+        self.heatmap_mode = tk.BooleanVar(value=False)
+        heatmap_check = ttk.Checkbutton(filter_frame, text="Heatmap", variable=self.heatmap_mode, command=self.toggle_heatmap)
+        heatmap_check.pack(side=tk.LEFT, padx=5)
+
+        #buttons for GUI
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=5)
+        for text, command in [("Initialize Bluetooth Adapter", self.initialize_adapter), ("Set Peripheral", self.set_peripheral),
+                              ("Set Characteristic", self.set_characteristic), ("Start Observing", self.start_observing),
+                              ("Disconnect from Observers", self.stop_observing), ("Graph Selected", self.graph_selected),
+                              ("Add to Graph", self.overlay_selected), ("Record", self.toggle_recording),
+                              ("Load Recording", self.load_recording), ("Archive", self.toggle_archive),
+                              ("Load History", self.load_history), ("Scan Settings", self.open_scan_settings)]:
+            ttk.Button(button_frame, text=text, command=command).pack(side=tk.LEFT, padx=5)
+
+        self.graph_frame = ttk.Frame(main_frame) #the figure goes in here once something is graphed
+        self.graph_frame.pack(pady=5)
+        # close the serial connection
+        root.protocol("WM_DELETE_WINDOW", self.close_app)
+        self.filter_boxvar.trace_add("write", self.refresh_device_list)
+        self.order_box.bind("<<ComboboxSelected>>", self.refresh_device_list)
+        root.after(int(1000 / MAX_FPS), self.process_incoming) #start the render loop
+
+    def _create_graph(self): #matplotlib is only imported here, the first time a graph or the heatmap is shown
+        if self.fig is not None:
+            return
+        from matplotlib.figure import Figure # type: ignore
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg # type: ignore
+        import rssi_graph               # incremental, blitted RSSI plot
+        self.fig = Figure(figsize=(10, 10), dpi=100)
+        self.ax = self.fig.add_subplot()
+        self.fig.suptitle("Device's RSSI over Time")
+        self.ax.set_ylabel("RSSI (dpm)")
+        self.ax.set_xlabel("Time (s)")
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.graph_frame)  # A tk.DrawingArea.
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.graph = rssi_graph.RssiGraph(self.canvas, self.ax, decimation=DECIMATE_GRAPH)
+        self.single_layout = self.ax.get_subplotspec()
+        self.heatmap_layout = self.fig.add_gridspec(2, 1) #lines on top, heatmap below on the same time axis
+
+    def toggle_instrumentation(self):
+        instrumentation.enable(self.instrumentation_mode.get())
+        self.pipeline_status['text'] = ""
+        if self.instrumentation_mode.get():
+            self.pipeline_status.pack()
+        else:
+            self.pipeline_status.pack_forget()
+
+    def toggle_heatmap(self):
+        import rssi_heatmap             # device-by-time RSSI heatmap
+        self._create_graph()
+        if self.heatmap_mode.get():
+            self.ax.set_subplotspec(self.heatmap_layout[0])
+            self.heatmap_ax = self.fig.add_subplot(self.heatmap_layout[1], sharex=self.ax)
+            self.heatmap_ax.set_xlabel("Time (s)")
+            self.heatmap = rssi_heatmap.RssiHeatmap(self.canvas, self.heatmap_ax)
+            self.update_heatmap()
+        else:
+            self.heatmap.remove()
+            self.fig.delaxes(self.heatmap_ax)
+            self.ax.set_subplotspec(self.single_layout)
+            self.heatmap = self.heatmap_ax = None
+        self.canvas.draw()
+
+    # -------------- SERIAL STUFF ------------------
+    # Initialize Serial Connection
+    def detect_pico(self):
+        import serial.tools.list_ports  # type: ignore #tool for listing available serial ports
+        ports = serial.tools.list_ports.comports()  #get list of available serial ports
+        for port in ports:
+            if "Pico" in port.description or "USB Serial Device" in port.description:
+                return port.device  #return the port name if a Pico is detected
+        return None                 #return None if no Pico is found
+
+    def initialize_serial(self):
+        import serial                   # type: ignore #serial library to handle comm with the Pico
+        pico_port = self.detect_pico()  #try detect the Pico
+        if pico_port:
+            try:
+                self.ser = serial.Serial(pico_port, 115200, timeout=1)  #open port 115200
+                messagebox.showinfo("Success", f"Pico detected on {pico_port} and initialized!")
+                self.log.write(f"Pico detected on {pico_port}\n")
+                self.start_reading_serial()  #read data from the Pico
+            except serial.SerialException as e:
+                messagebox.showerror("Error", f"Could not open serial port: {e}")
+        else:
+            messagebox.showwarning("Warning", "No Pico device detected. Please connect your Pico.")
+
+    #close Serial Connection
+    def close_serial(self):
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+            self.log.write("Serial connection closed.\n")
+
+    #Send Test Connection to Pico
+    def test_connection(self):
+        if self.ser and self.ser.is_open:
+            try:
+                self.ser.write(b'test_connection\n')
+                self.log.write("Sent test connection command to Pico.\n")
+            except Exception as e:
+                self.log.write(f"Error sending test connection: {e}\n")
+        else:
+            messagebox.showwarning("Warning", "Serial connection not initialized.")
+
+    #send Status Command to Pico
+    def check_status(self):
+        if self.ser and self.ser.is_open:
+            try:
+                self.ser.write(b'status\n')
+                self.log.write("Sent status command to Pico.\n")
+            except Exception as e:
+                self.log.write(f"Error sending status command: {e}\n")
+        else:
+            messagebox.showwarning("Warning", "Serial connection not initialized.")
+
+    #start Scanning Command
+    def start_scan(self):
+        if self.ser and self.ser.is_open:
+            try:
+                self.ser.write(b'start_scan\n')
+                self.log.write("Sent start scan command to Pico.\n")
+            except Exception as e:
+                self.log.write(f"Error sending start scan command: {e}\n")
+        else:
+            messagebox.showwarning("Warning", "Serial connection not initialized.")
+
+    #read from Serial and display data
+    def read_from_serial(self):
+        while self.ser and self.ser.is_open:
+            try:
+                line = self.ser.readline().decode("utf-8").strip()  #reads line
+                if line:
+                    self.log.write(f"{line}\n")  # prints the line, the log auto scrolls on the next frame
+            except Exception as e:
+                self.log.write(f"Error reading from serial: {e}\n")
+            time.sleep(0.1)  #delay between reads
+
+    #start a separate thread to read from serial
+    def start_reading_serial(self):
+        read_thread = threading.Thread(target=self.read_from_serial, daemon=True)  #Create a background thread for reading
+        read_thread.start()
+
+    # --------------------- BLUETOOTH STUFF ---------------------
+    #Initialize available Bluetooth adapters
+    def initialize_adapter(self):
+        adapter_thread = threading.Thread(target=self.get_adapters, daemon=True)
+        adapter_thread.start() #select all adapters
+
+    def get_adapters(self):
+        adapters = reciever_modular.get_available_adapters() #get all Bluetooth adapters, formatted in list
+        if len(adapters) == 0:
+            self.root.after(0, lambda: messagebox.showwarning("Warning", "No Bluetooth adapter available.")) #Tk only from the main thread
+        else:
+            self.adapter = adapters[0] #defaulting to adapter 0, often the only adapter available
+            self.log.write(f"Initialized adapter {self.adapter.identifier()} (Address: {self.adapter.address()})\n")
+            self.log.write("Scanning for available devices...\n")
+            scan_thread = threading.Thread(target=self.scan_devices, daemon=True) #start scanning for available devices to connect to
+            scan_thread.start()
+
+    def scan_devices(self):
+        self.peripherals = []
+        self.root.after(0, self.set_combobox, self.peripheral_box, [])
+        stop_when = reciever_modular.is_observer if STOP_SCAN_ON_OBSERVER else None
+        reciever_modular.scan_incremental(self.adapter, lambda p: self.root.after(0, self.add_peripheral, p), stop_when, SCAN_TIMEOUT)
+        self.log.write("finished scanning.\n")
+
+    def add_peripheral(self, p): #scan result, on the main thread; the first observer found gets selected
+        self.peripherals.append(p)
+        self.peripheral_box['values'] = [f"{a.identifier()} [{a.address()}]" for a in self.peripherals] #human-readable names in the first combobox
+        if reciever_modular.is_observer(p) and not any(reciever_modular.is_observer(q) for q in self.peripherals[:-1]):
+            self.peripheral_box.current(len(self.peripherals) - 1)
+            self.log.write(f"Found observer {p.identifier()} [{p.address()}]\n")
+        elif self.peripheral_box.current() == -1:
+            self.peripheral_box.current(0)
+
+    def set_combobox(self, box, values): #fill a combobox and select the first entry, main thread only
+        box['values'] = values
+        if values:
+            box.current(0)
+
+    def set_peripheral(self): #each peripheral set is added as another observer session, all of them are observed at once
+        selected = self.peripheral_box.current() #get index of peripheral box, use parallel list to actually select
+        self.peripheral = self.peripherals[selected]
+        for s in self.sessions.sessions.values():
+            if s.peripheral is self.peripheral:
+                self.session = s
+                break
+        else:
+            self.session = self.sessions.add(self.peripheral)
+        self.log.write(f"Connecting to selected peripheral as observer {self.session.observer_id}...\n")
+        peripheral_thread = threading.Thread(target=self.connect_peripheral, daemon=True)
+        peripheral_thread.start() #actually connect to peripheral
+
+    def connect_peripheral(self):
+        if not self.session.connect():
+            self.log.write(f"Could not connect: {self.session.error}\n")
+            return
+        self.service_characteristics = []
+        result = []
+        self.log.write("Peripheral connected! getting services...\n")
+        services = self.peripheral.services()
+        for s in services:
+            for c in s.characteristics():
+                self.service_characteristics.append((s.uuid(), c.uuid())) #putting services into a tuple
+        for (s, c) in self.service_characteristics:
+            result.append(f"{s} {c}") #putthing the tuples into a human-readable list, using parallel list to actually control
+        self.root.after(0, self.set_combobox, self.service_box, result)
+
+    def set_characteristic(self):
+        result = self.service_box.current()
+        self.service = self.service_characteristics[result]
+        self.session.service_uuid, self.session.characteristic_uuid = self.service
+        self.log.write(f"Service-Characteristic pair set for observer {self.session.observer_id}.\n")
+
+    def start_observing(self):
+        if RECEIVER_PROCESS:
+            if self.receiver is None:
+                import shm_pipeline             # receiver process feeding a shared-memory ring
+                self.receiver = shm_pipeline.ReceiverProcess(scan_config=self.scan_config)
+                self.receiver.start()
+                self.log.write("Started the receiver process, connecting to every observer...\n")
+            return
+        observer_thread = threading.Thread(target=self.observer, daemon=True)
+        observer_thread.start()
+
+    def observer(self):
+        for s in self.sessions.sessions.values():
+            if s.connected and s.started is None:
+                s.supervise(on_gap=lambda *gap: self.root.after(0, self.record_gap, *gap), on_status=lambda message: self.log.write(message + "\n"))
+                s.subscribe() #sessions only queue on the BLE thread, never touch Tk there
+                self.log.write(f"Observing {s.name()} as observer {s.observer_id}.\n")
+
+    def process_incoming(self): #runs on the Tk main thread at most MAX_FPS times a second
+        started = time.perf_counter()
         try:
-            ser = serial.Serial(pico_port, 115200, timeout=1)  #open port 115200
-            messagebox.showinfo("Success", f"Pico detected on {pico_port} and initialized!")
-            notification_area.insert(tk.END, f"Pico detected on {pico_port}\n")
-            start_reading_serial()  #read data from the Pico
-        except serial.SerialException as e:
-            messagebox.showerror("Error", f"Could not open serial port: {e}")
-    else:
-        messagebox.showwarning("Warning", "No Pico device detected. Please connect your Pico.")
-
-#close Serial Connection
-def close_serial():
-    global ser
-    if ser and ser.is_open:
-        ser.close()
-        notification_area.insert(tk.END, "Serial connection closed.\n")
-
-#Send Test Connection to Pico
-def test_connection():
-    global ser
-    if ser and ser.is_open:
+            self.handle_incoming()
+        except Exception as e: #a bad frame, a failed archive or recording write: log it and keep the window updating
+            self.log.write(f"Error handling received data: {type(e).__name__}: {e}\n")
+            self.log.flush() #update_display may not have got that far
+        finally:
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            self.root.after(max(1, int(1000 / MAX_FPS) - elapsed_ms), self.process_incoming)
+
+    def handle_incoming(self): #everything received since the last frame, then one UI update
+        if self.receiver is not None:
+            exited = not self.receiver.process.is_alive() #checked first, so all it sent before exiting is read below
+            received, changed = self.ingest_receiver()
+            if exited: #connecting failed or it crashed, its reason is in the log by now
+                self.log.write(f"The receiver process exited with code {self.receiver.process.exitcode}.\n")
+                self.receiver.stop()
+                self.receiver = None
+        else:
+            changed = False
+            frames = self.sessions.drain() #everything every observer sent since the last frame, in receive order
+            for t, observer_id, frame in frames:
+                changed = self.ingest_frame(frame, t, observer_id) or changed
+            received = len(frames)
+        self.update_display(received > 0, changed)
+
+    def ingest_receiver(self): #read in place from the receiver process's ring; returns (frames, whether the device list changed)
+        for event in self.receiver.poll():
+            if event[0] == "gap":
+                self.record_gap(*event[1:])
+            else:
+                self.log.write(event[1] + "\n")
+        changed = False
+        frames = self.receiver.drain() #views into the ring, gone when this returns
+        for t, observer_id, records in frames:
+            addresses = records["address"]
+            names = [self.receiver.names.get(a, "None") for a in addresses.tolist()]
+            changed = self.ingest_sightings(addresses, names, records["rssi"], t, observer_id) or changed
+        return len(frames), changed
+
+    def forget(self, addresses):
+        super().forget(addresses)
+        if self.receiver is not None: #its names would otherwise pile up with every randomized address
+            self.receiver.forget(addresses)
+
+    def record_gap(self, observer_id, lost, restored): #an observer link dropped and was restored, main thread
+        self.found_addresses.add_gap(lost, restored, observer_id)
+        if self.displayed and INCREMENTAL_RENDER:
+            self.graph.set_gaps(self.gap_xs())
+
+    def refresh_device_list(self, *args): #main thread; only touches address_box when the visible devices, their order or their names changed
+        shown = self.registry.view(DEVICE_ORDERS[self.order_boxvar.get()], self.filter_boxvar.get(), DEVICE_LIST_LIMIT)
+        labels = [self.registry.label(a) for a in shown] #a label holds the address, so this also catches a device named late
+        if labels == self.visible_labels:
+            return
+        self.visible = shown
+        self.visible_labels = labels
+        self.address_box['values'] = labels #the selected label stays selected if it's still listed
+
+    def update_display(self, received, changed): #one UI update for everything received since the last frame
+        started = instrumentation.start()
+        self.log.flush() #also picks up messages written by other threads
+        instrumentation.record("log", started, 0)
+
+        now = time.monotonic()
+        if now - self.last_stats >= STATS_INTERVAL:
+            self.last_stats = now
+            self.expire()
+            self.refresh_device_list() #sort orders move as sightings come in
+            changed = False
+            stats = self.receiver.stats if self.receiver is not None else self.sessions.stats() if self.sessions.sessions else None
+            if stats is not None:
+                self.observer_status['text'] = "   ".join(f"Observer {s['observer']}: {s['sightings_per_s']:.0f} sightings/s" +
+                                                        (f", {s['lost_frames']} frames lost" if s['lost_frames'] else "") +
+                                                        (f", {s['pico_dropped']} dropped" if s['pico_dropped'] else "") +
+                                                        ("" if s['connected'] else " (disconnected)") for s in stats)
+                if self.receiver is not None and self.receiver.ring.dropped: #the GUI fell so far behind that the ring filled up
+                    self.observer_status['text'] += f"   {self.receiver.ring.dropped} sightings dropped by the receiver ring"
+            if instrumentation.enabled: #where the time goes, one line per pipeline stage
+                self.pipeline_status['text'] = instrumentation.format_lines()
+
+        if received and self.displayed:
+            started = instrumentation.start()
+            self.plot_devices()
+            instrumentation.record("render", started)
+
+        if self.heatmap is not None and now - self.last_heatmap >= HEATMAP_INTERVAL:
+            self.last_heatmap = now
+            started = instrumentation.start()
+            self.update_heatmap()
+            instrumentation.record("render", started)
+
+        if changed: #new devices show up without waiting for the next stats interval
+            self.refresh_device_list()
+
+    def stop_observing(self):
+        if self.receiver is not None:
+            self.receiver.stop()
+            self.receiver = None
+            self.log.write("Stopped the receiver process.\n")
+            return
+        disconnect_thread = threading.Thread(target=self.disconnect, daemon=True)
+        disconnect_thread.start()
+
+    def disconnect(self):
+        self.sessions.disconnect_all()
+        for s in self.sessions.sessions.values():
+            if s.error is not None:
+                print(f"Runtime error disconnecting observer {s.observer_id}: {s.error}")
+        self.sessions = reciever_modular.SessionManager()
+        self.session = None
+        self.log.write(f"Disconnected from all observers.\n")
+
+    def toggle_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.log.write(f"Stopped recording to {self.recorder.path}\n")
+            self.recorder = None
+            return
+        path = filedialog.asksaveasfilename(title="Record sightings to", defaultextension=".rssi",
+                                            filetypes=[("RSSI recordings", "*.rssi"), ("All files", "*")])
+        if not path:
+            return
         try:
-            ser.write(b'test_connection\n')
-            notification_area.insert(tk.END, "Sent test connection command to Pico.\n")
-        except Exception as e:
-            notification_area.insert(tk.END, f"Error sending test connection: {e}\n")
-    else:
-        messagebox.showwarning("Warning", "Serial connection not initialized.")
-
-#send Status Command to Pico
-def check_status():
-    global ser
-    if ser and ser.is_open:
+            self.recorder = recording.Recorder(path) #appends if the file already is a recording
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not record: {e}")
+            return
+        self.log.write(f"Recording sightings to {path}\n")
+
+    def open_archive(self, path): #archive.Archive, None after telling the user why not
+        import sqlite3
+        import archive                  # SQLite sighting history
         try:
-            ser.write(b'status\n')
-            notification_area.insert(tk.END, "Sent status command to Pico.\n")
-        except Exception as e:
-            notification_area.insert(tk.END, f"Error sending status command: {e}\n")
-    else:
-        messagebox.showwarning("Warning", "Serial connection not initialized.")
-
-#start Scanning Command
-def start_scan():
-    global ser
-    if ser and ser.is_open:
+            return archive.Archive(path)
+        except sqlite3.Error as e:
+            messagebox.showerror("Error", f"Could not open archive: {e}")
+            return None
+
+    def toggle_archive(self):
+        if self.sighting_archive is not None:
+            self.sighting_archive.close()
+            self.log.write(f"Stopped archiving to {self.sighting_archive.path}\n")
+            self.sighting_archive = None
+            return
+        path = filedialog.asksaveasfilename(title="Archive sightings to", defaultextension=".db", confirmoverwrite=False,
+                                            filetypes=[("Sighting archives", "*.db"), ("All files", "*")])
+        if not path:
+            return
+        self.sighting_archive = self.open_archive(path) #adds to an existing archive
+        if self.sighting_archive is not None:
+            self.log.write(f"Archiving sightings to {path}\n")
+
+    def load_history(self): #the selected device's archived sightings replace what the store holds for it, then it's graphed
+        selected = self.address_box.current()
+        if selected < 0:
+            messagebox.showwarning("Warning", "Select a device first.")
+            return
+        address = self.visible[selected]
+        source = self.sighting_archive
+        if source is None: #not archiving, read from an existing archive
+            path = filedialog.askopenfilename(title="Load history from", filetypes=[("Sighting archives", "*.db"), ("All files", "*")])
+            if not path:
+                return
+            source = self.open_archive(path)
+            if source is None:
+                return
+        hours = simpledialog.askfloat("Load History", "Hours of history to load:", initialvalue=ARCHIVE_HISTORY_HOURS, minvalue=0.01)
         try:
-            ser.write(b'start_scan\n')
-            notification_area.insert(tk.END, "Sent start scan command to Pico.\n")
-        except Exception as e:
-            notification_area.insert(tk.END, f"Error sending start scan command: {e}\n")
-    else:
-        messagebox.showwarning("Warning", "Serial connection not initialized.")
-
-#read from Serial and display data
-def read_from_serial():
-    global ser
-    while ser and ser.is_open:
+            if hours is None:
+                return
+            source.flush() #include what's still buffered
+            times, rssi = source.sightings(address, time.time() - hours * 3600, limit=HISTORY_CAPACITY) #the newest that fit in the store
+            stored = source.device(address)
+        finally:
+            if source is not self.sighting_archive:
+                source.close()
+        if len(times) == 0:
+            messagebox.showinfo("Load History", f"No archived sightings of {self.registry.label(address)} in the last {hours:g} hours.")
+            return
+        self.found_addresses.replace(address, stored[0], rssi, times)
+        self.log.write(f"Loaded {len(times)} archived sightings of {self.registry.label(address)}" +
+                       (f", the newest of its {stored[3]} in the archive\n" if len(times) == HISTORY_CAPACITY else "\n"))
+        self.make_graph(address)
+
+    def load_recording(self):
+        path = filedialog.askopenfilename(title="Load recording", filetypes=[("RSSI recordings", "*.rssi"), ("All files", "*")])
+        if not path:
+            return
         try:
-            line = ser.readline().decode("utf-8").strip()  #reads line
-            if line:
-                notification_area.insert(tk.END, f"{line}\n")  # prints the line
-                notification_area.see(tk.END)  #auto scrolls to show latest message
-        except Exception as e:
-            notification_area.insert(tk.END, f"Error reading from serial: {e}\n")
-        time.sleep(0.1)  #delay between reads
-
-#start a separate thread to read from serial
-def start_reading_serial():
-    read_thread = threading.Thread(target=read_from_serial, daemon=True)  #Create a background thread for reading
-    read_thread.start()
-
-# --------------------- BLUETOOTH STUFF ---------------------
-#Initialize available Bluetooth adapters
-def initialize_adapter():
-    adapter_thread = threading.Thread(target=get_adapters(), daemon=True)
-    adapter_thread.start() #select all adapters
-
-def get_adapters():
-    global adapter
-    adapters = reciever_modular.get_available_adapters() #get all Bluetooth adapters, formatted in list
-    if len(adapters) == 0:
-        messagebox.showwarning("Warning", "No Bluetooth adapter available.")
-    else:
-        adapter = adapters[0] #defaulting to adapter 0, often the only adapter available
-        notification_area.insert(tk.END, f"Initialized adapter {adapter.identifier()} (Address: {adapter.address()})\n")
-        notification_area.insert(tk.END, "Scanning for available devices...\n")
-        scan_thread = threading.Thread(target=scan_devices, daemon=True) #start scanning for available devices to connect to
-        scan_thread.start()
-
-def scan_devices():
-    global adapter
-    global peripherals
-    peripherals = reciever_modular.scan_for_devices(adapter) #scan for available devices for 5 seconds
-    notification_area.insert(tk.END, "finished scanning.\n")
-    result = list(map(lambda a: f"{a.identifier()} [{a.address()}]", peripherals)) 
-    peripheral_box['values'] = result #put human-readable names into first combobox
-    peripheral_box.current(0)
-
-def set_peripheral():
-    global peripheral
-    global peripherals
-    selected = peripheral_box.current() #get index of peripheral box, use parallel list to actually select
-    peripheral = peripherals[selected]
-    notification_area.insert(tk.END, "Connecting to selected peripheral...\n")
-    peripheral_thread = threading.Thread(target=connect_peripheral, daemon=True) 
-    peripheral_thread.start() #actually connect to peripheral
-
-def connect_peripheral():
-    global peripheral
-    global service_characteristics
-    peripheral.connect()
-    result = []
-    notification_area.insert(tk.END, "Peripheral connected! getting services...\n")
-    services = peripheral.services()
-    for s in services:
-        for c in s.characteristics():
-            service_characteristics.append((s.uuid(), c.uuid())) #putting services into a tuple
-    for (s, c) in service_characteristics:
-        result.append(f"{s} {c}") #putthing the tuples into a human-readable list, using parallel list to actually control
-    service_box['values'] = result
-    service_box.current(0)
-
-def set_characteristic():
-    global peripheral
-    global service_characteristics
-    global service
-    result = service_box.current()
-    service = service_characteristics[result]
-    notification_area.insert(tk.END, f"Service-Characteristic pair set.\n")
-
-def start_observing():
-    observer_thread = threading.Thread(target=observer, daemon=True)
-    observer_thread.start()
-
-def observer():
-    global peripheral
-    global service
-    s, c = service
-    peripheral.notify(s, c, lambda data: deconstruct_data(data))
-    
-def deconstruct_data(data):
-    global found_addresses
-    global results
-    test = data.decode('utf-8').split(',')
-    name = test[0]
-    address = test[2][1:18]
-    rssi = test[3]
-    
-    notification_area.insert(tk.END, f"GOT: Name: {name}, Address: {address}, RSSI: {rssi}\n")
-    notification_area.see(tk.END)
-    
-    if address in found_addresses.keys():
-        found_addresses[address]["rssi"].append(int(rssi))
-    else:
-        this_address = {"name": name, "rssi": [int(rssi)]}
-        results.append(f"{address} ({this_address['name']})")
-        found_addresses.update({address: this_address})
-
-    if displayed:
-        ax.cla()
-        ax.set_ylabel("RSSI (dBm)")
-        result = address_box.get()
-        result = result[0:17]
-        ax.plot(found_addresses[result]['rssi'], color='green')
-        canvas.draw()
-    
-    address_box['values'] = results
-    
-def stop_observing():
-    disconnect_thread = threading.Thread(target=disconnect, daemon=True)
-    disconnect_thread.start()
-
-def disconnect():
-    global peripheral
-    try:
-        peripheral.disconnect()
-    except RuntimeError:
-        print("Runtime error")
-    notification_area.insert(tk.END, f"Disconnected from peripheral.\n")
-
-def close_app():
-    root.destroy()
-
-def graph_selected():
-    result = address_box.get()
-    if result == "":
-        messagebox.showwarning("Warning", "No address found.")
-        return
-    result = result[0:17]
-    graph_thread = threading.Thread(target=make_graph(result), daemon=True)
-    graph_thread.start()
-
-    
-def make_graph(result):
-    global displayed
-    ax.plot(found_addresses[result]['rssi'], color='green')
-    canvas.draw()
-    displayed = True
-
-
-#buttons for GUI
-button_frame = ttk.Frame(main_frame)
-button_frame.pack(pady=5)
-
-init_button = ttk.Button(button_frame, text="Initialize Bluetooth Adapter", command=initialize_adapter)
-init_button.pack(side=tk.LEFT, padx=5)
-scan_button = ttk.Button(button_frame, text="Set Peripheral", command=set_peripheral)
-scan_button.pack(side=tk.LEFT, padx=5)
-test_button = ttk.Button(button_frame, text="Set Characteristic", command=set_characteristic)
-test_button.pack(side=tk.LEFT, padx=5)
-status_button = ttk.Button(button_frame, text="Start Observing", command=start_observing)
-status_button.pack(side=tk.LEFT, padx=5)
-close_button = ttk.Button(button_frame, text="Disconnect from Observer", command=stop_observing)
-close_button.pack(side=tk.LEFT, padx=5)
-graph_button = ttk.Button(button_frame, text="Graph Selected", command=graph_selected)
-graph_button.pack(side=tk.LEFT, padx=5)
-
-graph_frame.pack(pady=5)
-# close the serial connection
-root.protocol("WM_DELETE_WINDOW", close_app)
-root.mainloop()  # Run GUI 
\ No newline at end of file
+            reader = recording.Reader(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not load recording: {e}")
+            return
+        self.found_addresses = device_store.DeviceStore(HISTORY_CAPACITY, MAX_DEVICES, float("inf"), smoothed=self.smoother is not None) #old captures must not be evicted as stale
+        reader.load_into(self.found_addresses)
+        if len(reader) > 0:
+            self.time_origin = float(reader.times[0]) #seconds into the capture
+        self.registry = device_registry.DeviceRegistry()
+        self.registry.update(reader.addresses(), reader.names, reader.rssi, reader.times)
+        self.refresh_device_list()
+        self.log.write(f"Loaded {len(reader)} sightings of {len(self.found_addresses)} devices from {path}\n")
+
+    def open_scan_settings(self): #dialog for the observers' scan duty cycle, applied to every connected observer
+        config = self.scan_config
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Scan Settings")
+        fields = [("Scan duration (ms)", "duration_ms"), ("Pause between scans (ms)", "pause_ms"),
+                  ("Radio scan interval (us)", "interval_us"), ("Radio scan window (us)", "window_us"),
+                  ("Pause after each result (ms)", "throttle_ms"), ("Advertising interval (ms)", "adv_interval_ms")]
+        entries = dict()
+        for row, (label, field) in enumerate(fields):
+            ttk.Label(dialog, text=label).grid(row=row, column=0, sticky=tk.W, padx=5, pady=2)
+            entries[field] = tk.StringVar(value=str(getattr(config, field)))
+            ttk.Entry(dialog, textvariable=entries[field], width=10).grid(row=row, column=1, padx=5, pady=2)
+        active = tk.BooleanVar(value=config.active)
+        aggregate = tk.BooleanVar(value=config.aggregate)
+        ttk.Checkbutton(dialog, text="Active scanning", variable=active).grid(row=len(fields), column=0, columnspan=2, sticky=tk.W, padx=5)
+        ttk.Checkbutton(dialog, text="Aggregation mode", variable=aggregate).grid(row=len(fields) + 1, column=0, columnspan=2, sticky=tk.W, padx=5)
+
+        def apply():
+            try:
+                new = reciever_modular.ScanConfig(active=active.get(), aggregate=aggregate.get(),
+                                                  **{field: int(var.get()) for field, var in entries.items()})
+                reciever_modular.encode_scan_config(new) #range check before anything is sent
+            except Exception as e:
+                messagebox.showerror("Error", f"Invalid scan settings: {e}", parent=dialog)
+                return
+            self.scan_config = new
+            dialog.destroy()
+            threading.Thread(target=self.apply_scan_config, args=(new,), daemon=True).start() #BLE writes block, keep them off the Tk thread
+
+        ttk.Button(dialog, text="Apply", command=apply).grid(row=len(fields) + 2, column=0, columnspan=2, pady=5)
+
+    def apply_scan_config(self, config):
+        if self.receiver is not None: #the receiver process owns the links
+            self.receiver.set_scan_config(config)
+            return
+        results = self.sessions.set_scan_config_all(config)
+        if not results:
+            self.log.write("No connected observers to send the scan settings to.\n")
+        for observer_id, result in results.items():
+            if isinstance(result, Exception):
+                self.log.write(f"Could not set scan settings of observer {observer_id}: {result}\n")
+            else:
+                self.log.write(f"Observer {observer_id} scan settings: {result}\n")
+
+    def close_app(self):
+        self.close()
+        if self.receiver is not None:
+            self.receiver.stop()
+        self.root.destroy()
+
+    def graph_selected(self):
+        selected = self.address_box.current()
+        if selected < 0 or self.visible[selected] not in self.found_addresses:
+            messagebox.showwarning("Warning", "No address found.")
+            return
+        self.make_graph(self.visible[selected]) #matplotlib and Tk must stay on the main thread
+
+    def overlay_selected(self): #add the selected device to the ones already on the graph
+        selected = self.address_box.current()
+        if selected < 0 or self.visible[selected] not in self.found_addresses:
+            messagebox.showwarning("Warning", "No address found.")
+            return
+        if self.visible[selected] not in self.graphed:
+            self.make_graph(*self.graphed, self.visible[selected], reset_limits=False)
+
+    def make_graph(self, *addresses, reset_limits=True): #replace the devices on the graph
+        self._create_graph()
+        self.graphed = list(addresses)
+        if INCREMENTAL_RENDER:
+            self.graph.clear()
+            if reset_limits:
+                self.graph.reset_limits()
+        self.plot_devices(legend=True)
+        self.displayed = True
+
+    def gap_xs(self): #outages inside any graphed device's series
+        gaps = [self.found_addresses.gap_times(a) for a in self.graphed if a in self.found_addresses]
+        return np.unique(np.concatenate(gaps)) - self.time_origin if gaps else np.empty(0)
+
+    def plot_devices(self, legend=False): #one device: raw RSSI with the smoothed curve on top; several: one colored line each (smoothed if kept)
+        shown = [a for a in self.graphed if a in self.found_addresses]
+        lines = [] #(key, x, y, version, color)
+        for i, address in enumerate(shown):
+            times, rssi = self.found_addresses.series(address)
+            smoothed = self.found_addresses.smoothed_series(address)
+            version = self.found_addresses.version(address)
+            if len(self.graphed) > 1:
+                lines.append((address, times - self.time_origin, rssi if smoothed is None else smoothed, version, OVERLAY_COLORS[i % len(OVERLAY_COLORS)]))
+                continue
+            lines.append((address, times - self.time_origin, rssi, version, "green" if smoothed is None else "#a8d8a8"))
+            if smoothed is not None:
+                lines.append(((address, "smoothed"), times - self.time_origin, smoothed, version, "darkgreen"))
+        labels = [self.registry.label(a) if a in self.registry else sighting_frames.format_address(a) for a in shown]
+        if INCREMENTAL_RENDER:
+            for key, x, y, version, color in lines:
+                self.graph.plot(key, y, x=x, version=version, color=color)
+            if legend:
+                self.graph.set_legend(shown if len(self.graphed) > 1 else [], labels)
+            self.graph.set_gaps(self.gap_xs()) #where the outage started
+            self.graph.draw()
+        else:
+            ax = self.ax
+            ax.cla()
+            ax.set_ylabel("RSSI (dBm)")
+            ax.set_xlabel("Time (s)")
+            for key, x, y, version, color in lines:
+                ax.plot(x, y, color=color, label=labels[shown.index(key)] if key in shown else None)
+            if len(self.graphed) > 1:
+                ax.legend(loc="upper left", fontsize=8)
+            for gap in self.gap_xs():
+                ax.axvline(gap, color="red", linestyle=":", linewidth=1)
+            self.canvas.draw()
+
+    def update_heatmap(self): #the listed devices, binned over the graph's visible time window
+        rows = [a for a in self.visible[:HEATMAP_ROWS] if a in self.found_addresses]
+        if not self.displayed: #no lines to set the time axis, show the last HEATMAP_WINDOW seconds
+            end = time.time() - self.time_origin
+            self.ax.set_xlim(end - HEATMAP_WINDOW, end)
+        series = []
+        for address in rows:
+            times, rssi = self.found_addresses.series(address)
+            series.append((times - self.time_origin, rssi))
+        self.heatmap.update(rows, series, [self.registry.label(a) for a in rows])
+        self.heatmap.draw()
+
+
+def startup_report(window_time, file=sys.stderr): #how long until the first window, and which heavy modules were loaded for it
+    imports = [name for name in ("matplotlib", "serial", "sqlite3", "multiprocessing.shared_memory") if name in sys.modules]
+    print(f"module imports {(IMPORTED - STARTED) * 1000:.0f} ms, first window {(window_time - STARTED) * 1000:.0f} ms" +
+          (f", loaded early: {', '.join(imports)}" if imports else ""), file=file)
+    return window_time - STARTED
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch the observer Picos' sightings.")
+    parser.add_argument("--startup-time", action="store_true", help="print how long the first window took to show, then quit")
+    parser.add_argument("--startup-budget", type=float, help="with --startup-time, exit with status 1 if the window took longer than this many seconds")
+    args = parser.parse_args(argv)
+
+    root = tk.Tk()
+    app = Application(root)
+    if args.startup_time:
+        root.update() #map the window and draw it once
+        elapsed = startup_report(time.perf_counter())
+        app.close_app()
+        return 1 if args.startup_budget is not None and elapsed > args.startup_budget else 0
+    root.mainloop()  # Run GUI
+    return 0
+
+IMPORTED = time.perf_counter()
+
+if __name__ == "__main__":
+    sys.exit(main())
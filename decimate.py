@@ -0,0 +1,50 @@
+from collections import OrderedDict
+import numpy as np # type: ignore
+
+#Min/max per pixel bucket downsampling: every pixel column keeps the lowest and highest RSSI in it,
+#so spikes survive but the line never has more than 2 points per pixel plus the two edge points.
+def minmax_decimate(x, y, x0, x1, buckets): #x must be sorted; returns (x, y) for the visible window [x0, x1]
+    x = np.asarray(x)
+    y = np.asarray(y)
+    start = max(int(np.searchsorted(x, x0, side="left")) - 1, 0) #keep one point past each edge so the line reaches it
+    stop = min(int(np.searchsorted(x, x1, side="right")) + 1, len(x))
+    x = x[start:stop]
+    y = y[start:stop]
+    if len(x) <= 2 * buckets or x1 <= x0:
+        return x, y
+    bucket = np.clip(np.floor((x - x0) * (buckets / (x1 - x0))).astype(np.int64), -1, buckets) #-1 and buckets hold the edge points
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(x)] - 1
+    out_x = np.empty(2 * len(starts), dtype=x.dtype)
+    out_y = np.empty(2 * len(starts), dtype=y.dtype)
+    out_x[0::2] = x[starts]
+    out_x[1::2] = x[ends]
+    out_y[0::2] = np.minimum.reduceat(y, starts)
+    out_y[1::2] = np.maximum.reduceat(y, starts)
+    keep = np.ones(len(out_x), dtype=np.bool_)
+    keep[1::2] = ends != starts #a bucket with one sample, like an edge point's, gives one point rather than two copies
+    return out_x[keep], out_y[keep]
+
+
+#Remembers decimated lines per (device, data version, visible window, width) so panning back and forth
+#with the toolbar or redrawing an unchanged device doesn't recompute them.
+class DecimationCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, address, version, x, y, x0, x1, buckets):
+        key = (address, version, round(x0, 6), round(x1, 6), buckets)
+        hit = self._entries.get(key)
+        if hit is not None:
+            self._entries.move_to_end(key)
+            return hit
+        result = minmax_decimate(x, y, x0, x1, buckets)
+        self._entries[key] = result
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return result
+
+    def forget(self, address): #drop every cached zoom level of a device
+        for key in [k for k in self._entries if k[0] == address]:
+            del self._entries[key]
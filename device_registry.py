@@ -0,0 +1,109 @@
+import bisect
+import sys
+import numpy as np # type: ignore
+import sighting_frames
+
+ORDERS = ("last_seen", "strongest", "most_seen")
+
+#Keys sorted by one value, kept sorted as values change: a changed key costs a bisect and one list insert/delete,
+#never a full sort. Ties go by address so every entry has a distinct position.
+class _SortedIndex:
+    def __init__(self):
+        self.keys = dict() #address -> current key
+        self.entries = [] #sorted (key, address)
+
+    def set(self, address, key):
+        old = self.keys.get(address)
+        if old == key:
+            return
+        if old is not None:
+            del self.entries[bisect.bisect_left(self.entries, (old, address))]
+        self.keys[address] = key
+        bisect.insort(self.entries, (key, address))
+
+    def remove(self, address):
+        old = self.keys.pop(address, None)
+        if old is not None:
+            del self.entries[bisect.bisect_left(self.entries, (old, address))]
+
+    def __iter__(self):
+        return (address for key, address in self.entries)
+
+
+#Every device seen, keyed by its 48-bit address, with what the device list needs: an interned name,
+#last seen time, latest RSSI and sample count. The three sort orders are maintained as sightings come in,
+#so showing the list is a walk over an already sorted index plus the text filter.
+class DeviceRegistry:
+    def __init__(self):
+        self.names = dict() #address -> interned name, "None" if it never advertised one
+        self.labels = dict() #address -> "aa:bb:cc:dd:ee:ff (name)", what the combobox shows
+        self._search = dict() #address -> lowercase label, what filters match against
+        self.last_seen = dict()
+        self.rssi = dict()
+        self.count = dict()
+        self._orders = {order: _SortedIndex() for order in ORDERS}
+
+    def __contains__(self, address):
+        return address in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def update(self, addresses, names, rssis, t): #a batch of sightings; names per sample or dict by address, t a time or one per sample
+        #returns True if a device was added or renamed, i.e. the labels changed
+        addresses = np.asarray(addresses, dtype=np.uint64)
+        if len(addresses) == 0:
+            return False
+        rssis = np.asarray(rssis)
+        times = np.broadcast_to(np.asarray(t, dtype=np.float64), addresses.shape)
+        #last occurrence of each address: unique over the reversed batch
+        unique, last, counts = np.unique(addresses[::-1], return_index=True, return_counts=True)
+        last = len(addresses) - 1 - last
+        if not isinstance(names, dict): #any sample with a name names the device, not only its last one
+            names = {a: name for a, name in zip(addresses.tolist(), names) if name != "None"}
+        changed = False
+        for address, i, n in zip(unique.tolist(), last.tolist(), counts.tolist()):
+            name = names.get(address, "None")
+            if self.names.get(address) != name and (address not in self.names or name != "None"): #keep a name once known
+                self._set_name(address, name)
+                changed = True
+            self.last_seen[address] = float(times[i])
+            self.rssi[address] = int(round(float(rssis[i])))
+            self.count[address] = self.count.get(address, 0) + n
+            self._orders["last_seen"].set(address, -self.last_seen[address])
+            self._orders["strongest"].set(address, -self.rssi[address])
+            self._orders["most_seen"].set(address, -self.count[address])
+        return changed
+
+    def _set_name(self, address, name):
+        name = sys.intern(name)
+        self.names[address] = name
+        self.labels[address] = f"{sighting_frames.format_address(address)} ({name})"
+        self._search[address] = self.labels[address].lower()
+
+    def remove(self, addresses):
+        for address in addresses:
+            if self.names.pop(address, None) is None:
+                continue
+            del self.labels[address], self._search[address], self.last_seen[address], self.rssi[address], self.count[address]
+            for index in self._orders.values():
+                index.remove(address)
+
+    def view(self, order="last_seen", query="", limit=None): #addresses in order matching query, at most limit of them
+        #query matches anywhere in the label, so an address prefix ("c4:7d"), a bare hex prefix ("c47d") or part of a name
+        if order not in self._orders:
+            raise ValueError(f"Unknown order {order}, expected one of {', '.join(ORDERS)}")
+        query = query.strip().lower()
+        bare = query.replace(":", "")
+        hex_prefix = len(bare) > 0 and all(c in "0123456789abcdef" for c in bare)
+        result = []
+        for address in self._orders[order]:
+            if query and query not in self._search[address] and not (hex_prefix and f"{address:012x}".startswith(bare)):
+                continue
+            result.append(address)
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def label(self, address):
+        return self.labels[address]
@@ -0,0 +1,174 @@
+import collections
+import time
+import numpy as np # type: ignore
+
+#RSSI history for one device, kept in preallocated ring buffers so memory never grows
+class DeviceHistory:
+    def __init__(self, capacity, smoothed=False):
+        self.rssi = np.zeros(capacity, dtype=np.int8)
+        self.times = np.zeros(capacity, dtype=np.float64) #time of each sample, never decreasing so series() is sorted
+        self.smoothed = np.zeros(capacity, dtype=np.float32) if smoothed else None #filtered RSSI, see rssi_filter.py
+        self.capacity = capacity
+        self.reset(None)
+
+    def reset(self, name): #reuse the buffers for a new device
+        self.name = name
+        self.head = 0 #next slot to write
+        self.count = 0
+        self.total = 0 #samples ever appended, doubles as a version number for caches
+        self.last_seen = 0.0
+
+    def append(self, rssi, t):
+        if self.count:
+            t = max(t, self.last_seen)
+        self.rssi[self.head] = rssi
+        self.times[self.head] = t
+        if self.smoothed is not None:
+            self.smoothed[self.head] = rssi
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.total += 1
+        self.last_seen = t
+
+    def extend(self, rssi, t, smoothed=None): #vectorized append of a batch of samples
+        n = len(rssi)
+        if n == 0:
+            return
+        self.total += n
+        #send times from different observers, or after the clock estimate moved, can go backwards; decimation and
+        #the heatmap search the times, so a sample from before the last one is moved up to it
+        t = np.maximum.accumulate(np.maximum(t, self.last_seen) if self.count else t)
+        if n >= self.capacity: #only the newest samples survive
+            rssi = rssi[-self.capacity:]
+            t = t[-self.capacity:]
+            smoothed = None if smoothed is None else smoothed[-self.capacity:]
+            n = self.capacity
+        slots = (self.head + np.arange(n)) % self.capacity
+        self.rssi[slots] = rssi
+        self.times[slots] = t
+        if self.smoothed is not None:
+            self.smoothed[slots] = rssi if smoothed is None else smoothed #unfiltered samples stand in for themselves
+        self.head = (self.head + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+        self.last_seen = float(t[-1])
+
+    def series(self): #returns (times, rssi) oldest first; views when the buffer has not wrapped yet
+        if self.count < self.capacity:
+            return self.times[:self.count], self.rssi[:self.count]
+        order = np.r_[self.head:self.capacity, 0:self.head]
+        return self.times[order], self.rssi[order]
+
+    def smoothed_series(self): #filtered RSSI in the same order as series(), None if the store keeps none
+        if self.smoothed is None:
+            return None
+        if self.count < self.capacity:
+            return self.smoothed[:self.count]
+        return np.r_[self.smoothed[self.head:], self.smoothed[:self.head]]
+
+
+#all devices seen, bounded by max_devices; devices not seen for max_age seconds are evicted
+class DeviceStore:
+    def __init__(self, capacity=10_000, max_devices=2048, max_age=600.0, evict_interval=10.0, max_gaps=1000, smoothed=False):
+        self.capacity = capacity
+        self.smoothed = smoothed #also keep a filtered copy of every sample, 4 more bytes each
+        self.max_devices = max_devices
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self.devices = dict() #address -> DeviceHistory
+        self._free = [] #buffers of evicted devices, reused before allocating new ones
+        self._dropped = [] #devices pushed out because the store was full, reported by the next evict()
+        self._last_evict = 0.0
+        self.gaps = collections.deque(maxlen=max_gaps) #(start, end, observer id) of every time an observer link was down
+
+    def __contains__(self, address):
+        return address in self.devices
+
+    def __len__(self):
+        return len(self.devices)
+
+    def addresses(self):
+        return list(self.devices.keys())
+
+    def name(self, address):
+        return self.devices[address].name
+
+    def series(self, address):
+        return self.devices[address].series()
+
+    def smoothed_series(self, address):
+        return self.devices[address].smoothed_series()
+
+    def version(self, address): #changes whenever the device gets new samples
+        return self.devices[address].total
+
+    def add_gap(self, start, end, observer=0): #no data from an observer between start and end
+        self.gaps.append((start, end, observer))
+
+    def gap_times(self, address): #start time of each gap that falls inside a device's series
+        times = self.devices[address].series()[0]
+        if not self.gaps or len(times) == 0:
+            return np.empty(0, dtype=np.float64)
+        starts = np.array([start for start, end, observer in self.gaps], dtype=np.float64)
+        return starts[(starts > times.min()) & (starts < times.max())]
+
+    def _history(self, address, name, now):
+        history = self.devices.get(address)
+        if history is not None:
+            return history, False
+        if len(self.devices) >= self.max_devices: #full, drop the device seen longest ago
+            oldest = min(self.devices, key=lambda a: self.devices[a].last_seen)
+            self._free.append(self.devices.pop(oldest))
+            self._dropped.append(oldest)
+        history = self._free.pop() if self._free else DeviceHistory(self.capacity, self.smoothed)
+        history.reset(name)
+        history.last_seen = now
+        self.devices[address] = history
+        return history, True
+
+    def add(self, address, name, rssi, t=None): #returns True if the device is new
+        if t is None:
+            t = time.time()
+        history, new = self._history(address, name, t)
+        history.append(rssi, t)
+        return new
+
+    def add_batch(self, addresses, names, rssi, t=None, smoothed=None): #numpy arrays of addresses/rssi, names per sample or dict by address; returns new addresses
+        if t is None:
+            t = time.time()
+        addresses = np.asarray(addresses)
+        rssi = np.asarray(rssi)
+        times = np.broadcast_to(np.asarray(t, dtype=np.float64), addresses.shape)
+        unique, first, inverse = np.unique(addresses, return_index=True, return_inverse=True)
+        order = np.argsort(inverse, kind="stable") #group samples by device, keeping arrival order
+        bounds = np.searchsorted(inverse[order], np.arange(len(unique) + 1))
+        new = []
+        for i, address in enumerate(unique.tolist()):
+            idx = order[bounds[i]:bounds[i + 1]]
+            name = names.get(address, "None") if isinstance(names, dict) else names[first[i]]
+            history, is_new = self._history(address, name, float(times[idx[0]]))
+            history.extend(rssi[idx], times[idx], None if smoothed is None else smoothed[idx])
+            if is_new:
+                new.append(address)
+        return new
+
+    def replace(self, address, name, rssi, t, smoothed=None): #swap a device's samples for others, e.g. its history from an archive
+        history, is_new = self._history(address, name, float(t[-1]))
+        total = history.total
+        history.reset(name if name != "None" or is_new else history.name)
+        history.total = total #keep the version moving so cached plots redraw
+        history.extend(np.asarray(rssi), np.asarray(t, dtype=np.float64), smoothed)
+        return is_new
+
+    def due_for_eviction(self, now=None):
+        now = time.time() if now is None else now
+        return now - self._last_evict >= self.evict_interval
+
+    def evict(self, now=None): #drop devices not seen for max_age seconds, returns their addresses and those dropped since the last call
+        now = time.time() if now is None else now
+        self._last_evict = now
+        stale = [a for a, h in self.devices.items() if now - h.last_seen > self.max_age]
+        for address in stale:
+            self._free.append(self.devices.pop(address))
+        dropped = [a for a in self._dropped if a not in self.devices] #some came back since
+        self._dropped = []
+        return stale + dropped
@@ -0,0 +1,245 @@
+#Headless ingestion: connect to the observer Pico, decode its sighting frames and stream them out
+#as JSON Lines or CSV. No Tk or matplotlib, so it runs on machines without a display.
+#   python -m headless --format jsonl --output sightings.jsonl
+import argparse
+import archive
+import json
+import sys
+import time
+import instrumentation
+import reciever_modular
+import recording
+import rssi_filter
+import sighting_frames
+
+BUFFER_SIZE = 1 << 16 #bytes buffered before the file is written
+FLUSH_INTERVAL = 1.0 #seconds between forced flushes so tail -f keeps up
+SCAN_TIMEOUT = 5.0 #longest we scan for observers
+
+#writes decoded frames as one JSON object per sighting
+class JsonLinesWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write_header(self):
+        pass
+
+    def write_frame(self, t, frame, observer=0):
+        names = sighting_frames.frame_names(frame)
+        if frame.aggregates is not None: #aggregation mode, rssi is the window mean
+            a = frame.aggregates
+            self.stream.write("".join(
+                f'{{"time": {t:.3f}, "observer": {observer}, "address": "{sighting_frames.format_address(address)}", "name": {json.dumps(name)}, '
+                f'"rssi": {mean}, "count": {count}, "rssi_min": {low}, "rssi_max": {high}, "last_seen_ms": {last}}}\n'
+                for name, address, mean, count, low, high, last in zip(names, a["address"].tolist(), a["rssi_mean"].tolist(), a["count"].tolist(),
+                                                                       a["rssi_min"].tolist(), a["rssi_max"].tolist(), a["last_seen"].tolist())))
+            return
+        self.stream.write("".join(
+            f'{{"time": {t:.3f}, "observer": {observer}, "address": "{sighting_frames.format_address(address)}", "name": {json.dumps(name)}, "rssi": {rssi}}}\n'
+            for name, address, rssi in zip(names, frame.sightings["address"].tolist(), frame.sightings["rssi"].tolist())))
+
+def _quote(field): #CSV quoting, names can contain commas and quotes
+    return '"' + field.replace('"', '""') + '"'
+
+#writes decoded frames as CSV rows of time,observer,address,name,rssi,count,rssi_min,rssi_max
+class CsvWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write_header(self):
+        self.stream.write("time,observer,address,name,rssi,count,rssi_min,rssi_max\n")
+
+    def write_frame(self, t, frame, observer=0):
+        names = sighting_frames.frame_names(frame)
+        if frame.aggregates is not None: #aggregation mode, rssi is the window mean
+            a = frame.aggregates
+            self.stream.write("".join(
+                f'{t:.3f},{observer},{sighting_frames.format_address(address)},{_quote(name)},{mean},{count},{low},{high}\n'
+                for name, address, mean, count, low, high in zip(names, a["address"].tolist(), a["rssi_mean"].tolist(), a["count"].tolist(),
+                                                                 a["rssi_min"].tolist(), a["rssi_max"].tolist())))
+            return
+        self.stream.write("".join(
+            f'{t:.3f},{observer},{sighting_frames.format_address(address)},{_quote(name)},{rssi},1,{rssi},{rssi}\n'
+            for name, address, rssi in zip(names, frame.sightings["address"].tolist(), frame.sightings["rssi"].tolist())))
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter}
+
+def open_output(path):
+    if path == "-":
+        return open(sys.stdout.fileno(), "w", buffering=BUFFER_SIZE, encoding="utf-8", closefd=False)
+    return open(path, "a", buffering=BUFFER_SIZE, encoding="utf-8")
+
+def is_empty(stream): #nothing written yet, so a CSV header is due; pipes and terminals always start empty
+    try:
+        return stream.tell() == 0
+    except OSError:
+        return True
+
+def connect(adapter_index=0, name=reciever_modular.OBSERVER_NAME, addresses=(), connect_all=False, log=sys.stderr):
+    adapters = reciever_modular.get_available_adapters()
+    if len(adapters) == 0:
+        raise RuntimeError("No Bluetooth adapter available.")
+    adapter = adapters[adapter_index]
+    print(f"Scanning with {adapter.identifier()} [{adapter.address()}]...", file=log)
+    if addresses: #stop as soon as every requested observer has shown up
+        wanted = {a.lower() for a in addresses}
+        seen = set()
+        def stop_when(peripheral):
+            seen.add(peripheral.address().lower())
+            return wanted <= seen
+    elif connect_all: #can't know how many there are, scan for the whole timeout
+        stop_when = None
+    else:
+        stop_when = lambda peripheral: reciever_modular.is_observer(peripheral, name)
+    found = reciever_modular.scan_incremental(adapter, lambda peripheral: None, stop_when, SCAN_TIMEOUT)
+    if addresses:
+        peripherals = [reciever_modular.find_observer(found, name, address) for address in addresses]
+        missing = [a for a, p in zip(addresses, peripherals) if p is None]
+        if missing:
+            raise RuntimeError(f"Observers {', '.join(missing)} not found.")
+    else:
+        peripherals = reciever_modular.find_observers(found, name)
+        if not peripherals:
+            raise RuntimeError(f"Observer {name} not found.")
+        if not connect_all:
+            peripherals = peripherals[:1]
+    manager = reciever_modular.SessionManager()
+    for peripheral in peripherals:
+        manager.add(peripheral)
+    print(f"Connecting to {len(peripherals)} observer(s)...", file=log)
+    for session in manager.connect_all():
+        print(f"  observer {session.observer_id}: {session.name()}", file=log)
+    for session in manager.sessions.values():
+        if not session.connected:
+            print(f"  could not connect to {session.name()}: {session.error}", file=log)
+    return manager
+
+def run(manager, writer, stream, duration=None, recorder=None, stats_interval=None, metrics=None, smoother=None, sighting_archive=None):
+    #sighting_archive: archive.Archive to also store sightings in; metrics: path to dump timings to, see instrumentation.dump; smoother: rssi_filter.RssiFilter whose arrivals/departures go to stderr
+    manager.supervise_all(on_gap=lambda observer, lost, restored: print(json.dumps({"observer": observer, "gap": [lost, restored]}), file=sys.stderr),
+                          on_status=lambda message: print(message, file=sys.stderr))
+    manager.subscribe_all()
+    if is_empty(stream): #appending to an earlier capture, which has its header already
+        writer.write_header()
+    deadline = None if duration is None else time.monotonic() + duration
+    last_flush = last_stats = time.monotonic()
+    frames = 0
+    while deadline is None or time.monotonic() < deadline:
+        for t, observer, frame in manager.drain(timeout=FLUSH_INTERVAL):
+            started = instrumentation.start()
+            writer.write_frame(t, frame, observer)
+            if recorder is not None:
+                recorder.write_frame(t, frame, observer)
+            instrumentation.record("write", started, len(frame.sightings))
+            if sighting_archive is not None:
+                started = instrumentation.start()
+                sighting_archive.add_frame(t, frame, observer)
+                instrumentation.record("archive", started, len(frame.sightings))
+            if smoother is not None:
+                started = instrumentation.start()
+                print_presence(smoother.update(frame.sightings["address"], frame.sightings["rssi"], t)[1])
+                instrumentation.record("filter", started, len(frame.sightings))
+            frames += 1
+        now = time.monotonic()
+        if now - last_flush >= FLUSH_INTERVAL:
+            if smoother is not None: #timeouts, checked over every device so only once per flush
+                print_presence(smoother.expire(time.time()))
+            stream.flush()
+            if recorder is not None:
+                recorder.flush()
+            if sighting_archive is not None:
+                sighting_archive.flush()
+            last_flush = now
+        if stats_interval and now - last_stats >= stats_interval:
+            for s in manager.stats():
+                print(f"observer {s['observer']} {s['name']}: {s['sightings_per_s']:.0f} sightings/s, "
+                      f"{s['notifications_per_s']:.0f} notifications/s, {s['lost_frames']} frames lost, {s['reconnects']} reconnects" +
+                      ("" if s['pico_dropped'] is None else f", {s['pico_dropped']} dropped on the Pico"), file=sys.stderr)
+            if metrics:
+                instrumentation.dump(metrics)
+            last_stats = now
+    return frames
+
+def print_presence(events):
+    for t, address, event in events:
+        print(json.dumps({"time": round(t, 3), "address": sighting_frames.format_address(address), "event": event}), file=sys.stderr)
+
+def scan_config(args): #ScanConfig from the --scan-* options, None to leave the observers alone
+    fields = {"duration_ms": args.scan_duration, "pause_ms": args.scan_pause, "interval_us": args.scan_interval,
+              "window_us": args.scan_window, "throttle_ms": args.scan_throttle,
+              "active": args.scan_active or None, "aggregate": args.scan_aggregate or None}
+    fields = {key: value for key, value in fields.items() if value is not None}
+    return reciever_modular.ScanConfig(**fields) if fields else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream sightings from the observer Pico without the GUI.")
+    parser.add_argument("--adapter", type=int, default=0, help="index of the Bluetooth adapter to use")
+    parser.add_argument("--name", default=reciever_modular.OBSERVER_NAME, help="name the observer advertises")
+    parser.add_argument("--address", action="append", default=[], help="connect to this observer address instead of matching the name, repeat for several")
+    parser.add_argument("--all", action="store_true", help="connect to every observer advertising the name")
+    parser.add_argument("--stats", type=float, help="print per-observer throughput to stderr every this many seconds")
+    parser.add_argument("--metrics", help="record per-stage latencies and write them as JSON to this file (- for stderr), "
+                                          "every --stats interval and on exit")
+    parser.add_argument("--presence", choices=rssi_filter.METHODS, help="smooth RSSI with this filter and print device "
+                                                                         "arrivals/departures to stderr as JSON lines")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parser.add_argument("--output", default="-", help="file to append to, - for stdout")
+    parser.add_argument("--record", help="also append sightings to this binary recording (see recording.py)")
+    parser.add_argument("--archive", help="also store sightings in this SQLite archive (see archive.py)")
+    parser.add_argument("--duration", type=float, help="seconds to run, default until interrupted")
+    parser.add_argument("--scan-duration", type=int, help="set the observers' scan window, ms")
+    parser.add_argument("--scan-pause", type=int, help="set the observers' pause between scan windows, ms")
+    parser.add_argument("--scan-interval", type=int, help="set the observers' radio scan interval, us")
+    parser.add_argument("--scan-window", type=int, help="set the observers' radio scan window, us (at most the interval)")
+    parser.add_argument("--scan-active", action="store_true", help="set the observers to active scanning")
+    parser.add_argument("--scan-aggregate", action="store_true", help="set the observers to aggregation mode")
+    parser.add_argument("--scan-throttle", type=int, help="set the observers' pause after every scan result, ms")
+    parser.add_argument("--simulate", action="store_true", help="use the simulated observer instead of a Bluetooth adapter")
+    parser.add_argument("--sim-observers", type=int, default=1, help="simulated observer Picos")
+    parser.add_argument("--sim-devices", type=int, default=50, help="simulated devices in range of each observer")
+    parser.add_argument("--sim-rate", type=float, default=200.0, help="simulated sightings per second")
+    parser.add_argument("--sim-jitter", type=float, default=0.2, help="simulated timing jitter, fraction of a tick")
+    parser.add_argument("--sim-replay", help="stream this recording instead of synthetic sightings")
+    parser.add_argument("--sim-aggregate", action="store_true", help="simulate the Pico's aggregation mode")
+    parser.add_argument("--sim-drop-every", type=float, help="simulate the link dropping every this many seconds")
+    parser.add_argument("--sim-loss", type=float, default=0.0, help="simulated fraction of notifications lost")
+    args = parser.parse_args(argv)
+
+    if args.simulate:
+        import simulated_ble
+        simulated_ble.configure(observers=args.sim_observers, devices=args.sim_devices, rate=args.sim_rate, jitter=args.sim_jitter, replay=args.sim_replay,
+                                drop_every=args.sim_drop_every, aggregate=args.sim_aggregate, loss=args.sim_loss)
+        reciever_modular.set_transport(simulated_ble)
+
+    if args.metrics:
+        instrumentation.enable()
+    try: #before connecting, so a file that isn't a recording fails right away
+        recorder = recording.Recorder(args.record) if args.record else None
+    except ValueError as e:
+        parser.error(str(e))
+    manager = connect(args.adapter, args.name, args.address, args.all)
+    config = scan_config(args)
+    if config is not None:
+        for observer, result in manager.set_scan_config_all(config).items():
+            print(f"observer {observer} scan config: {result}", file=sys.stderr)
+    stream = open_output(args.output)
+    sighting_archive = archive.Archive(args.archive) if args.archive else None
+    try:
+        smoother = rssi_filter.RssiFilter(args.presence) if args.presence else None
+        run(manager, WRITERS[args.format](stream), stream, args.duration, recorder, args.stats, args.metrics, smoother, sighting_archive)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stream.flush()
+        if args.output != "-":
+            stream.close()
+        if recorder is not None:
+            recorder.close()
+        if sighting_archive is not None:
+            sighting_archive.close()
+        manager.disconnect_all()
+        if args.metrics:
+            instrumentation.dump(args.metrics)
+
+if __name__ == "__main__":
+    main()
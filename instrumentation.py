@@ -0,0 +1,111 @@
+#Per-stage counters and latency histograms for the receive -> decode -> store -> log -> render pipeline.
+#Off by default; while off, start() returns 0.0 and record() returns straight away, so instrumented code
+#pays one call and one comparison per stage:
+#   started = instrumentation.start()
+#   frame = sighting_frames.decode_frame(data)
+#   instrumentation.record("decode", started, len(frame.sightings))
+import json
+import math
+import sys
+import threading
+import time
+
+STAGES = ["receive", "queue", "link", "decode", "filter", "store", "log", "write", "archive", "render"] #display order, others are listed after
+BUCKETS = 28 #power of two buckets from 1 us up to about 2 minutes
+
+enabled = False
+_stages = dict() #name -> Histogram
+_lock = threading.Lock() #the receive stage is recorded from BLE threads
+_since = time.monotonic()
+
+def enable(on=True): #turning it on starts from empty histograms
+    global enabled
+    if on and not enabled:
+        reset()
+    enabled = on
+
+#Latency histogram of one stage with log2 buckets, plus how many calls and items went through it
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.items = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds, items=1):
+        self.count += 1
+        self.items += items
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        us = seconds * 1e6
+        self.buckets[min(int(math.log2(us)) + 1, BUCKETS - 1) if us >= 1 else 0] += 1
+
+    def percentile(self, p): #upper bound of the bucket holding the p-th percentile, in seconds
+        if self.count == 0:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(2 ** i / 1e6, self.max)
+        return self.max
+
+    def summary(self, elapsed):
+        return {
+            "count": self.count,
+            "items": self.items,
+            "items_per_s": self.items / elapsed if elapsed > 0 else 0.0,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+            "busy": self.total / elapsed if elapsed > 0 else 0.0, #fraction of wall time spent in this stage
+        }
+
+def start():
+    return time.perf_counter() if enabled else 0.0
+
+def record(stage, started, items=1): #time since started, from start()
+    if not started:
+        return
+    add(stage, time.perf_counter() - started, items)
+
+def add(stage, seconds, items=1): #a latency measured some other way, e.g. queue wait or link delay
+    if not enabled:
+        return
+    with _lock:
+        histogram = _stages.get(stage)
+        if histogram is None:
+            histogram = _stages[stage] = Histogram()
+        histogram.add(max(seconds, 0.0), items)
+
+def reset():
+    global _since
+    with _lock:
+        _stages.clear()
+        _since = time.monotonic()
+
+def snapshot(): #stage -> summary dict, since enable() or the last reset()
+    elapsed = time.monotonic() - _since
+    with _lock:
+        names = [s for s in STAGES if s in _stages] + sorted(s for s in _stages if s not in STAGES)
+        return {name: _stages[name].summary(elapsed) for name in names}
+
+def dumps():
+    return json.dumps({"time": time.time(), "stages": snapshot()}, indent=2)
+
+def dump(path): #"-" for stderr; files are rewritten whole so readers always see a complete document
+    if path == "-":
+        print(dumps(), file=sys.stderr)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(dumps())
+
+def format_lines(stages=None): #text for a status label, one line per stage: latencies, rate and busy share
+    stages = snapshot() if stages is None else stages
+    return "\n".join(f"{name:<8} p50 {s['p50_ms']:7.2f} ms  p95 {s['p95_ms']:7.2f} ms  max {s['max_ms']:8.2f} ms  "
+                     f"{s['items_per_s']:8.0f}/s  busy {s['busy'] * 100:5.1f}%" for name, s in stages.items())
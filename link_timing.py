@@ -0,0 +1,66 @@
+import collections
+import sighting_frames
+
+#Per-link bookkeeping for the frame header's sequence number and Pico timestamp (sighting_frames version 2).
+TICKS_PERIOD = sighting_frames.TICKS_PERIOD
+SEQUENCE_PERIOD = 1 << 16
+
+#Maps the Pico's ticks_ms to desktop wall-clock time. Every frame gives an upper bound on the offset
+#(receive time - Pico time = offset + link delay), so the smallest one over the last window seconds is the
+#estimate: it converges on the least-delayed frames and still follows slow drift between the two clocks.
+class LinkClock:
+    def __init__(self, window=30.0, max_jump=5.0):
+        self.window = window
+        self.max_jump = max_jump #seconds the Pico's clock may jump before it counts as restarted
+        self.reset()
+
+    def reset(self): #new link or Pico restarted, forget everything
+        self._ticks = None
+        self._device_ms = 0 #unwrapped Pico time
+        self._candidates = collections.deque() #(receive time, offset) with increasing offsets, for the sliding minimum
+        self.offset = None
+        self.delay = 0.0 #receive time minus estimated send time of the last frame
+
+    def to_host(self, ticks, received): #Pico ticks_ms of a frame -> wall-clock time it was sent
+        if self._ticks is not None:
+            delta = (ticks - self._ticks) % TICKS_PERIOD
+            if delta >= TICKS_PERIOD // 2: #a frame from just before the previous one
+                delta -= TICKS_PERIOD
+            if delta < -self.max_jump * 1000: #ticks_ms went back: the Pico rebooted, so the offset jumps up
+                self.reset()
+                return self.to_host(ticks, received)
+            self._device_ms += delta
+        self._ticks = ticks
+        device = self._device_ms / 1000
+        offset = received - device
+        if self.offset is not None and offset < self.offset - self.max_jump: #ticks_ms leapt ahead, e.g. after a reboot long ago
+            self.reset()
+            return self.to_host(ticks, received)
+        while self._candidates and self._candidates[-1][1] >= offset:
+            self._candidates.pop()
+        self._candidates.append((received, offset))
+        while self._candidates[0][0] < received - self.window:
+            self._candidates.popleft()
+        self.offset = self._candidates[0][1]
+        self.delay = offset - self.offset
+        return device + self.offset
+
+
+#Counts frames missing from a link, from the gaps in their 16 bit sequence numbers
+class SequenceCounter:
+    def __init__(self):
+        self.lost = 0
+        self.reset()
+
+    def reset(self): #the next frame starts a new sequence, totals are kept
+        self._last = None
+
+    def add(self, seq): #returns how many frames went missing right before this one
+        missed = 0
+        if self._last is not None:
+            missed = (seq - self._last - 1) % SEQUENCE_PERIOD
+            if missed >= SEQUENCE_PERIOD // 2: #duplicate or late frame, not a loss
+                return 0
+            self.lost += missed
+        self._last = seq
+        return missed
@@ -0,0 +1,78 @@
+import collections
+import time
+import tkinter as tk
+import sighting_frames
+
+#Wraps the notification ScrolledText so it can't grow forever or cost one insert per sighting.
+#write()/add_sightings() only queue text and are safe to call from any thread,
+#flush() does one insert per frame on the Tk thread and trims old lines in batches.
+#In summary mode sightings are not printed, only one line per second with how many were seen.
+class LogView:
+    def __init__(self, text, max_lines=5000, trim_batch=500):
+        self.text = text
+        self.max_lines = max_lines
+        self.trim_batch = trim_batch #trim only once this many lines are over the limit
+        self.summary = False
+        self.lines = 0 #lines currently in the widget
+        self._pending = collections.deque() #chunks of text waiting for the next flush
+        self._second = None #second being counted in summary mode
+        self._count = 0
+        self._devices = set()
+
+    def write(self, message):
+        self._pending.append(message)
+
+    def add_sightings(self, names, addresses, rssis): #names list, address/rssi lists of one frame
+        if not self.summary:
+            self._pending.append("".join(f"GOT: Name: {name}, Address: {sighting_frames.format_address(address)}, RSSI: {rssi}\n"
+                                         for name, address, rssi in zip(names, addresses, rssis)))
+            return
+        self._add_counts(len(addresses), addresses)
+
+    def add_aggregates(self, names, aggregates): #names list and AGGREGATE_DTYPE array of one aggregated frame
+        addresses = aggregates["address"].tolist()
+        if not self.summary:
+            self._pending.append("".join(
+                f"AGG: Name: {name}, Address: {sighting_frames.format_address(address)}, Seen: {count}, RSSI min/mean/max: {low}/{mean}/{high}\n"
+                for name, address, count, low, mean, high in zip(names, addresses, aggregates["count"].tolist(),
+                                                                  aggregates["rssi_min"].tolist(), aggregates["rssi_mean"].tolist(),
+                                                                  aggregates["rssi_max"].tolist())))
+            return
+        self._add_counts(int(aggregates["count"].sum()), addresses)
+
+    def _add_counts(self, count, addresses):
+        second = int(time.time())
+        if second != self._second:
+            self._summarize()
+            self._second = second
+        self._count += count
+        self._devices.update(addresses)
+
+    def set_summary(self, summary):
+        self._summarize()
+        self.summary = summary
+
+    def _summarize(self): #queue the line for the second that just ended
+        if self._count > 0:
+            stamp = time.strftime("%H:%M:%S", time.localtime(self._second))
+            self._pending.append(f"{stamp}  {self._count} sightings from {len(self._devices)} devices\n")
+        self._count = 0
+        self._devices = set()
+
+    def flush(self): #call on the Tk thread, once per frame
+        if self.summary and self._second is not None and int(time.time()) != self._second:
+            self._summarize()
+            self._second = None
+        if not self._pending:
+            return
+        chunks = []
+        while self._pending:
+            chunks.append(self._pending.popleft())
+        message = "".join(chunks)
+        self.text.insert(tk.END, message)
+        self.lines += message.count("\n")
+        if self.lines > self.max_lines + self.trim_batch:
+            remove = self.lines - self.max_lines
+            self.text.delete("1.0", f"{remove + 1}.0")
+            self.lines -= remove
+        self.text.see(tk.END)
@@ -9,18 +9,64 @@ import asyncio
 import aioble
 import bluetooth
 
+import gc
 import random
 import struct
+import time
 
 # org.bluetooth.service.unique
 _ENV_SENSE_UUID = bluetooth.UUID("a9d6ede1-f904-4419-b4ea-02d9d5af1577")
 # org.bluetooth.characteristic.unique
 _ENV_SENSE_TEMP_UUID = bluetooth.UUID("497d8d32-1e96-42b9-8041-d3ee7acc24e0")
+# Writable scan settings, see apply_config below.
+_CONTROL_UUID = bluetooth.UUID("4d426505-ee3b-4dde-85c1-f9ca738d7960")
 # org.bluetooth.characteristic.gap.appearance.xml
 _ADV_APPEARANCE_GENERIC_THERMOMETER = const(128)
 
-# How frequently to send advertising beacons.
-_ADV_INTERVAL_MS = 5_000
+# How frequently to send advertising beacons, in ms (aioble takes it in us).
+adv_interval_ms = 100
+
+# Sighting frame format, must match sighting_frames.py on the desktop.
+_FRAME_VERSION = const(2)
+_FRAME_SIGHTINGS = const(0)
+_FRAME_AGGREGATES = const(1)
+_FRAME_STATS = const(2)
+_NO_NAME = const(0xFF)
+_HEADER_SIZE = const(10)  # version, kind, name count, record count, sequence number, ticks_ms
+_RECORD_SIZE = const(8)
+_AGGREGATE_SIZE = const(14)
+_STATS_SIZE = const(15)
+_MAX_NAME_LEN = const(31)
+
+# Aggregation mode: instead of one record per advertisement, keep a table per scan window
+# and send one record per device (count, min/max/mean RSSI, last seen) when the window ends.
+AGGREGATE = False
+_MAX_WINDOW_DEVICES = const(256)  # devices per window table, later new devices are counted as dropped
+
+# Scan duty cycle, all changeable at runtime through the control characteristic.
+scan_duration_ms = 1000  # length of one scan window
+scan_pause_ms = 500  # idle time between windows
+scan_interval_us = 1_280_000  # radio scan interval and window inside a scan, see aioble.scan
+scan_window_us = 11_250
+scan_active = False  # active scanning asks for scan responses (more names, more radio time)
+throttle_ms = 0  # pause after every scan result
+
+# Control characteristic payload, must match reciever_modular.ScanConfig:
+#   version, duration ms, pause ms, interval us, window us, flags (1 active, 2 aggregate), throttle ms, advertising interval ms
+_CONFIG_VERSION = const(1)
+_CONFIG_FORMAT = "<BHHIIBBH"
+_FLAG_ACTIVE = const(1)
+_FLAG_AGGREGATE = const(2)
+
+# MTU we ask the central for; notifications carry at most MTU - 3 bytes.
+_PREFERRED_MTU = const(247)
+_DEFAULT_PAYLOAD = const(20)
+
+# Automatic garbage collection is off during a scan window. aioble still allocates per result, so every
+# _GC_CHECK_EVERY results the free heap is checked and collected early if it fell below _GC_RESERVE bytes,
+# rather than running out (a disabled collector does not collect on a failed allocation).
+_GC_RESERVE = const(24 * 1024)
+_GC_CHECK_EVERY = const(32)
 
 
 # Register GATT server.
@@ -28,40 +74,270 @@ temp_service = aioble.Service(_ENV_SENSE_UUID)
 temp_characteristic = aioble.Characteristic(
     temp_service, _ENV_SENSE_TEMP_UUID, read=True, notify=True
 )
+control_characteristic = aioble.Characteristic(
+    temp_service, _CONTROL_UUID, read=True, write=True, capture=True
+)
 aioble.register_services(temp_service)
 
 
-# Helper to encode the temperature characteristic encoding (sint16, hundredths of a degree).
+def current_config():
+    flags = (_FLAG_ACTIVE if scan_active else 0) | (_FLAG_AGGREGATE if AGGREGATE else 0)
+    return struct.pack(_CONFIG_FORMAT, _CONFIG_VERSION, scan_duration_ms, scan_pause_ms, scan_interval_us,
+                       scan_window_us, flags, throttle_ms, adv_interval_ms)
+
+
+# Take new scan settings from the control characteristic; they apply from the next scan window.
+def apply_config(data):
+    global scan_duration_ms, scan_pause_ms, scan_interval_us, scan_window_us, scan_active, throttle_ms, adv_interval_ms, AGGREGATE
+    if len(data) != struct.calcsize(_CONFIG_FORMAT) or data[0] != _CONFIG_VERSION:
+        print("Ignoring bad config", data)
+        return
+    _, duration, pause, interval, window_us, flags, throttle, adv = struct.unpack(_CONFIG_FORMAT, data)
+    scan_duration_ms = max(duration, 100)
+    scan_pause_ms = pause
+    scan_interval_us = max(interval, 2500)  # controller limits
+    scan_window_us = min(max(window_us, 2500), scan_interval_us)
+    scan_active = bool(flags & _FLAG_ACTIVE)
+    AGGREGATE = bool(flags & _FLAG_AGGREGATE)
+    throttle_ms = throttle
+    adv_interval_ms = max(adv, 20)
+
+
+control_characteristic.write(current_config())
+
+
+payload_max = _DEFAULT_PAYLOAD  # largest notification the current connection accepts
+
+# The notify path works in these buffers only, so a sighting costs no heap allocation and
+# the garbage collector only runs when we ask it to, between scan windows (see sensor_task).
+_frame = bytearray(_PREFERRED_MTU - 3)  # header, name table and records, assembled by flush_frame
+_frame_mv = memoryview(_frame)
+_names = bytearray(_PREFERRED_MTU - 3)  # name table being built: length byte + name, repeated
+_names_mv = memoryview(_names)
+_name_offsets = bytearray(_NO_NAME)  # where each name starts in _names
+_records = bytearray(_PREFERRED_MTU - 3)  # records being built
+_records_mv = memoryview(_records)
+frame_kind = _FRAME_SIGHTINGS
+name_count = 0
+names_size = 0
+records_size = 0
+frame_count = 0
+frame_seq = 0  # numbers every frame sent so the desktop can count the ones it missed
+
+window = {}  # aggregation mode: address -> [count, min, max, sum, last seen ms, name]
+
+# Reported to the desktop in a stats frame after every scan window.
+results_seen = 0
+results_dropped = 0  # results that never reached the desktop: notify failed or the window table was full
+gc_ms = 0  # how long the last scheduled collection took
+
+
+# Send the pending records as one notification and start a new frame.
+def flush_frame():
+    global name_count, names_size, records_size, frame_count, frame_seq, results_dropped
+    if not frame_count:
+        return
+    struct.pack_into("<BBBBHI", _frame, 0, _FRAME_VERSION, frame_kind, name_count, frame_count, frame_seq, time.ticks_ms())
+    frame_seq = (frame_seq + 1) & 0xFFFF
+    end = _HEADER_SIZE + names_size
+    _frame_mv[_HEADER_SIZE:end] = _names_mv[:names_size]
+    _frame_mv[end:end + records_size] = _records_mv[:records_size]
+    try:
+        temp_characteristic.write(_frame_mv[:end + records_size], send_update=True)
+    except OSError:
+        if frame_kind != _FRAME_STATS:
+            results_dropped += frame_count
+    name_count = 0
+    names_size = 0
+    records_size = 0
+    frame_count = 0
+
 
+# Index of the name src[start:start + n] in the frame's name table, _NO_NAME if it isn't there.
+def find_name(src, start, n):
+    for i in range(name_count):
+        offset = _name_offsets[i]
+        if _names[offset] != n:
+            continue
+        j = 0
+        while j < n and _names[offset + 1 + j] == src[start + j]:
+            j += 1
+        if j == n:
+            return i
+    return _NO_NAME
 
-#observe all advertising sends for 1 second, update the characteristic for every system found
+
+# Reserve room for one record of size bytes (without its trailing name index), flushing first if it
+# would not fit, and add the name src[start:start + n] (n = 0 for none) to the name table.
+# Returns the offset in _records to pack the record at.
+def add_record(kind, size, src, start, n):
+    global frame_kind, name_count, names_size, records_size, frame_count
+    if kind != frame_kind:
+        flush_frame()
+        frame_kind = kind
+    name = find_name(src, start, n) if n else _NO_NAME
+    new_name = n and name == _NO_NAME
+    needed = size + 1 + (1 + n if new_name else 0)
+    if _HEADER_SIZE + names_size + records_size + needed > payload_max:
+        flush_frame()
+        new_name = n > 0
+        needed = size + 1 + (1 + n if new_name else 0)
+    if new_name and (name_count == _NO_NAME or _HEADER_SIZE + names_size + records_size + needed > payload_max):
+        # no room left for the name, send the record without it
+        new_name = False
+    if new_name:
+        _name_offsets[name_count] = names_size
+        _names[names_size] = n
+        for j in range(n):
+            _names[names_size + 1 + j] = src[start + j]
+        names_size += 1 + n
+        name = name_count
+        name_count += 1
+    offset = records_size
+    _records[offset + size] = name
+    records_size += size + 1
+    frame_count += 1
+    return offset
+
+
+# Offset of the local name in an advertising payload, -1 if there is none. Unlike result.name()
+# this doesn't decode the name into a new string; its length is adv[offset - 2] - 1.
+def find_adv_name(adv):
+    i = 0
+    while i + 1 < len(adv):
+        if adv[i] >= 1 and (adv[i + 1] == 0x09 or adv[i + 1] == 0x08):  # complete or shortened local name; a 0 length has no type
+            return i + 2
+        i += 1 + adv[i]
+    return -1
+
+
+def add_sighting(result):
+    global results_seen
+    results_seen += 1
+    adv = result.adv_data
+    start = find_adv_name(adv) if adv else -1
+    if start < 0 and result.resp_data:  # active scanning: the name may be in the scan response
+        adv = result.resp_data
+        start = find_adv_name(adv)
+    n = max(0, min(adv[start - 2] - 1, len(adv) - start, _MAX_NAME_LEN)) if start >= 0 else 0
+    offset = add_record(_FRAME_SIGHTINGS, _RECORD_SIZE - 1, adv, start, n)
+    struct.pack_into("<6sb", _records, offset, result.device.addr, result.rssi)
+
+
+def result_name(result):
+    name = result.name()
+    return name.encode("utf-8")[:_MAX_NAME_LEN] if name else None
+
+
+# Aggregation mode: fold one advertisement into the window's table.
+# Only a device's first sighting in a window allocates (its table entry and name).
+def aggregate_sighting(result, started):
+    global results_seen, results_dropped
+    results_seen += 1
+    addr = result.device.addr
+    rssi = result.rssi
+    entry = window.get(addr)
+    if entry is None:
+        if len(window) >= _MAX_WINDOW_DEVICES:
+            results_dropped += 1
+            return
+        window[addr] = [1, rssi, rssi, rssi, time.ticks_diff(time.ticks_ms(), started), result_name(result)]
+        return
+    entry[0] += 1
+    if rssi < entry[1]:
+        entry[1] = rssi
+    if rssi > entry[2]:
+        entry[2] = rssi
+    entry[3] += rssi
+    entry[4] = time.ticks_diff(time.ticks_ms(), started)
+    if entry[5] is None:
+        entry[5] = result_name(result)
+
+
+# Aggregation mode: one record per device seen in the window, then start an empty table.
+def flush_window():
+    global window
+    for addr, (count, low, high, total, last, name) in window.items():
+        offset = add_record(_FRAME_AGGREGATES, _AGGREGATE_SIZE - 1, name, 0, len(name) if name else 0)
+        struct.pack_into("<6sHbbbH", _records, offset, addr, min(count, 0xFFFF), low, high, total // count, min(last, 0xFFFF))
+    window = {}
+    flush_frame()
+
+
+# One stats record per scan window so the desktop can see what the Pico could not deliver.
+def send_stats():
+    offset = add_record(_FRAME_STATS, _STATS_SIZE - 1, None, 0, 0)
+    struct.pack_into("<IIIH", _records, offset, results_seen, results_dropped, gc.mem_free(), min(gc_ms, 0xFFFF))
+    flush_frame()
+
+
+#observe all advertising sends for 1 second, batch every system found into as few notifications as fit the MTU
 async def sensor_task():
+    global gc_ms
+    while True:
+        started = time.ticks_ms()
+        aggregate = AGGREGATE  # a config write mid-window takes effect next window
+        gc.disable()
+        try:
+            async with aioble.scan(duration_ms=scan_duration_ms, interval_us=scan_interval_us,
+                                   window_us=scan_window_us, active=scan_active) as scanner:
+                async for result in scanner:
+                    if aggregate:
+                        aggregate_sighting(result, started)
+                    else:
+                        add_sighting(result)
+                    if results_seen % _GC_CHECK_EVERY == 0 and gc.mem_free() < _GC_RESERVE:
+                        gc.collect()
+                    if throttle_ms:
+                        await asyncio.sleep_ms(throttle_ms)
+                if aggregate:
+                    flush_window()
+                else:
+                    flush_frame()
+        finally:
+            gc.enable()
+        # Collect now, while the radio is idle, so the next window starts with the heap free.
+        collect_started = time.ticks_ms()
+        gc.collect()
+        gc_ms = time.ticks_diff(time.ticks_ms(), collect_started)
+        send_stats()
+        await asyncio.sleep_ms(scan_pause_ms)
+
+
+# Apply every write to the control characteristic and publish the values actually used.
+async def control_task():
     while True:
-        async with aioble.scan(duration_ms=1000) as scanner:
-            async for result in scanner:
-                temp_characteristic.write((str(result.name()) + "," + str(result.device) + "," + str(result.rssi)).encode('utf-8'), send_update = True)
-                await asyncio.sleep_ms(10)
-            await asyncio.sleep_ms(500)
+        _, data = await control_characteristic.written()
+        apply_config(data)
+        control_characteristic.write(current_config())
 
 # Serially wait for connections. Don't advertise while a central is
 # connected.
 async def peripheral_task():
+    global payload_max
     while True:
         async with await aioble.advertise(
-            _ADV_INTERVAL_MS,
+            adv_interval_ms * 1000,
             name="mpy-temp",
             services=[_ENV_SENSE_UUID],
             appearance=_ADV_APPEARANCE_GENERIC_THERMOMETER,
         ) as connection:
             print("Connection from", connection.device)
+            try:
+                await connection.exchange_mtu(_PREFERRED_MTU)
+            except Exception as e:
+                print("MTU exchange failed", e)
+            payload_max = min(connection.mtu or _DEFAULT_PAYLOAD + 3, _PREFERRED_MTU) - 3  # frame buffers are sized for our MTU
             await connection.disconnected(timeout_ms=None)
+            payload_max = _DEFAULT_PAYLOAD
 
 
 # Run both tasks.
 async def main():
     t1 = asyncio.create_task(sensor_task())
     t2 = asyncio.create_task(peripheral_task())
-    await asyncio.gather(t1, t2)
+    t3 = asyncio.create_task(control_task())
+    await asyncio.gather(t1, t2, t3)
 
 
 asyncio.run(main())
@@ -1,26 +1,371 @@
-import simplepyble # type: ignore
+import collections
+import importlib
+import os
+import queue
+import random
+import struct
+import threading
 import time
+import instrumentation
+import link_timing
+import sighting_frames
+
+#what micropython/main.py advertises and serves
+OBSERVER_NAME = "mpy-temp"
+OBSERVER_SERVICE_UUID = "a9d6ede1-f904-4419-b4ea-02d9d5af1577"
+OBSERVER_CHARACTERISTIC_UUID = "497d8d32-1e96-42b9-8041-d3ee7acc24e0"
+OBSERVER_CONTROL_UUID = "4d426505-ee3b-4dde-85c1-f9ca738d7960" #writable scan settings, same service
+
+#Scan duty cycle of an observer, written to its control characteristic. Times as the Pico takes them:
+#duration/pause/throttle/advertising in ms, radio interval/window in us. Must match _CONFIG_FORMAT in micropython/main.py.
+ScanConfig = collections.namedtuple("ScanConfig", ["duration_ms", "pause_ms", "interval_us", "window_us", "active",
+                                                   "aggregate", "throttle_ms", "adv_interval_ms"],
+                                    defaults=[1000, 500, 1_280_000, 11_250, False, False, 0, 100])
+CONFIG_VERSION = 1
+CONFIG_FORMAT = struct.Struct("<BHHIIBBH")
+CONFIG_ACTIVE = 1
+CONFIG_AGGREGATE = 2
+
+def encode_scan_config(config):
+    flags = (CONFIG_ACTIVE if config.active else 0) | (CONFIG_AGGREGATE if config.aggregate else 0)
+    return CONFIG_FORMAT.pack(CONFIG_VERSION, config.duration_ms, config.pause_ms, config.interval_us, config.window_us,
+                              flags, config.throttle_ms, config.adv_interval_ms)
+
+def decode_scan_config(data):
+    if len(data) != CONFIG_FORMAT.size or data[0] != CONFIG_VERSION:
+        raise ValueError(f"Not a version {CONFIG_VERSION} scan config: {bytes(data)!r}")
+    _, duration, pause, interval, window, flags, throttle, adv = CONFIG_FORMAT.unpack(data)
+    return ScanConfig(duration, pause, interval, window, bool(flags & CONFIG_ACTIVE), bool(flags & CONFIG_AGGREGATE), throttle, adv)
+
+#module providing the simplepyble API; BLE_TRANSPORT=simulated swaps in simulated_ble for testing without a radio
+TRANSPORTS = {"simplepyble": "simplepyble", "simulated": "simulated_ble"}
+transport = None
+
+def set_transport(module): #a module with the simplepyble Adapter/Peripheral API, or a name from TRANSPORTS
+    global transport
+    transport = importlib.import_module(TRANSPORTS.get(module, module)) if isinstance(module, str) else module
+
+def get_transport():
+    if transport is None:
+        set_transport(os.environ.get("BLE_TRANSPORT", "simplepyble"))
+    return transport
 
 def get_available_adapters():
-    return simplepyble.Adapter.get_adapters() #returns a list of adapter objects
+    return get_transport().Adapter.get_adapters() #returns a list of adapter objects
 
 def scan_for_devices(adapter):
     adapter.scan_for(5000)
     peripherals = adapter.scan_get_results()
     return peripherals #returns a list of peripheral objects
 
+def is_observer(peripheral, name=OBSERVER_NAME): #advertises the observer name or its service UUID
+    if peripheral.identifier() == name:
+        return True
+    try:
+        return any(s.uuid() == OBSERVER_SERVICE_UUID for s in peripheral.services()) #advertised services, no connection needed
+    except RuntimeError:
+        return False
+
+def scan_incremental(adapter, on_found, stop_when=None, timeout=5.0): #calls on_found once per new address as the scan finds it
+    seen = dict() #address -> peripheral
+    done = threading.Event()
+    def found(peripheral):
+        address = peripheral.address()
+        if address in seen:
+            return
+        seen[address] = peripheral
+        on_found(peripheral)
+        if stop_when is not None and stop_when(peripheral):
+            done.set() #no need to wait out the timeout
+    adapter.set_callback_on_scan_found(found)
+    adapter.scan_start()
+    done.wait(timeout)
+    adapter.scan_stop()
+    adapter.set_callback_on_scan_found(lambda peripheral: None)
+    return list(seen.values()) #returns every peripheral found, in the order found
+
+def find_observer(peripherals, name=OBSERVER_NAME, address=None): #returns the first peripheral matching the address, or else the name
+    for p in peripherals:
+        if address is not None and p.address().lower() == address.lower():
+            return p
+        if address is None and is_observer(p, name):
+            return p
+    return None
+
+def list_services(peripheral): #returns a list of tuples containing service-uuid, characteristic-uuid
+    service_characteristic_pair = []
+    for service in peripheral.services():
+        for characteristic in service.characteristics():
+            service_characteristic_pair.append((service.uuid(), characteristic.uuid()))
+    return service_characteristic_pair
+
+def subscribe(peripheral, service_uuid, characteristic_uuid, callback): #callback gets the raw bytes of every notification
+    peripheral.notify(service_uuid, characteristic_uuid, callback)
+
+def write_scan_config(peripheral, config, service_uuid=OBSERVER_SERVICE_UUID): #raises ValueError if a field doesn't fit the format
+    try:
+        data = encode_scan_config(config)
+    except struct.error as e:
+        raise ValueError(f"Scan config out of range: {e}")
+    peripheral.write_request(service_uuid, OBSERVER_CONTROL_UUID, data)
+
+def read_scan_config(peripheral, service_uuid=OBSERVER_SERVICE_UUID): #what the Pico actually uses, after clamping
+    return decode_scan_config(peripheral.read(service_uuid, OBSERVER_CONTROL_UUID))
+
+def apply_scan_config(peripheral, config, service_uuid=OBSERVER_SERVICE_UUID, timeout=1.0, poll_interval=0.05):
+    #write, then read back what the Pico uses. Its control task applies the write a little later, so the read is
+    #repeated until the reported settings change or match the request; if they never do, what it reports after timeout
+    before = peripheral.read(service_uuid, OBSERVER_CONTROL_UUID)
+    write_scan_config(peripheral, config, service_uuid)
+    requested = encode_scan_config(config)
+    deadline = time.monotonic() + timeout
+    while True:
+        data = peripheral.read(service_uuid, OBSERVER_CONTROL_UUID)
+        if data != before or data == requested or time.monotonic() >= deadline:
+            return decode_scan_config(data)
+        time.sleep(poll_interval)
+
+def find_observers(peripherals, name=OBSERVER_NAME): #every peripheral advertising the observer name or service
+    return [p for p in peripherals if is_observer(p, name)]
+
+
+#One connected observer Pico. Notifications are only timestamped and queued on the BLE thread,
+#so a slow consumer or another slow link never holds up this one.
+class ObserverSession:
+    def __init__(self, observer_id, peripheral, output, service_uuid=OBSERVER_SERVICE_UUID, characteristic_uuid=OBSERVER_CHARACTERISTIC_UUID):
+        self.observer_id = observer_id
+        self.peripheral = peripheral
+        self.output = output #queue shared by all sessions, gets (receive time, observer id, raw bytes)
+        self.service_uuid = service_uuid
+        self.characteristic_uuid = characteristic_uuid
+        self.connected = False
+        self.error = None
+        self.notifications = 0
+        self.bytes = 0
+        self.sightings = 0 #counted by whoever decodes the frames, see SessionManager.drain
+        self.started = None
+        self._last_stats = (time.monotonic(), 0, 0)
+        self.reconnects = 0
+        self.gaps = [] #(lost, restored) wall-clock times of every outage survived
+        self.on_gap = None #called as on_gap(observer id, lost, restored) from the supervisor thread
+        self.on_status = None #called with a human-readable message about the link
+        self.initial_delay = 0.5
+        self.max_delay = 30.0
+        self.clock = link_timing.LinkClock() #Pico ticks_ms -> wall clock, from the frame headers
+        self.sequence = link_timing.SequenceCounter() #frames missed on this link
+        self._resync = False #set on (re)subscribe, the Pico's sequence and clock may have restarted
+        self.pico_stats = None #latest counters from the Pico's stats frames: results, dropped, mem_free, gc_ms
+        self.scan_config = None #last ScanConfig set through this session, sent again after a reconnect
+        self._supervised = False
+        self._closing = threading.Event()
+        self._reconnecting = threading.Lock()
+
+    def name(self):
+        return f"{self.peripheral.identifier()} [{self.peripheral.address()}]"
+
+    def connect(self):
+        try:
+            self.peripheral.connect()
+            self.connected = True
+            self.error = None
+        except RuntimeError as e:
+            self.error = e
+        return self.connected
+
+    def subscribe(self):
+        if self.started is None:
+            self.started = time.monotonic()
+            self._last_stats = (self.started, 0, 0)
+        self._resync = True #drain() resets the clock and sequence before the next frame, on its own thread
+        subscribe(self.peripheral, self.service_uuid, self.characteristic_uuid, self._on_notification)
+
+    def set_scan_config(self, config): #returns the settings the Pico reports back once it has applied them
+        result = apply_scan_config(self.peripheral, config, self.service_uuid)
+        self.scan_config = config
+        return result
+
+    def _on_notification(self, data):
+        started = instrumentation.start()
+        self.notifications += 1
+        self.bytes += len(data)
+        self.output.put((time.time(), self.observer_id, data))
+        instrumentation.record("receive", started)
+
+    def supervise(self, on_gap=None, on_status=None, initial_delay=0.5, max_delay=30.0): #reconnect automatically if the link drops
+        self.on_gap = on_gap
+        self.on_status = on_status
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._supervised = True
+        self.peripheral.set_callback_on_disconnected(self._on_disconnected)
+
+    def _status(self, message):
+        if self.on_status is not None:
+            self.on_status(f"Observer {self.observer_id}: {message}")
+
+    def _on_disconnected(self): #simplepyble thread; never reconnect from here, it would block the BLE stack
+        if not self._supervised or self._closing.is_set():
+            return
+        self.connected = False
+        if self._reconnecting.acquire(blocking=False):
+            threading.Thread(target=self._reconnect, args=(time.time(),), daemon=True).start()
+
+    def _reconnect(self, lost): #exponential backoff with jitter until connected and subscribed again
+        try:
+            self._status("link lost, reconnecting...")
+            delay = self.initial_delay
+            while not self._closing.is_set():
+                if self.connect():
+                    try:
+                        self.subscribe() #same service/characteristic as before
+                        if self.scan_config is not None: #the Pico may have reset to its defaults
+                            write_scan_config(self.peripheral, self.scan_config, self.service_uuid)
+                        break
+                    except RuntimeError as e:
+                        self.error = e
+                        self.connected = False
+                self._status(f"reconnect failed ({self.error}), retrying in {delay:.1f} s")
+                if self._closing.wait(delay * random.uniform(1.0, 1.5)):
+                    return
+                delay = min(delay * 2, self.max_delay)
+            else:
+                return
+            restored = time.time()
+            self.reconnects += 1
+            self.gaps.append((lost, restored))
+            self._status(f"reconnected after {restored - lost:.1f} s")
+            if self.on_gap is not None:
+                self.on_gap(self.observer_id, lost, restored)
+        finally:
+            self._reconnecting.release()
+
+    def disconnect(self):
+        self._closing.set() #a disconnect we asked for is not a dropped link
+        if self.connected:
+            self.connected = False
+            try:
+                self.peripheral.disconnect()
+            except RuntimeError as e:
+                self.error = e
+
+    def stats(self): #totals plus rates since the previous call
+        now = time.monotonic()
+        then, notifications, sightings = self._last_stats
+        elapsed = max(now - then, 1e-9)
+        self._last_stats = (now, self.notifications, self.sightings)
+        return {
+            "observer": self.observer_id,
+            "name": self.name(),
+            "connected": self.connected,
+            "notifications": self.notifications,
+            "bytes": self.bytes,
+            "sightings": self.sightings,
+            "notifications_per_s": (self.notifications - notifications) / elapsed,
+            "sightings_per_s": (self.sightings - sightings) / elapsed,
+            "reconnects": self.reconnects,
+            "downtime": sum(restored - lost for lost, restored in self.gaps),
+            "lost_frames": self.sequence.lost,
+            "clock_offset": self.clock.offset, #wall clock minus Pico clock, None before the first timestamped frame
+            "link_delay": self.clock.delay, #how much later than the fastest recent frame the last one arrived
+            "pico_dropped": None if self.pico_stats is None else self.pico_stats["dropped"], #scan results the Pico could not deliver
+            "pico_gc_ms": None if self.pico_stats is None else self.pico_stats["gc_ms"],
+        }
+
+
+#Connects to any number of observers at once and merges their notifications into one queue
+class SessionManager:
+    def __init__(self):
+        self.sessions = dict() #observer id -> ObserverSession
+        self.incoming = queue.SimpleQueue()
+        self._next_id = 0
+
+    def add(self, peripheral, service_uuid=OBSERVER_SERVICE_UUID, characteristic_uuid=OBSERVER_CHARACTERISTIC_UUID):
+        session = ObserverSession(self._next_id, peripheral, self.incoming, service_uuid, characteristic_uuid)
+        self.sessions[self._next_id] = session
+        self._next_id += 1
+        return session
+
+    def connect_all(self, timeout=None): #connects every session in parallel, returns the ones that connected
+        threads = [threading.Thread(target=s.connect, daemon=True) for s in self.sessions.values() if not s.connected]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout)
+        return [s for s in self.sessions.values() if s.connected]
+
+    def subscribe_all(self):
+        for session in self.sessions.values():
+            if session.connected:
+                session.subscribe()
+
+    def supervise_all(self, on_gap=None, on_status=None):
+        for session in self.sessions.values():
+            session.supervise(on_gap, on_status)
+
+    def set_scan_config_all(self, config): #returns observer id -> ScanConfig reported back, or the error
+        results = dict()
+        for session in self.sessions.values():
+            if session.connected:
+                try:
+                    results[session.observer_id] = session.set_scan_config(config)
+                except (RuntimeError, ValueError) as e:
+                    results[session.observer_id] = e
+        return results
+
+    def disconnect_all(self):
+        for session in self.sessions.values():
+            session.disconnect()
+
+    def drain(self, timeout=None): #decoded frames received so far as (time, observer id, frame), oldest first, without stats frames
+        #the time is when the Pico sent the frame, on the desktop's clock, for frames that carry a timestamp
+        pending = []
+        try:
+            pending.append(self.incoming.get(timeout=timeout) if timeout else self.incoming.get_nowait())
+            while True:
+                pending.append(self.incoming.get_nowait())
+        except queue.Empty:
+            pass
+        pending.sort(key=lambda item: item[0]) #callbacks of different links can be queued slightly out of order
+        if instrumentation.enabled: #how long notifications waited in the queue
+            now = time.time()
+            for t, observer_id, data in pending:
+                instrumentation.add("queue", now - t)
+        frames = []
+        for t, observer_id, data in pending:
+            started = instrumentation.start()
+            try:
+                frame = sighting_frames.decode_frame(data)
+            except ValueError:
+                continue
+            instrumentation.record("decode", started, len(frame.sightings))
+            session = self.sessions[observer_id]
+            if frame.seq is not None:
+                if session._resync:
+                    session._resync = False
+                    session.clock.reset()
+                    session.sequence.reset()
+                session.sequence.add(frame.seq)
+                t = session.clock.to_host(frame.ticks, t)
+                instrumentation.add("link", session.clock.delay)
+            if frame.stats is not None: #the Pico's own counters, kept on the session
+                session.pico_stats = {field: int(frame.stats[field][-1]) for field in frame.stats.dtype.names}
+                continue
+            session.sightings += len(frame.sightings)
+            frames.append((t, observer_id, frame))
+        frames.sort(key=lambda item: item[0]) #by send time now, the links' delays differ
+        return frames
+
+    def stats(self):
+        return [s.stats() for s in self.sessions.values()]
+
+
 def select_connection(selected_peripheral): #requires a peripheral object
     global peripheral
     peripheral = selected_peripheral
     peripheral.connect()
 
-def get_services(): 
-    services = peripheral.services()
-    service_characteristic_pair = []
-    for service in services:
-        for characteristic in service.characteristics():
-            service_characteristic_pair.append((service.uuid(), characteristic.uuid()))
-    return service_characteristic_pair #returns a list of tuples containing service-uuid, characteristic-uuid
+def get_services():
+    return list_services(peripheral)
 
 def set_service(selected_service_characteristic_pair): #requires a tuple containing service-uuid, characteristic-uuid in that order
     global service
@@ -31,8 +376,8 @@ def set_service(selected_service_characteristic_pair): #requires a tuple contain
 def subscribe_to_notifications(timesleep): #requires an int to tell the system to sleep for x seconds
     global service
     global characteristic
-    peripheral.notify(service, characteristic, lambda data: print(f"Notification: {data.decode("utf-8")}"))
+    subscribe(peripheral, service, characteristic, lambda data: print(f"Notification: {sighting_frames.decode_frame(data)}"))
      # subscribes to notifications, running the callback function (lambda) every time the system sees it update
     time.sleep(timesleep)
 
-    peripheral.disconnect()
\ No newline at end of file
+    peripheral.disconnect()
@@ -0,0 +1,111 @@
+import json
+import os
+import struct
+import numpy as np # type: ignore
+import sighting_frames
+
+#Append-only capture files. A 16 byte header followed by fixed 16 byte records:
+#   8 bytes receive time (float64 seconds since the epoch)
+#   6 bytes address (as printed, most significant byte first)
+#   1 byte signed RSSI
+#   1 byte device id of the observer that reported the sighting
+#Names don't fit a fixed record, they go to a "<file>.names" sidecar as JSON lines, one per new address.
+MAGIC = b"RSSIREC\0"
+VERSION = 1
+HEADER = struct.Struct("<8sII") #magic, version, record size
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("address", "u1", 6), ("rssi", "i1"), ("device", "u1")])
+
+def names_path(path):
+    return path + ".names"
+
+def check_header(path, f): #f open for reading at the start; raises ValueError unless it's a recording we can read and extend
+    data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is too short to be a recording")
+    magic, version, record_size = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a version {VERSION} recording")
+
+#Appends decoded sighting frames to a capture file; an existing file must be a recording (ValueError otherwise)
+class Recorder:
+    def __init__(self, path, buffering=1 << 16):
+        self.path = path
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size > 0:
+            with open(path, "r+b") as f:
+                check_header(path, f)
+                whole = HEADER.size + (size - HEADER.size) // RECORD_DTYPE.itemsize * RECORD_DTYPE.itemsize
+                if whole != size: #a capture that stopped mid-record, new records must start on a record boundary
+                    f.truncate(whole)
+        self.file = open(path, "ab", buffering=buffering)
+        if size == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize))
+        self.names = read_names(path) #addresses that already have a name in the sidecar
+        self.names_file = open(names_path(path), "a", encoding="utf-8")
+
+    def write(self, t, addresses, rssis, names=None, device=0): #addresses/rssis arrays, t a time or an array of times
+        addresses = np.asarray(addresses, dtype=np.uint64)
+        records = np.empty(len(addresses), dtype=RECORD_DTYPE)
+        records["time"] = t
+        records["address"] = addresses[:, None].astype(">u8").view(np.uint8).reshape(-1, 8)[:, 2:]
+        records["rssi"] = rssis
+        records["device"] = device
+        self.file.write(records.tobytes())
+        if names is not None:
+            for address, name in zip(addresses.tolist(), names):
+                if name != "None" and self.names.get(address) != name:
+                    self.names[address] = name
+                    self.names_file.write(json.dumps({"address": sighting_frames.format_address(address), "name": name}) + "\n")
+
+    def write_frame(self, t, frame, device=0):
+        self.write(t, frame.sightings["address"], frame.sightings["rssi"], sighting_frames.frame_names(frame), device)
+
+    def flush(self):
+        self.file.flush()
+        self.names_file.flush()
+
+    def close(self):
+        self.file.close()
+        self.names_file.close()
+
+def read_names(path): #address -> latest name from the sidecar
+    names = dict()
+    if os.path.exists(names_path(path)):
+        with open(names_path(path), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue #half written last line of a capture still in progress
+                names[sighting_frames.parse_address(entry["address"])] = entry["name"]
+    return names
+
+#Memory-maps a capture file; records, times, rssi and device are zero-copy views of the file
+class Reader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            check_header(path, f)
+        count = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize #ignore a partly written last record
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+        self.times = self.records["time"]
+        self.rssi = self.records["rssi"]
+        self.device = self.records["device"]
+        self.names = read_names(path)
+        self._addresses = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def addresses(self): #48-bit addresses as uint64, computed once
+        if self._addresses is None:
+            padded = np.zeros((len(self.records), 8), dtype=np.uint8)
+            padded[:, 2:] = self.records["address"]
+            self._addresses = padded.view(">u8").ravel().astype(np.uint64)
+        return self._addresses
+
+    def load_into(self, store): #replay the whole capture into a DeviceStore, returns the new addresses
+        return store.add_batch(self.addresses(), self.names, self.rssi, self.times)
@@ -0,0 +1,150 @@
+import numpy as np # type: ignore
+
+METHODS = ("ema", "median", "kalman")
+
+#Streaming RSSI smoothing and presence detection for every device at once.
+#State lives in flat NumPy arrays indexed by a slot per device, so a batch of sightings is filtered with a few
+#array operations whatever the number of devices; only the address -> slot lookup touches each distinct address.
+#A device becomes present when its smoothed RSSI reaches enter, and absent again when it drops below leave
+#(hysteresis, so a device hovering around one threshold doesn't flap) or it hasn't been seen for timeout seconds.
+#Devices unseen for forget_after seconds (timeout by default) lose their slot in expire(), so randomized addresses
+#can't grow the arrays forever; one that comes back starts filtering afresh.
+#   smoother = RssiFilter("kalman")
+#   smoothed, events = smoother.update(addresses, rssis, t)
+#   events += smoother.expire(now)  #timeouts, once in a while
+class RssiFilter:
+    def __init__(self, method="ema", alpha=0.3, window=5, process_noise=1.0, measurement_noise=16.0,
+                 enter=-80.0, leave=-90.0, timeout=30.0, forget_after=None, capacity=1024):
+        if method not in METHODS:
+            raise ValueError(f"Unknown filter {method}, expected one of {', '.join(METHODS)}")
+        if leave > enter:
+            raise ValueError("leave must not be above enter")
+        self.method = method
+        self.alpha = alpha #ema: weight of the newest sample
+        self.window = window #median: samples per median
+        self.process_noise = process_noise #kalman: how far the true RSSI wanders per sample (dB^2)
+        self.measurement_noise = measurement_noise #kalman: variance of one reading (dB^2)
+        self.enter = enter
+        self.leave = leave
+        self.timeout = timeout
+        self.forget_after = timeout if forget_after is None else forget_after
+        self.slots = dict() #address -> slot
+        self._free = [] #slots of forgotten devices
+        self._allocate(capacity)
+
+    def _allocate(self, capacity): #(re)size every per-device array, keeping what's there
+        def grow(old, shape, fill, dtype):
+            new = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            return new
+        self.value = grow(getattr(self, "value", None), capacity, np.nan, np.float32) #smoothed RSSI, nan until the first sample
+        self.variance = grow(getattr(self, "variance", None), capacity, 0.0, np.float32) #kalman estimate variance
+        self.history = grow(getattr(self, "history", None), (capacity, self.window), np.nan, np.float32) #median ring buffers
+        self.position = grow(getattr(self, "position", None), capacity, 0, np.int32)
+        self.last_seen = grow(getattr(self, "last_seen", None), capacity, -np.inf, np.float64)
+        self.present = grow(getattr(self, "present", None), capacity, False, np.bool_)
+        self.addresses = grow(getattr(self, "addresses", None), capacity, 0, np.uint64)
+        self.capacity = capacity
+
+    def _slots(self, unique): #slot for each distinct address, new devices get a free or fresh slot
+        slots = np.empty(len(unique), dtype=np.int64)
+        for i, address in enumerate(unique.tolist()):
+            slot = self.slots.get(address)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    slot = len(self.slots)
+                    if slot >= self.capacity:
+                        self._allocate(self.capacity * 2)
+                self.slots[address] = slot
+                self.addresses[slot] = address
+            slots[i] = slot
+        return slots
+
+    def update(self, addresses, rssi, t): #one batch; returns (smoothed RSSI per sample, [(t, address, "arrived"/"departed")])
+        addresses = np.asarray(addresses, dtype=np.uint64)
+        rssi = np.asarray(rssi, dtype=np.float32)
+        smoothed = np.empty(len(rssi), dtype=np.float32)
+        if len(rssi) == 0:
+            return smoothed, []
+        unique, inverse = np.unique(addresses, return_inverse=True)
+        slots = self._slots(unique)[inverse]
+        #a device can be in a batch several times; its k-th sample is filtered in round k, so every round
+        #touches each slot at most once and stays a plain vectorized update
+        order = np.argsort(slots, kind="stable")
+        sorted_slots = slots[order]
+        starts = np.r_[0, np.flatnonzero(sorted_slots[1:] != sorted_slots[:-1]) + 1]
+        rank = np.empty(len(slots), dtype=np.int64)
+        rank[order] = np.arange(len(slots)) - np.repeat(starts, np.diff(np.r_[starts, len(slots)]))
+        by_rank = np.argsort(rank, kind="stable")
+        bounds = np.searchsorted(rank[by_rank], np.arange(int(rank.max()) + 2))
+        for k in range(len(bounds) - 1):
+            samples = by_rank[bounds[k]:bounds[k + 1]]
+            smoothed[samples] = self._step(slots[samples], rssi[samples])
+        touched = np.unique(slots)
+        self.last_seen[touched] = t
+        return smoothed, self._transitions(touched, t)
+
+    def _step(self, slots, x): #one sample for each of slots (all different)
+        value = self.value[slots]
+        first = np.isnan(value)
+        if self.method == "ema":
+            value = np.where(first, x, value + self.alpha * (x - value))
+        elif self.method == "median":
+            position = self.position[slots]
+            self.history[slots, position] = x
+            self.position[slots] = (position + 1) % self.window
+            value = np.nanmedian(self.history[slots], axis=1)
+        else: #kalman, random walk model
+            variance = np.where(first, self.measurement_noise, self.variance[slots] + self.process_noise)
+            gain = np.where(first, 1.0, variance / (variance + self.measurement_noise))
+            value = np.where(first, x, value + gain * (x - value))
+            self.variance[slots] = (1 - gain) * variance
+        self.value[slots] = value
+        return value
+
+    def _transitions(self, slots, t):
+        value = self.value[slots]
+        present = self.present[slots]
+        arrived = slots[~present & (value >= self.enter)]
+        departed = slots[present & (value < self.leave)]
+        self.present[arrived] = True
+        self.present[departed] = False
+        return ([(t, a, "arrived") for a in self.addresses[arrived].tolist()] +
+                [(t, a, "departed") for a in self.addresses[departed].tolist()])
+
+    def expire(self, now): #devices not seen for timeout seconds depart, then old ones are forgotten; O(devices), call it about once a second
+        used = len(self.slots) + len(self._free)
+        unseen = now - self.last_seen[:used] #inf for free slots
+        gone = np.flatnonzero(self.present[:used] & (unseen > self.timeout))
+        self.present[gone] = False
+        events = [(now, a, "departed") for a in self.addresses[gone].tolist()]
+        self.forget(self.addresses[:used][(unseen > self.forget_after) & np.isfinite(unseen)].tolist())
+        return events
+
+    def forget(self, addresses): #devices dropped from the store; their slots are reused
+        for address in addresses:
+            slot = self.slots.pop(address, None)
+            if slot is None:
+                continue
+            self.value[slot] = np.nan
+            self.variance[slot] = 0.0
+            self.history[slot] = np.nan
+            self.position[slot] = 0
+            self.last_seen[slot] = -np.inf
+            self.present[slot] = False
+            self._free.append(slot)
+
+    def smoothed(self, address): #latest smoothed RSSI of a device, None if never seen
+        slot = self.slots.get(address)
+        return None if slot is None else float(self.value[slot])
+
+    def is_present(self, address):
+        slot = self.slots.get(address)
+        return slot is not None and bool(self.present[slot])
+
+    def present_addresses(self):
+        used = len(self.slots) + len(self._free)
+        return self.addresses[:used][self.present[:used]].tolist()
@@ -0,0 +1,116 @@
+import numpy as np # type: ignore
+import decimate
+
+#Keeps one persistent Line2D per plotted device and updates it in place.
+#Lines are animated artists: a full canvas.draw() only happens when the axes have to be rescaled,
+#every other update restores the cached background and blits the lines on top of it.
+#Long series are decimated to at most 2 points per pixel of the visible window (decimate.py).
+class RssiGraph:
+    def __init__(self, canvas, ax, headroom=0.5, decimation=True):
+        self.canvas = canvas
+        self.ax = ax
+        self.headroom = headroom #fraction of extra x range added when the data runs off the axes
+        self.decimation = decimation
+        self.lines = dict() #address -> Line2D
+        self.data = dict() #address -> (x, y, version) of the full series behind each line
+        self.cache = decimate.DecimationCache()
+        self.gap_lines = [] #vertical markers where an observer link was down
+        self._gaps = ()
+        self._background = None
+        self._needs_draw = True
+        canvas.mpl_connect("draw_event", self._on_draw)
+        ax.callbacks.connect("xlim_changed", self._on_xlim_changed)
+
+    def _on_draw(self, event): #full redraws happen here, cache what's under the lines
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for line in self.gap_lines:
+            self.ax.draw_artist(line)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def _on_xlim_changed(self, ax): #zoom, pan or rescale: redo the level of detail for the new window
+        for address in self.lines:
+            self._refresh(address)
+
+    def _refresh(self, address):
+        x, y, version = self.data[address]
+        if self.decimation and len(x) > 0:
+            x0, x1 = self.ax.get_xlim()
+            buckets = max(int(self.ax.bbox.width), 1)
+            x, y = self.cache.get(address, version, x, y, x0, x1, buckets)
+        self.lines[address].set_data(x, y)
+
+    def plot(self, address, y, x=None, version=None, color="green"): #create or update the line for address
+        y = np.asarray(y)
+        if x is None:
+            x = np.arange(len(y))
+        line = self.lines.get(address)
+        if line is None:
+            (line,) = self.ax.plot([], [], color=color, animated=True)
+            self.lines[address] = line
+            self._needs_draw = True
+        if version is None:
+            version = (len(y), float(x[-1]) if len(x) else None)
+        self.data[address] = (x, y, version)
+        if len(y) > 0 and self.ax.get_navigate_mode() is None: #leave the limits alone while the user pans/zooms
+            self._fit(x, y)
+        self._refresh(address)
+
+    def set_gaps(self, xs): #mark outages, blitted like the lines since they move as ring buffers wrap
+        xs = tuple(float(x) for x in xs)
+        if xs == self._gaps:
+            return
+        for line in self.gap_lines:
+            line.remove()
+        self.gap_lines = [self.ax.axvline(x, color="red", linestyle=":", linewidth=1, animated=True) for x in xs]
+        self._gaps = xs
+
+    def set_legend(self, addresses, labels): #legend for some of the lines, None or no addresses to remove it
+        legend = self.ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        if addresses:
+            self.ax.legend([self.lines[a] for a in addresses], labels, loc="upper left", fontsize=8)
+        self._needs_draw = True
+
+    def remove(self, address):
+        line = self.lines.pop(address, None)
+        if line is not None:
+            line.remove()
+            del self.data[address]
+            self.cache.forget(address)
+            self._needs_draw = True
+
+    def clear(self):
+        for address in list(self.lines):
+            self.remove(address)
+
+    def _fit(self, x, y): #only touch the limits when the new data doesn't fit
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        xmin, xmax = float(np.min(x)), float(np.max(x))
+        ymin, ymax = float(np.min(y)), float(np.max(y))
+        if xmin < x0 or xmax > x1:
+            span = max(xmax - xmin, 1.0)
+            self.ax.set_xlim(xmin, xmax + span * self.headroom)
+            self._needs_draw = True
+        if ymin < y0 or ymax > y1:
+            self.ax.set_ylim(min(ymin, y0) - 5, max(ymax, y1) + 5)
+            self._needs_draw = True
+
+    def reset_limits(self): #forget old limits, e.g. when switching to another device
+        self.ax.set_xlim(0, 1)
+        self.ax.set_ylim(-60, -50)
+        self._needs_draw = True
+
+    def draw(self):
+        if self._needs_draw or self._background is None:
+            self._needs_draw = False
+            self.canvas.draw() #draw_event recaptures the background and draws the lines
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self.canvas.blit(self.ax.bbox)
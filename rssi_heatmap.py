@@ -0,0 +1,75 @@
+import numpy as np # type: ignore
+
+#Device-by-time RSSI heatmap: one row per device, one column per time bin, colored by the mean RSSI in the bin.
+#The image is created once and updated in place with set_data, and blitted like RssiGraph's lines, so hundreds of
+#rows cost one binning pass over the samples in view and one image draw. The x axis is shared with the line plot:
+#the columns always span its visible window, so zooming or panning there re-bins the heatmap.
+class RssiHeatmap:
+    def __init__(self, canvas, ax, bins=300, vmin=-100, vmax=-30, cmap="viridis", max_labels=40):
+        self.canvas = canvas
+        self.ax = ax
+        self.bins = bins #columns across the visible window
+        self.max_labels = max_labels #more rows than this are left unlabeled
+        self.rows = [] #keys of the rows, top to bottom
+        ax.set_autoscale_on(False) #the image must not move the x limits it shares with the line plot
+        self.image = ax.imshow(np.full((1, bins), np.nan, dtype=np.float32), aspect="auto", interpolation="nearest",
+                               cmap=cmap, vmin=vmin, vmax=vmax, extent=(*ax.get_xlim(), 0.5, -0.5), animated=True)
+        ax.set_ylim(0.5, -0.5)
+        #in the right margin, so the heatmap stays as wide as the line plot above it
+        self.colorbar = ax.figure.colorbar(self.image, cax=ax.inset_axes([1.01, 0, 0.015, 1]), label="RSSI (dBm)")
+        self._background = None
+        self._drawn_xlim = None #x limits the background was captured with
+        self._needs_draw = True
+        self._callback = canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._drawn_xlim = self.ax.get_xlim()
+        self.ax.draw_artist(self.image)
+
+    def update(self, rows, series, labels): #rows: keys top to bottom; series: (x, rssi) per row with sorted x; labels per row
+        x0, x1 = self.ax.get_xlim()
+        self.image.set_data(bin_rows(series, x0, x1, self.bins) if rows else np.full((1, self.bins), np.nan, dtype=np.float32))
+        self.image.set_extent((x0, x1, max(len(rows), 1) - 0.5, -0.5))
+        if rows != self.rows: #labels and y limits only change with the device list
+            self.rows = list(rows)
+            self.ax.set_ylim(max(len(rows), 1) - 0.5, -0.5)
+            step = max(1, -(-len(rows) // self.max_labels))
+            self.ax.set_yticks(range(0, len(rows), step))
+            self.ax.set_yticklabels(labels[::step], fontsize=7)
+            self._needs_draw = True
+
+    def draw(self):
+        if self._needs_draw or self._background is None or self.ax.get_xlim() != self._drawn_xlim: #ticks moved too
+            self._needs_draw = False
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.image)
+        self.canvas.blit(self.ax.bbox)
+
+    def remove(self): #before the axes go away
+        self.canvas.mpl_disconnect(self._callback)
+        self.colorbar.remove()
+        self.image.remove()
+
+
+def bin_rows(series, x0, x1, bins): #mean RSSI per (row, bin) over [x0, x1) as float32, nan where a row has no samples
+    starts = []
+    xs = []
+    ys = []
+    for x, y in series: #only the samples in view; x is sorted
+        lo, hi = np.searchsorted(x, (x0, x1))
+        xs.append(x[lo:hi])
+        ys.append(y[lo:hi])
+        starts.append(hi - lo)
+    rows = np.repeat(np.arange(len(series)), starts)
+    x = np.concatenate(xs) if xs else np.empty(0)
+    y = np.concatenate(ys).astype(np.float64) if ys else np.empty(0)
+    column = np.minimum(((x - x0) * (bins / (x1 - x0))).astype(np.int64), bins - 1) if x1 > x0 else np.zeros(len(x), dtype=np.int64)
+    cell = rows * bins + column
+    size = len(series) * bins
+    counts = np.bincount(cell, minlength=size)
+    sums = np.bincount(cell, weights=y, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums / counts).astype(np.float32).reshape(len(series), bins)
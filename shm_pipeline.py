@@ -0,0 +1,232 @@
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+import numpy as np # type: ignore
+import reciever_modular
+import sighting_frames
+
+#Receiver in its own process: BLE callbacks, decoding, clock and sequence bookkeeping run there, and decoded
+#sightings go to the GUI through a ring buffer in shared memory, so a slow canvas.draw() never holds up a
+#notification and the two sides use separate cores. Records are read in place, nothing is pickled; only the rare
+#things (new names, link gaps, status messages, per-observer stats) go through a multiprocessing queue.
+#   receiver = ReceiverProcess(connect_all=True)
+#   receiver.start()
+#   for t, observer, records in receiver.drain():  #records views the ring until the next drain()
+#       ...
+RECORD_DTYPE = np.dtype([("t", "<f8"), ("address", "<u8"), ("rssi", "i1"), ("observer", "u1")], align=True) #24 bytes
+RING_CAPACITY = 1 << 18 #records, about 6 MB; minutes of sightings at full rate before the GUI has to read
+STATS_INTERVAL = 1.0 #seconds between stats sent by the receiver
+MAX_NAMES = 4096 #names the receiver remembers having sent; the oldest is forgotten, and sent again when its device shows up
+#header words: records ever written, records ever read, records dropped because the ring was full, "names" events sent
+_WRITE, _READ, _DROPPED, _NAMES = 0, 1, 2, 3
+_HEADER_SIZE = 64
+
+#Single producer, single consumer ring of RECORD_DTYPE records. Each side only writes its own index, and the producer
+#publishes its index after the records, so the consumer never sees a half-written record. A full ring drops the
+#newest records (counted in dropped) instead of overwriting ones the consumer may still be looking at.
+class SightingRing:
+    def __init__(self, capacity=RING_CAPACITY, name=None): #creates a ring, or attaches to an existing one by name
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+            capacity = (self.shm.size - _HEADER_SIZE) // RECORD_DTYPE.itemsize
+        self.capacity = capacity
+        self.header = np.ndarray(_HEADER_SIZE // 8, dtype=np.uint64, buffer=self.shm.buf)
+        self.records = np.ndarray(capacity, dtype=RECORD_DTYPE, buffer=self.shm.buf, offset=_HEADER_SIZE)
+        if self.owner:
+            self.header[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def dropped(self):
+        return int(self.header[_DROPPED])
+
+    @property
+    def names_sent(self):
+        return int(self.header[_NAMES])
+
+    def names_queued(self): #producer side, after queueing names and before writing the records that use them
+        self.header[_NAMES] += 1
+
+    def write(self, t, addresses, rssis, observer=0): #producer side; returns how many records fit
+        written = int(self.header[_WRITE])
+        n = min(len(addresses), self.capacity - (written - int(self.header[_READ])))
+        if n < len(addresses):
+            self.header[_DROPPED] += len(addresses) - n
+        start = written % self.capacity
+        first = min(n, self.capacity - start) #up to the end of the buffer, the rest wraps to the front
+        for records, part in ((self.records[start:start + first], slice(0, first)), (self.records[:n - first], slice(first, n))):
+            records["t"] = t
+            records["address"] = addresses[part]
+            records["rssi"] = rssis[part]
+            records["observer"] = observer
+        self.header[_WRITE] = written + n
+        return n
+
+    def pending(self): #consumer side: unread records as up to two views, oldest first
+        read = int(self.header[_READ])
+        n = int(self.header[_WRITE]) - read
+        start = read % self.capacity
+        first = min(n, self.capacity - start)
+        return [part for part in (self.records[start:start + first], self.records[:n - first]) if len(part)]
+
+    def release(self, n): #consumer side: the oldest n pending records may be overwritten
+        self.header[_READ] += n
+
+    def close(self):
+        del self.header, self.records #views must go before the mapping can close
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+#The receiver process and the GUI's end of it
+class ReceiverProcess:
+    def __init__(self, capacity=RING_CAPACITY, adapter_index=0, name=reciever_modular.OBSERVER_NAME, addresses=(),
+                 connect_all=True, scan_config=None):
+        #spawn, not fork: a forked copy of the GUI would inherit Tk and whatever locks the BLE threads held
+        context = multiprocessing.get_context("spawn")
+        self.ring = SightingRing(capacity)
+        self.commands = context.Queue()
+        self.events = context.Queue()
+        self.process = context.Process(target=receiver_main, daemon=True, name="receiver",
+                                       args=(self.ring.name, self.commands, self.events, adapter_index, name, list(addresses), connect_all, scan_config))
+        self.names = dict() #address -> name, as reported by the receiver; forget() drops the names of devices no longer kept
+        self.stats = [] #latest SessionManager.stats() from the receiver
+        self._held = 0 #records handed out by the last drain()
+        self._names_received = 0
+        self._events = [] #events read while waiting for names, for the next poll()
+
+    def start(self):
+        self.process.start()
+
+    def set_scan_config(self, config): #applied by the receiver, results come back as status messages
+        self.commands.put(("scan_config", config))
+
+    def forget(self, addresses): #devices dropped from the store; the receiver sends their names again if they come back
+        for address in addresses:
+            self.names.pop(address, None)
+        if addresses:
+            self.commands.put(("forget", list(addresses)))
+
+    def poll(self): #[("status", message)] and [("gap", observer, lost, restored)] since the last call; names and stats are kept here
+        while True:
+            try:
+                self._handle(self.events.get_nowait())
+            except queue.Empty:
+                break
+        events, self._events = self._events, []
+        return events
+
+    def _handle(self, event):
+        if event[0] == "names":
+            self.names.update(event[1])
+            self._names_received += 1
+        elif event[0] == "stats":
+            self.stats = event[1]
+        else:
+            self._events.append(event)
+
+    def drain(self, names_timeout=1.0): #[(t, observer, records)], one entry per received frame; the views are valid until the next call
+        self.ring.release(self._held)
+        runs = []
+        self._held = 0
+        pending = self.ring.pending()
+        #names go through the queue and can still be on their way when their sightings are in the ring; the receiver
+        #counts them in the ring before writing the records, so wait for every one counted by now
+        expected = self.ring.names_sent
+        deadline = time.monotonic() + names_timeout
+        while self._names_received < expected and self.process.is_alive():
+            try:
+                self._handle(self.events.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        for part in pending:
+            self._held += len(part)
+            #a frame's sightings share a receive time and observer, split where either changes
+            bounds = np.r_[0, np.flatnonzero((part["t"][1:] != part["t"][:-1]) | (part["observer"][1:] != part["observer"][:-1])) + 1, len(part)]
+            runs.extend((float(part["t"][a]), int(part["observer"][a]), part[a:b]) for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        return runs
+
+    def stop(self, timeout=5.0):
+        if self.process.is_alive():
+            self.commands.put(("stop",))
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        self.ring.close()
+
+
+#print()-compatible stream that turns lines into status events, for headless.connect's progress messages
+class _EventLog:
+    def __init__(self, events):
+        self.events = events
+
+    def write(self, text):
+        if text.strip():
+            self.events.put(("status", text.strip()))
+
+    def flush(self):
+        pass
+
+def receiver_main(ring_name, commands, events, adapter_index, name, addresses, connect_all, scan_config):
+    import headless #not needed in the GUI process
+    ring = SightingRing(name=ring_name)
+    manager = None
+    try:
+        manager = headless.connect(adapter_index, name, addresses, connect_all, log=_EventLog(events))
+        if scan_config is not None:
+            apply_scan_config(manager, scan_config, events)
+        manager.supervise_all(on_gap=lambda observer, lost, restored: events.put(("gap", observer, lost, restored)),
+                              on_status=lambda message: events.put(("status", message)))
+        manager.subscribe_all()
+        names = dict()
+        last_stats = time.monotonic()
+        while True:
+            try:
+                command = commands.get_nowait()
+            except queue.Empty:
+                command = None
+            if command is not None and command[0] == "stop":
+                break
+            if command is not None and command[0] == "scan_config":
+                apply_scan_config(manager, command[1], events)
+            if command is not None and command[0] == "forget":
+                for address in command[1]:
+                    names.pop(address, None)
+            new_names = dict()
+            for t, observer, frame in manager.drain(timeout=0.05):
+                addresses = frame.sightings["address"]
+                for address, frame_name in zip(addresses.tolist(), sighting_frames.frame_names(frame)):
+                    if frame_name != "None" and names.get(address) != frame_name:
+                        names[address] = new_names[address] = frame_name
+                        if len(names) > MAX_NAMES:
+                            del names[next(iter(names))]
+                if new_names: #before the sightings, drain() on the other side waits for every names event counted here
+                    events.put(("names", new_names))
+                    ring.names_queued()
+                    new_names = dict()
+                ring.write(t, addresses, frame.sightings["rssi"], observer)
+            now = time.monotonic()
+            if now - last_stats >= STATS_INTERVAL:
+                events.put(("stats", manager.stats()))
+                last_stats = now
+    except Exception as e: #the GUI only hears about it through the queue
+        events.put(("status", f"Receiver stopped: {e}"))
+    finally:
+        if manager is not None:
+            manager.disconnect_all()
+        ring.close()
+
+def apply_scan_config(manager, config, events):
+    for observer, result in manager.set_scan_config_all(config).items():
+        events.put(("status", f"Could not set scan settings of observer {observer}: {result}" if isinstance(result, Exception)
+                              else f"Observer {observer} scan settings: {result}"))
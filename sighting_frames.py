@@ -0,0 +1,206 @@
+import struct
+from collections import namedtuple
+import numpy as np # type: ignore
+
+# Binary sighting frames sent by micropython/main.py, one frame per notification.
+# Frames are:
+#   10 byte header: version, kind, name count, record count,
+#     2 byte sequence number (one per frame, wrapping), 4 byte Pico ticks_ms when the frame was sent
+#     (version 1 frames have only the first 4 bytes)
+#   name table: 1 byte length + utf-8 name, repeated name count times
+#   records, repeated record count times, all ending in a 1 byte index into the name table
+#   (NO_NAME if the advertisement had no name)
+# FRAME_SIGHTINGS records are 8 bytes, one per advertisement seen:
+#     6 bytes address (as printed, most significant byte first)
+#     1 byte signed RSSI
+#     1 byte name index
+# FRAME_AGGREGATES records are 14 bytes, one per device per scan window (aggregation mode on the Pico):
+#     6 bytes address
+#     2 bytes number of advertisements seen in the window
+#     1 byte each signed min, max and mean RSSI
+#     2 bytes ms from the start of the window to the last advertisement
+#     1 byte name index
+# FRAME_STATS frames carry one 15 byte record after every scan window, with the Pico's own counters:
+#     4 bytes scan results seen since boot
+#     4 bytes scan results dropped since boot (notify failed, or the aggregation table was full)
+#     4 bytes free heap
+#     2 bytes ms the last garbage collection took
+#     1 byte name index, always NO_NAME
+
+FRAME_VERSION = 2
+FRAME_SIGHTINGS = 0
+FRAME_AGGREGATES = 1
+FRAME_STATS = 2
+NO_NAME = 0xFF
+HEADER = struct.Struct("<BBBBHI")
+HEADER_V1 = struct.Struct("<BBBB")
+MAX_NAME_LEN = 31
+TICKS_PERIOD = 1 << 30 #the Pico's ticks_ms wraps around here
+
+RECORD_DTYPE = np.dtype([("addr", "u1", 6), ("rssi", "i1"), ("name", "u1")])
+AGGREGATE_RECORD_DTYPE = np.dtype([("addr", "u1", 6), ("count", "<u2"), ("rssi_min", "i1"), ("rssi_max", "i1"),
+                                   ("rssi_mean", "i1"), ("last_seen", "<u2"), ("name", "u1")])
+STATS_RECORD_DTYPE = np.dtype([("results", "<u4"), ("dropped", "<u4"), ("mem_free", "<u4"), ("gc_ms", "<u2"), ("name", "u1")])
+RECORD_DTYPES = {FRAME_SIGHTINGS: RECORD_DTYPE, FRAME_AGGREGATES: AGGREGATE_RECORD_DTYPE, FRAME_STATS: STATS_RECORD_DTYPE}
+#decoded sightings, address packed into the low 48 bits and name as an index into Frame.names (-1 for none)
+SIGHTING_DTYPE = np.dtype([("address", "<u8"), ("rssi", "i1"), ("name", "<i2")])
+AGGREGATE_DTYPE = np.dtype([("address", "<u8"), ("count", "<u2"), ("rssi_min", "i1"), ("rssi_max", "i1"),
+                            ("rssi_mean", "i1"), ("last_seen", "<u2"), ("name", "<i2")])
+
+_ADDR_SHIFTS = np.array([40, 32, 24, 16, 8, 0], dtype=np.uint64)
+
+STATS_DTYPE = np.dtype([("results", "<u4"), ("dropped", "<u4"), ("mem_free", "<u4"), ("gc_ms", "<u2")])
+
+#sightings is always filled in, for aggregate frames with one row per device carrying the mean RSSI,
+#so code that only charts RSSI doesn't care which mode the Pico is in; aggregates has the full statistics.
+#Stats frames have no sightings and their counters in stats. seq and ticks are None for version 1 frames.
+Frame = namedtuple("Frame", ["version", "kind", "names", "sightings", "aggregates", "stats", "seq", "ticks"],
+                   defaults=[None, None, None, None])
+
+
+def format_address(address): #48-bit int -> "aa:bb:cc:dd:ee:ff"
+    return ":".join(f"{(address >> shift) & 0xFF:02x}" for shift in range(40, -8, -8))
+
+def parse_address(text): #"aa:bb:cc:dd:ee:ff" -> 48-bit int
+    return int(text.replace(":", ""), 16)
+
+def encode_frame(records, names=(), kind=FRAME_SIGHTINGS, seq=0, ticks=0): #desktop-side encoder, mirrors the Pico
+    #records are (address, rssi, name index) tuples, or (address, count, min, max, mean, last seen ms, name index) for aggregates
+    out = bytearray(HEADER.pack(FRAME_VERSION, kind, len(names), len(records), seq % 65536, ticks))
+    for name in names:
+        name = name.encode("utf-8")[:MAX_NAME_LEN]
+        out.append(len(name))
+        out += name
+    for record in records:
+        out += record[0].to_bytes(6, "big")
+        if kind == FRAME_AGGREGATES:
+            out += struct.pack("<HbbbH", *record[1:6])
+        else:
+            out += struct.pack("<b", record[1])
+        out.append(NO_NAME if record[-1] < 0 else record[-1])
+    return bytes(out)
+
+def encode_stats_frame(results, dropped, mem_free=0, gc_ms=0, seq=0, ticks=0):
+    return HEADER.pack(FRAME_VERSION, FRAME_STATS, 0, 1, seq % 65536, ticks) + struct.pack("<IIIHB", results, dropped, mem_free, gc_ms, NO_NAME)
+
+def _pack_frames(rows, names, kind, payload_max, seq, ticks): #rows are record tuples without the name index, frames numbered from seq
+    record_size = RECORD_DTYPES[kind].itemsize
+    frame, frame_names, size = [], [], HEADER.size
+    for row, name in zip(rows, names):
+        name = name if name and name != "None" else None
+        new_name = name is not None and name not in frame_names
+        needed = record_size + (1 + len(name.encode("utf-8")[:MAX_NAME_LEN]) if new_name else 0)
+        if size + needed > payload_max and frame:
+            yield encode_frame(frame, frame_names, kind, seq, ticks)
+            seq += 1
+            frame, frame_names, size = [], [], HEADER.size
+            new_name = name is not None
+            needed = record_size + (1 + len(name.encode("utf-8")[:MAX_NAME_LEN]) if new_name else 0)
+        if new_name and (len(frame_names) == NO_NAME or size + needed > payload_max):
+            name, new_name, needed = None, False, record_size
+        if new_name:
+            frame_names.append(name)
+        frame.append(row + (frame_names.index(name) if name is not None else -1,))
+        size += needed
+    if frame:
+        yield encode_frame(frame, frame_names, kind, seq, ticks)
+
+def encode_frames(addresses, rssis, names, payload_max=244, seq=0, ticks=0): #packs sightings into as few frames as fit payload_max, like the Pico does
+    rows = ((int(a), int(r)) for a, r in zip(addresses, rssis))
+    return _pack_frames(rows, names, FRAME_SIGHTINGS, payload_max, seq, ticks)
+
+def encode_aggregate_frames(aggregates, names, payload_max=244, seq=0, ticks=0): #aggregates is an AGGREGATE_DTYPE array, one row per device
+    rows = ((int(a["address"]), int(a["count"]), int(a["rssi_min"]), int(a["rssi_max"]), int(a["rssi_mean"]), int(a["last_seen"]))
+            for a in aggregates)
+    return _pack_frames(rows, names, FRAME_AGGREGATES, payload_max, seq, ticks)
+
+def aggregate(addresses, rssis, names, offsets_ms=None): #one window of sightings -> (AGGREGATE_DTYPE array, names), like the Pico's aggregation mode
+    addresses = np.asarray(addresses, dtype=np.uint64)
+    rssis = np.asarray(rssis, dtype=np.int16)
+    unique, first, inverse, counts = np.unique(addresses, return_index=True, return_inverse=True, return_counts=True)
+    out = np.zeros(len(unique), dtype=AGGREGATE_DTYPE)
+    out["address"] = unique
+    out["count"] = np.minimum(counts, 0xFFFF)
+    mins = np.full(len(unique), 127, dtype=np.int16)
+    maxs = np.full(len(unique), -128, dtype=np.int16)
+    np.minimum.at(mins, inverse, rssis)
+    np.maximum.at(maxs, inverse, rssis)
+    out["rssi_min"] = mins
+    out["rssi_max"] = maxs
+    out["rssi_mean"] = np.bincount(inverse, weights=rssis).astype(np.int64) // counts #floor, like the Pico's integer division
+    if offsets_ms is not None:
+        last = np.zeros(len(unique), dtype=np.int64)
+        np.maximum.at(last, inverse, np.asarray(offsets_ms, dtype=np.int64))
+        out["last_seen"] = np.minimum(last, 0xFFFF)
+    out["name"] = -1
+    return out, [names[i] for i in first.tolist()]
+
+def _addresses(addr): #(n, 6) address bytes -> 48-bit ints
+    return (addr.astype(np.uint64) << _ADDR_SHIFTS).sum(axis=1, dtype=np.uint64)
+
+def _name_index(name):
+    name = name.astype(np.int16)
+    name[name == NO_NAME] = -1
+    return name
+
+def decode_frame(data):
+    data = bytes(data)
+    if len(data) == 0 or data[0] not in (1, FRAME_VERSION):
+        return decode_legacy(data) #Picos that have not been reflashed still send text
+    if len(data) < (HEADER_V1 if data[0] == 1 else HEADER).size:
+        raise ValueError("Truncated sighting frame")
+    if data[0] == 1: #no sequence number or timestamp yet
+        (version, kind, name_count, count), seq, ticks = HEADER_V1.unpack_from(data, 0), None, None
+        offset = HEADER_V1.size
+    else:
+        version, kind, name_count, count, seq, ticks = HEADER.unpack_from(data, 0)
+        offset = HEADER.size
+    if kind not in RECORD_DTYPES:
+        raise ValueError(f"Unknown frame kind {kind}")
+    names = []
+    for _ in range(name_count):
+        if offset >= len(data) or offset + 1 + data[offset] > len(data):
+            raise ValueError("Truncated sighting frame")
+        length = data[offset]
+        names.append(data[offset + 1:offset + 1 + length].decode("utf-8", "replace"))
+        offset += 1 + length
+    record_dtype = RECORD_DTYPES[kind]
+    if offset + count * record_dtype.itemsize > len(data):
+        raise ValueError("Truncated sighting frame")
+    records = np.frombuffer(data, dtype=record_dtype, count=count, offset=offset)
+    if np.any((records["name"] >= name_count) & (records["name"] != NO_NAME)):
+        raise ValueError("Name index past the sighting frame's name table")
+    if kind == FRAME_STATS:
+        stats = np.empty(count, dtype=STATS_DTYPE)
+        for field in STATS_DTYPE.names:
+            stats[field] = records[field]
+        return Frame(version, kind, names, np.empty(0, dtype=SIGHTING_DTYPE), stats=stats, seq=seq, ticks=ticks)
+    sightings = np.empty(count, dtype=SIGHTING_DTYPE)
+    sightings["address"] = _addresses(records["addr"])
+    sightings["name"] = _name_index(records["name"])
+    if kind == FRAME_SIGHTINGS:
+        sightings["rssi"] = records["rssi"]
+        return Frame(version, kind, names, sightings, seq=seq, ticks=ticks)
+    sightings["rssi"] = records["rssi_mean"]
+    aggregates = np.empty(count, dtype=AGGREGATE_DTYPE)
+    for field in ("count", "rssi_min", "rssi_max", "rssi_mean", "last_seen"):
+        aggregates[field] = records[field]
+    aggregates["address"] = sightings["address"]
+    aggregates["name"] = sightings["name"]
+    return Frame(version, kind, names, sightings, aggregates, seq=seq, ticks=ticks)
+
+def decode_legacy(data): #"name,Device(ADDR_PUBLIC, aa:bb:cc:dd:ee:ff),rssi"
+    fields = data.decode("utf-8").split(",") #UnicodeDecodeError is a ValueError
+    if len(fields) < 4:
+        raise ValueError("Truncated sighting frame")
+    name = fields[0]
+    address = parse_address(fields[2][1:18])
+    rssi = int(fields[3])
+    if not -128 <= rssi <= 127:
+        raise ValueError(f"RSSI {rssi} out of range")
+    sightings = np.empty(1, dtype=SIGHTING_DTYPE)
+    sightings[0] = (address, rssi, 0)
+    return Frame(0, FRAME_SIGHTINGS, [name], sightings)
+
+def frame_names(frame): #per-sighting names, "None" where the advertisement had none like the old text format
+    return ["None" if i < 0 else frame.names[i] for i in frame.sightings["name"].tolist()]
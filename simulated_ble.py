@@ -0,0 +1,359 @@
+#Stand-in for simplepyble with no radio: the same Adapter/Peripheral/Service/Characteristic calls,
+#backed by a simulated observer Pico that streams synthetic or recorded sightings.
+#Select it with reciever_modular.set_transport(simulated_ble) or BLE_TRANSPORT=simulated,
+#and tune it with simulated_ble.configure(observers=3, devices=500, rate=2000, jitter=0.2).
+import random
+import struct
+import threading
+import time
+import numpy as np # type: ignore
+import sighting_frames
+
+OBSERVER_NAME = "mpy-temp"
+OBSERVER_SERVICE_UUID = "a9d6ede1-f904-4419-b4ea-02d9d5af1577"
+OBSERVER_CHARACTERISTIC_UUID = "497d8d32-1e96-42b9-8041-d3ee7acc24e0"
+OBSERVER_CONTROL_UUID = "4d426505-ee3b-4dde-85c1-f9ca738d7960"
+_CONFIG_FORMAT = struct.Struct("<BHHIIBBH") #see reciever_modular.ScanConfig
+
+#knobs for the simulation, change them with configure()
+settings = {
+    "observers": 1,       #simulated observer Picos advertising OBSERVER_NAME
+    "devices": 50,        #synthetic devices in range of each observer
+    "rate": 200.0,        #sightings per second across all devices
+    "jitter": 0.2,        #random +- fraction applied to every tick interval
+    "tick": 0.01,         #seconds between notification bursts
+    "payload_max": 244,   #bytes per notification, MTU 247 - 3
+    "named_fraction": 0.3, #fraction of synthetic devices that advertise a name
+    "bystanders": 5,      #other peripherals showing up in scans
+    "replay": None,       #path of a recording.py capture to stream instead of synthetic sightings
+    "speed": 1.0,         #replay speed multiplier
+    "aggregate": False,   #aggregation mode: one record per device per window instead of every sighting
+    "window": 1.0,        #seconds per scan window in aggregation mode
+    "drop_every": None,   #seconds between simulated link losses, None for a stable link
+    "connect_failures": 0.0, #probability that a connect attempt fails
+    "loss": 0.0,          #probability that a notification never arrives
+    "clock_skew": 0.0,    #seconds the simulated Pico's clock is ahead of the desktop's (beyond its boot time)
+    "seed": None,
+}
+
+def configure(**kwargs):
+    for key, value in kwargs.items():
+        if key not in settings:
+            raise ValueError(f"Unknown simulation setting {key}")
+        settings[key] = value
+
+
+#Synthetic devices: fixed random addresses (the same for every observer), a base RSSI each and gaussian noise per sighting
+class SyntheticSource:
+    def __init__(self, devices, rate, named_fraction, rng, seed=None):
+        self.rate = rate
+        self.rng = rng
+        population = np.random.default_rng(0 if seed is None else seed)
+        self.addresses = population.integers(0, 1 << 48, size=devices, dtype=np.uint64)
+        self.names = [f"sim-{i}" if population.random() < named_fraction else "None" for i in range(devices)]
+        self.base_rssi = rng.uniform(-95, -40, size=devices) #how far each device is from this observer
+        self._owed = 0.0 #fractional sightings carried over between ticks
+
+    def take(self, elapsed): #sightings for the last elapsed seconds
+        self._owed += self.rate * elapsed
+        n = int(self._owed)
+        self._owed -= n
+        picks = self.rng.integers(0, len(self.addresses), size=n)
+        rssi = np.clip(self.base_rssi[picks] + self.rng.normal(0, 4, size=n), -127, 0).astype(np.int8)
+        return self.addresses[picks], rssi, [self.names[i] for i in picks.tolist()]
+
+
+#Replays a recording at its original pace (times speed), looping at the end
+class ReplaySource:
+    def __init__(self, path, speed):
+        import recording
+        self.reader = recording.Reader(path)
+        self.speed = speed
+        self.position = 0
+        self.clock = 0.0 #seconds of recording time already replayed
+
+    def take(self, elapsed):
+        if len(self.reader) == 0:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int8), []
+        times = self.reader.times
+        start_time = times[0]
+        self.clock += elapsed * self.speed
+        stop = int(np.searchsorted(times, start_time + self.clock, side="right"))
+        start = self.position
+        self.position = stop
+        if stop >= len(times): #start over
+            self.position = 0
+            self.clock = 0.0
+        addresses = self.reader.addresses()[start:stop]
+        return addresses, np.asarray(self.reader.rssi[start:stop]), [self.reader.names.get(a, "None") for a in addresses.tolist()]
+
+
+class Characteristic:
+    def __init__(self, uuid):
+        self._uuid = uuid
+
+    def uuid(self):
+        return self._uuid
+
+
+class Service:
+    def __init__(self, uuid, characteristics):
+        self._uuid = uuid
+        self._characteristics = characteristics
+
+    def uuid(self):
+        return self._uuid
+
+    def characteristics(self):
+        return self._characteristics
+
+
+class Peripheral:
+    def __init__(self, identifier, address, rssi, observer=False):
+        self._identifier = identifier
+        self._address = address
+        self._rssi = rssi
+        self._observer = observer
+        self._connected = False
+        self._callbacks = dict() #(service, characteristic) -> notification callback
+        self._on_connected = None
+        self._on_disconnected = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._config = None #control characteristic contents, None until written
+        self._boot = time.perf_counter() - random.uniform(0, 3600) #ticks_ms counts from here, like a Pico that booted a while ago
+        self._seq = 0 #frame sequence number, kept across connections like the Pico's
+
+    def identifier(self):
+        return self._identifier
+
+    def address(self):
+        return self._address
+
+    def rssi(self):
+        return self._rssi
+
+    def mtu(self):
+        return settings["payload_max"] + 3
+
+    def is_connectable(self):
+        return True
+
+    def is_connected(self):
+        return self._connected
+
+    def set_callback_on_connected(self, callback):
+        self._on_connected = callback
+
+    def set_callback_on_disconnected(self, callback):
+        self._on_disconnected = callback
+
+    def connect(self):
+        time.sleep(0.05)
+        if random.random() < settings["connect_failures"]:
+            raise RuntimeError("Simulated connection failure")
+        self._connected = True
+        if self._on_connected:
+            self._on_connected()
+
+    def disconnect(self):
+        if not self._connected:
+            raise RuntimeError("Peripheral is not connected")
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self._callbacks.clear()
+        self._connected = False
+        if self._on_disconnected:
+            self._on_disconnected()
+
+    def services(self): #before connecting, like simplepyble, only the advertised service UUIDs without characteristics
+        if not self._connected:
+            return [Service(OBSERVER_SERVICE_UUID, [])] if self._observer else []
+        if not self._observer:
+            return [Service("0000180a-0000-1000-8000-00805f9b34fb", [Characteristic("00002a29-0000-1000-8000-00805f9b34fb")])]
+        return [Service(OBSERVER_SERVICE_UUID, [Characteristic(OBSERVER_CHARACTERISTIC_UUID), Characteristic(OBSERVER_CONTROL_UUID)])]
+
+    def notify(self, service, characteristic, callback):
+        if not self._connected:
+            raise RuntimeError("Peripheral is not connected")
+        self._callbacks[(service, characteristic)] = callback
+        if self._observer and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._stream, daemon=True)
+            self._thread.start()
+
+    def indicate(self, service, characteristic, callback):
+        self.notify(service, characteristic, callback)
+
+    def unsubscribe(self, service, characteristic):
+        self._callbacks.pop((service, characteristic), None)
+
+    def read(self, service, characteristic):
+        if characteristic == OBSERVER_CONTROL_UUID and self._observer:
+            if self._config is None:
+                window = int(settings["window"] * 1000)
+                return _CONFIG_FORMAT.pack(1, window, 0, 1_280_000, 11_250, 2 if settings["aggregate"] else 0, 0, 100)
+            return self._config
+        return b""
+
+    def write_request(self, service, characteristic, data):
+        if not self._connected:
+            raise RuntimeError("Peripheral is not connected")
+        if characteristic == OBSERVER_CONTROL_UUID and self._observer: #clamped like apply_config on the Pico
+            if len(data) != _CONFIG_FORMAT.size or data[0] != 1:
+                return
+            version, duration, pause, interval, window, flags, throttle, adv = _CONFIG_FORMAT.unpack(data)
+            interval = max(interval, 2500)
+            self._config = _CONFIG_FORMAT.pack(version, max(duration, 100), pause, interval, min(max(window, 2500), interval),
+                                               flags, throttle, max(adv, 20))
+
+    def _aggregation(self): #(aggregate, window seconds): the written config wins over the global settings
+        if self._config is None:
+            return settings["aggregate"], settings["window"]
+        _, duration, _, _, _, flags, _, _ = _CONFIG_FORMAT.unpack(self._config)
+        return bool(flags & 2), duration / 1000
+
+    def write_command(self, service, characteristic, data):
+        self.write_request(service, characteristic, data)
+
+    def _stream(self): #the simulated Pico: every tick, pack what was seen into frames and notify
+        seed = None if settings["seed"] is None else settings["seed"] + int(self._address.replace(":", ""), 16) % 1000
+        rng = np.random.default_rng(seed)
+        if settings["replay"]:
+            source = ReplaySource(settings["replay"], settings["speed"])
+        else:
+            source = SyntheticSource(settings["devices"], settings["rate"], settings["named_fraction"], rng, settings["seed"])
+        last = window_start = time.perf_counter()
+        window = ([], [], [], []) #aggregation mode: addresses, rssis, names, ms into the window
+        drop_at = None if settings["drop_every"] is None else last + settings["drop_every"]
+        results = 0 #stats frame counters, sent once a second like the Pico does after every scan window
+        stats_at = last + 1.0
+        while not self._stop.is_set():
+            if drop_at is not None and last >= drop_at: #the Pico resets: the link goes away without us asking
+                threading.Thread(target=self.disconnect, daemon=True).start()
+                return
+            tick = settings["tick"] * (1 + rng.uniform(-settings["jitter"], settings["jitter"]))
+            self._stop.wait(max(tick, 0.0))
+            now = time.perf_counter()
+            addresses, rssis, names = source.take(now - last)
+            last = now
+            results += len(addresses)
+            callback = self._callbacks.get((OBSERVER_SERVICE_UUID, OBSERVER_CHARACTERISTIC_UUID))
+            ticks = int((now - self._boot + settings["clock_skew"]) * 1000) % sighting_frames.TICKS_PERIOD
+            if now >= stats_at:
+                self._send(callback, [sighting_frames.encode_stats_frame(results, 0, seq=self._seq, ticks=ticks)], rng)
+                stats_at = now + 1.0
+            aggregate, window_length = self._aggregation()
+            if aggregate:
+                window[0].append(addresses)
+                window[1].append(rssis)
+                window[2].extend(names)
+                window[3].append(np.full(len(addresses), int((now - window_start) * 1000)))
+                if now - window_start < window_length:
+                    continue
+                aggregates, names = sighting_frames.aggregate(np.concatenate(window[0]), np.concatenate(window[1]), window[2],
+                                                              np.concatenate(window[3]))
+                window = ([], [], [], [])
+                window_start = now
+                frames = sighting_frames.encode_aggregate_frames(aggregates, names, settings["payload_max"], self._seq, ticks)
+            else:
+                frames = sighting_frames.encode_frames(addresses, rssis, names, settings["payload_max"], self._seq, ticks)
+                window_start = now
+            self._send(callback, list(frames), rng)
+
+    def _send(self, callback, frames, rng): #numbered frames are sent (and lost) whether or not anyone is subscribed
+        self._seq = (self._seq + len(frames)) % 65536
+        if callback is None:
+            return
+        for frame in frames:
+            if rng.random() >= settings["loss"]:
+                callback(frame)
+
+
+def _random_address(rng):
+    return ":".join(f"{rng.randrange(256):02X}" for _ in range(6))
+
+
+class Adapter:
+    _adapters = None
+
+    def __init__(self, identifier, address):
+        self._identifier = identifier
+        self._address = address
+        rng = random.Random(settings["seed"])
+        self._peripherals = [Peripheral(OBSERVER_NAME, _random_address(rng), -55, observer=True) for _ in range(settings["observers"])]
+        self._peripherals += [Peripheral(f"bystander-{i}", _random_address(rng), rng.randrange(-95, -45))
+                              for i in range(settings["bystanders"])]
+        self._results = []
+        self._scanning = False
+        self._on_scan_start = None
+        self._on_scan_stop = None
+        self._on_scan_found = None
+        self._on_scan_updated = None
+
+    @staticmethod
+    def get_adapters():
+        if Adapter._adapters is None:
+            Adapter._adapters = [Adapter("sim0", "00:00:00:00:00:01")]
+        return Adapter._adapters
+
+    @staticmethod
+    def bluetooth_enabled():
+        return True
+
+    def identifier(self):
+        return self._identifier
+
+    def address(self):
+        return self._address
+
+    def set_callback_on_scan_start(self, callback):
+        self._on_scan_start = callback
+
+    def set_callback_on_scan_stop(self, callback):
+        self._on_scan_stop = callback
+
+    def set_callback_on_scan_found(self, callback):
+        self._on_scan_found = callback
+
+    def set_callback_on_scan_updated(self, callback):
+        self._on_scan_updated = callback
+
+    def scan_start(self): #peripherals show up one by one over the first second, like a real scan
+        self._results = []
+        self._scanning = True
+        if self._on_scan_start:
+            self._on_scan_start()
+        threading.Thread(target=self._discover, daemon=True).start()
+
+    def _discover(self):
+        order = list(self._peripherals)
+        random.shuffle(order)
+        for peripheral in order:
+            time.sleep(1.0 / len(order))
+            if not self._scanning:
+                return
+            self._results.append(peripheral)
+            if self._on_scan_found:
+                self._on_scan_found(peripheral)
+
+    def scan_stop(self):
+        self._scanning = False
+        if self._on_scan_stop:
+            self._on_scan_stop()
+
+    def scan_is_active(self):
+        return self._scanning
+
+    def scan_for(self, timeout_ms):
+        self.scan_start()
+        time.sleep(timeout_ms / 1000)
+        self.scan_stop()
+
+    def scan_get_results(self):
+        return list(self._results)
+
+    def get_paired_peripherals(self):
+        return []
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import time
+import tkinter
+import numpy as np # type: ignore
+import bluetoothConnectionApp
+import sighting_frames
+
+
+def test_import_leaves_heavy_modules_for_later():
+    #the window's startup time depends on this; checked in a fresh interpreter since other tests import these
+    code = ("import sys, bluetoothConnectionApp; "
+            "print(','.join(m for m in ('matplotlib', 'serial', 'sqlite3', 'multiprocessing.shared_memory') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(bluetoothConnectionApp.__file__)))
+    assert result.stdout.strip() == ""
+
+def test_ingest_without_a_window():
+    ingest = bluetoothConnectionApp.Ingest()
+    data = next(sighting_frames.encode_frames([0xAABBCCDDEEFF, 0x112233445566], [-50, -70], ["phone", "None"]))
+    now = time.time() #devices far in the past would be evicted
+    assert ingest.deconstruct_data(data, t=now)
+    assert not ingest.deconstruct_data(data, t=now + 1) #same devices, same names
+    times, rssi = ingest.found_addresses.series(0xAABBCCDDEEFF)
+    assert times.tolist() == [now, now + 1]
+    assert rssi.tolist() == [-50, -50]
+    assert ingest.registry.label(0xAABBCCDDEEFF) == "aa:bb:cc:dd:ee:ff (phone)"
+    ingest.expire(now + 2)
+    ingest.close()
+    assert tkinter._default_root is None
+
+def test_ingest_logs_when_given_a_log():
+    class Log:
+        def __init__(self):
+            self.sightings = []
+        def add_sightings(self, names, addresses, rssis):
+            self.sightings.extend(zip(names, addresses, rssis))
+        def add_aggregates(self, names, aggregates):
+            pass
+        def write(self, message):
+            pass
+    ingest = bluetoothConnectionApp.Ingest(log=Log())
+    ingest.ingest_sightings(np.array([1, 2], dtype=np.uint64), ["a", "None"], np.array([-40, -60], dtype=np.int8), 5.0)
+    assert ingest.log.sightings == [("a", 1, -40), ("None", 2, -60)]
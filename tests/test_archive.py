@@ -0,0 +1,51 @@
+import numpy as np # type: ignore
+import pytest # type: ignore
+import archive
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = archive.Archive(str(tmp_path / "sightings.db"), batch_size=1000, flush_interval=3600)
+    yield store
+    store.close()
+
+def test_sightings_by_device_and_time(store):
+    store.add(3600.0, [1, 2], [-50, -60], ["phone", "None"])
+    store.add(np.array([3700.0, 7300.0]), np.array([1, 1], dtype=np.uint64), np.array([-40, -70]), ["None", "None"], observer=1)
+    store.flush()
+    times, rssi = store.sightings(1)
+    assert times.tolist() == [3600.0, 3700.0, 7300.0]
+    assert rssi.tolist() == [-50, -40, -70]
+    assert store.sightings(1, start=3650, end=7000)[0].tolist() == [3700.0]
+    assert store.sightings(1, limit=2)[0].tolist() == [3700.0, 7300.0] #the newest
+    assert store.sightings(3)[0].tolist() == []
+
+def test_devices_and_hourly_roll_up(store):
+    store.add(3600.0, [1, 2], [-50, -60], ["phone", "None"])
+    store.flush()
+    store.add(3700.0, [1], [-40], ["None"]) #a later batch without the name keeps it
+    store.add(7300.0, [1], [-70], ["None"])
+    store.flush()
+    assert store.device(1) == ("phone", 3600.0, 7300.0, 3)
+    assert store.device(3) is None
+    assert [row[0] for row in store.recent_devices(100, now=7350.0)] == [1]
+    assert store.hourly(1) == [(1, 3600, 2, -50, -40, -45.0), (1, 7200, 1, -70, -70, -70.0)]
+    assert [row[0] for row in store.hourly(start=3600, end=3600)] == [1, 2]
+
+def test_buffer_flushes_at_batch_size(tmp_path):
+    store = archive.Archive(str(tmp_path / "sightings.db"), batch_size=3, flush_interval=3600)
+    try:
+        store.add(1.0, [1, 2], [-50, -60], ["None", "None"])
+        assert store.sightings(1)[0].tolist() == []
+        store.add(2.0, [1], [-50], ["None"])
+        assert store.sightings(1)[0].tolist() == [1.0, 2.0]
+    finally:
+        store.close()
+
+def test_add_copies_the_callers_arrays(store):
+    addresses = np.array([1, 2], dtype=np.uint64)
+    store.add(1.0, addresses, np.array([-50, -60]), ["None", "None"])
+    addresses[:] = 9 #e.g. a ring buffer slot being reused
+    store.flush()
+    assert store.sightings(9)[0].tolist() == []
+    assert store.sightings(1)[0].tolist() == [1.0]
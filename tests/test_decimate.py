@@ -0,0 +1,36 @@
+import numpy as np # type: ignore
+import decimate
+
+
+def test_small_inputs_keep_one_point_past_each_edge():
+    x = np.arange(10.0)
+    out_x, out_y = decimate.minmax_decimate(x, x * 2, 3.5, 6.5, buckets=100)
+    assert out_x.tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert out_y.tolist() == [6.0, 8.0, 10.0, 12.0, 14.0]
+
+def test_decimated_line_keeps_edges_and_every_bucket_extreme():
+    rng = np.random.default_rng(1)
+    x = np.sort(rng.uniform(0, 100, 10_000))
+    y = rng.integers(-100, -30, len(x)).astype(np.int8)
+    x0, x1, buckets = 20.0, 80.0, 50
+    out_x, out_y = decimate.minmax_decimate(x, y, x0, x1, buckets)
+    assert len(out_x) <= 2 * buckets + 2
+    assert out_x[0] < x0 and out_x[-1] > x1 #the line runs off both edges
+    assert np.all(np.diff(out_x) >= 0)
+    for b in range(buckets):
+        lo, hi = x0 + b * (x1 - x0) / buckets, x0 + (b + 1) * (x1 - x0) / buckets
+        inside = (x >= lo) & (x < hi)
+        kept = (out_x >= lo) & (out_x < hi)
+        assert out_y[kept].min() == y[inside].min()
+        assert out_y[kept].max() == y[inside].max()
+
+def test_cache_hits_until_forgotten():
+    cache = decimate.DecimationCache(max_entries=2)
+    x = np.arange(1000.0)
+    first = cache.get(1, 0, x, x, 0.0, 999.0, 10)
+    assert cache.get(1, 0, x, x, 0.0, 999.0, 10) is first
+    assert cache.get(1, 1, x, x, 0.0, 999.0, 10) is not first #new samples
+    cache.get(2, 0, x, x, 0.0, 999.0, 10)
+    cache.forget(2)
+    assert len(cache._entries) == 1
+    assert cache.get(1, 0, x, x, 0.0, 999.0, 10) is not first #pushed out by max_entries
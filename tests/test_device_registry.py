@@ -0,0 +1,37 @@
+import pytest # type: ignore
+import device_registry
+
+
+def make_registry():
+    registry = device_registry.DeviceRegistry()
+    registry.update([0xAA0000000001, 0xBB0000000002, 0xAA0000000001], ["phone", "None", "phone"], [-70, -40, -60], 1.0)
+    registry.update([0xCC0000000003], ["watch"], [-90], 2.0)
+    return registry
+
+def test_orders():
+    registry = make_registry()
+    assert registry.view("last_seen") == [0xCC0000000003, 0xAA0000000001, 0xBB0000000002]
+    assert registry.view("strongest") == [0xBB0000000002, 0xAA0000000001, 0xCC0000000003]
+    assert registry.view("most_seen", limit=1) == [0xAA0000000001]
+    with pytest.raises(ValueError):
+        registry.view("name")
+
+def test_filter_by_name_or_address_prefix():
+    registry = make_registry()
+    assert registry.view(query="WATCH") == [0xCC0000000003]
+    assert registry.view(query="aa:00") == [0xAA0000000001]
+    assert registry.view(query="bb00") == [0xBB0000000002]
+
+def test_name_arrives_later_and_is_kept():
+    registry = make_registry()
+    assert registry.label(0xBB0000000002) == "bb:00:00:00:00:02 (None)"
+    assert registry.update([0xBB0000000002], ["tag"], [-45], 3.0) #renamed, the labels changed
+    assert registry.label(0xBB0000000002) == "bb:00:00:00:00:02 (tag)"
+    assert not registry.update([0xBB0000000002], ["None"], [-45], 4.0)
+    assert registry.names[0xBB0000000002] == "tag"
+
+def test_remove():
+    registry = make_registry()
+    registry.remove([0xAA0000000001, 0x123])
+    assert 0xAA0000000001 not in registry
+    assert registry.view("strongest") == [0xBB0000000002, 0xCC0000000003]
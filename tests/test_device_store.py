@@ -0,0 +1,36 @@
+import numpy as np # type: ignore
+import device_store
+
+
+def test_history_wraps_oldest_first():
+    store = device_store.DeviceStore(capacity=4)
+    for i in range(6):
+        store.add(1, "a", -40 - i, float(i))
+    times, rssi = store.series(1)
+    assert times.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert rssi.tolist() == [-42, -43, -44, -45]
+    assert store.version(1) == 6
+
+def test_times_never_go_backwards():
+    store = device_store.DeviceStore(capacity=8)
+    store.add_batch(np.array([1, 2, 1]), ["a", "b", "a"], np.array([-50, -60, -51]), 10.0)
+    store.add_batch(np.array([1, 1]), ["a", "a"], np.array([-52, -53]), np.array([9.0, 11.0])) #another observer's clock is behind
+    store.add(1, "a", -54, 10.5)
+    times, rssi = store.series(1)
+    assert times.tolist() == [10.0, 10.0, 10.0, 11.0, 11.0]
+    assert rssi.tolist() == [-50, -51, -52, -53, -54]
+
+def test_full_store_drops_least_recently_seen():
+    store = device_store.DeviceStore(capacity=4, max_devices=2)
+    store.add(1, "a", -50, 1.0)
+    store.add(2, "b", -50, 2.0)
+    store.add(3, "c", -50, 3.0)
+    assert sorted(store.addresses()) == [2, 3]
+    assert store.evict(now=4.0) == [1]
+
+def test_evict_stale_devices():
+    store = device_store.DeviceStore(capacity=4, max_age=10.0)
+    store.add(1, "a", -50, 0.0)
+    store.add(2, "b", -50, 8.0)
+    assert store.evict(now=15.0) == [1]
+    assert store.addresses() == [2]
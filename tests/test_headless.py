@@ -0,0 +1,28 @@
+import headless
+import sighting_frames
+
+
+def frame():
+    return sighting_frames.decode_frame(next(sighting_frames.encode_frames([0xAABBCCDDEEFF], [-50], ['say "hi", bob'])))
+
+def test_csv_header_only_in_a_new_file(tmp_path):
+    path = str(tmp_path / "capture.csv")
+    for t in (1.0, 2.0): #two captures appended to one file
+        stream = headless.open_output(path)
+        writer = headless.CsvWriter(stream)
+        if headless.is_empty(stream):
+            writer.write_header()
+        writer.write_frame(t, frame())
+        stream.close()
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines == ["time,observer,address,name,rssi,count,rssi_min,rssi_max",
+                     '1.000,0,aa:bb:cc:dd:ee:ff,"say ""hi"", bob",-50,1,-50,-50',
+                     '2.000,0,aa:bb:cc:dd:ee:ff,"say ""hi"", bob",-50,1,-50,-50']
+
+def test_json_lines(tmp_path):
+    path = str(tmp_path / "capture.jsonl")
+    with headless.open_output(path) as stream:
+        headless.JsonLinesWriter(stream).write_frame(1.0, frame(), observer=2)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == '{"time": 1.000, "observer": 2, "address": "aa:bb:cc:dd:ee:ff", "name": "say \\"hi\\", bob", "rssi": -50}\n'
@@ -0,0 +1,23 @@
+import instrumentation
+
+
+def test_stages_in_display_order():
+    instrumentation.enable()
+    try:
+        for stage in ("render", "custom", "decode"):
+            instrumentation.add(stage, 0.002, 10)
+        stages = instrumentation.snapshot()
+        assert list(stages) == ["decode", "render", "custom"]
+        assert 1.9 < stages["decode"]["p50_ms"] < 2.2
+        lines = instrumentation.format_lines(stages).splitlines()
+        assert [line.split()[0] for line in lines] == ["decode", "render", "custom"]
+    finally:
+        instrumentation.enable(False)
+
+def test_disabled_records_nothing():
+    instrumentation.enable(False)
+    instrumentation.reset()
+    assert instrumentation.start() == 0.0
+    instrumentation.record("decode", instrumentation.start(), 1)
+    instrumentation.add("queue", 0.5)
+    assert instrumentation.snapshot() == {}
@@ -0,0 +1,31 @@
+import link_timing
+
+
+def test_clock_follows_least_delayed_frame():
+    clock = link_timing.LinkClock()
+    assert clock.to_host(10_000, 100.5) == 100.5
+    assert clock.to_host(11_000, 101.2) == 101.2 #arrived faster, the offset moves down to it
+    assert clock.to_host(12_000, 103.0) == 102.2
+    assert abs(clock.delay - 0.8) < 1e-9
+
+def test_clock_unwraps_ticks():
+    clock = link_timing.LinkClock()
+    clock.to_host(link_timing.TICKS_PERIOD - 500, 100.0)
+    assert clock.to_host(500, 101.0) == 101.0
+
+def test_clock_resets_when_the_pico_reboots():
+    clock = link_timing.LinkClock()
+    clock.to_host(3_600_000, 100.0)
+    clock.to_host(3_601_000, 101.0)
+    assert clock.to_host(200, 105.0) == 105.0 #ticks went back an hour, the offset jumps up
+    assert clock.to_host(1_200, 106.0) == 106.0
+
+def test_clock_resets_when_ticks_leap_ahead():
+    clock = link_timing.LinkClock()
+    clock.to_host(0, 100.0)
+    assert clock.to_host(link_timing.TICKS_PERIOD // 2 - 1, 101.0) == 101.0
+
+def test_sequence_counts_missed_frames():
+    sequence = link_timing.SequenceCounter()
+    assert [sequence.add(seq) for seq in (65534, 65535, 2, 1, 3)] == [0, 0, 2, 0, 0]
+    assert sequence.lost == 2
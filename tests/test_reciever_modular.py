@@ -0,0 +1,66 @@
+import reciever_modular
+import sighting_frames as sf
+
+
+class FakePeripheral: #just enough of simplepyble.Peripheral for a session that never really connects
+    def __init__(self, address):
+        self._address = address
+        self.callback = None
+
+    def identifier(self):
+        return "mpy-temp"
+
+    def address(self):
+        return self._address
+
+    def connect(self):
+        pass
+
+    def notify(self, service_uuid, characteristic_uuid, callback):
+        self.callback = callback
+
+def sightings(address, seq, ticks):
+    return next(sf.encode_frames([address], [-50], ["None"], seq=seq, ticks=ticks))
+
+def manager_with(count):
+    manager = reciever_modular.SessionManager()
+    for i in range(count):
+        manager.add(FakePeripheral(f"00:00:00:00:00:0{i}"))
+    manager.connect_all()
+    manager.subscribe_all()
+    return manager
+
+def test_drain_orders_by_send_time_across_observers():
+    manager = manager_with(2)
+    #observer 0's second frame was sent at 101.0 but spent 0.5 s on the link, after observer 1's frame sent at 101.2
+    manager.incoming.put((100.0, 0, sightings(1, 0, 1000)))
+    manager.incoming.put((101.2, 1, sightings(2, 0, 7000)))
+    manager.incoming.put((101.5, 0, sightings(3, 1, 2000)))
+    frames = manager.drain()
+    assert [(t, observer) for t, observer, frame in frames] == [(100.0, 0), (101.0, 0), (101.2, 1)]
+    assert [int(frame.sightings["address"][0]) for t, observer, frame in frames] == [1, 3, 2]
+    assert manager.sessions[0].sightings == 2
+
+def test_drain_keeps_stats_frames_on_the_session():
+    manager = manager_with(1)
+    manager.incoming.put((100.0, 0, sf.encode_stats_frame(500, 2, mem_free=4096, gc_ms=3, seq=0, ticks=1000)))
+    manager.incoming.put((100.1, 0, sightings(1, 1, 1100)))
+    frames = manager.drain()
+    assert len(frames) == 1
+    assert manager.sessions[0].pico_stats == {"results": 500, "dropped": 2, "mem_free": 4096, "gc_ms": 3}
+    assert manager.sessions[0].sightings == 1
+
+def test_resubscribe_resets_clock_and_sequence():
+    manager = manager_with(1)
+    session = manager.sessions[0]
+    manager.incoming.put((100.0, 0, sightings(1, 0, 1000)))
+    manager.incoming.put((101.0, 0, sightings(1, 1, 2000)))
+    manager.drain()
+    session.subscribe() #the link came back, the Pico may have restarted in between
+    manager.incoming.put((110.0, 0, sightings(1, 5, 10)))
+    (t, observer, frame), = manager.drain()
+    assert t == 110.0 #not mapped through the old offset
+    assert session.sequence.lost == 0
+    manager.incoming.put((110.5, 0, sightings(1, 7, 510)))
+    manager.drain()
+    assert session.sequence.lost == 1
@@ -0,0 +1,37 @@
+import numpy as np # type: ignore
+import pytest # type: ignore
+import device_store
+import recording
+
+
+def test_round_trip_and_append(tmp_path):
+    path = str(tmp_path / "capture.rssi")
+    recorder = recording.Recorder(path)
+    recorder.write(1.0, np.array([0xAABBCCDDEEFF, 2], dtype=np.uint64), np.array([-50, -60]), ["phone", "None"], device=3)
+    recorder.close()
+    with open(path, "ab") as f: #a capture that stopped mid-record
+        f.write(b"\0" * 5)
+    recorder = recording.Recorder(path)
+    recorder.write(2.0, np.array([0xAABBCCDDEEFF], dtype=np.uint64), np.array([-55]), ["phone"])
+    recorder.close()
+    reader = recording.Reader(path)
+    assert len(reader) == 3
+    assert reader.addresses().tolist() == [0xAABBCCDDEEFF, 2, 0xAABBCCDDEEFF]
+    assert reader.times.tolist() == [1.0, 1.0, 2.0]
+    assert reader.rssi.tolist() == [-50, -60, -55]
+    assert reader.device.tolist() == [3, 3, 0]
+    assert reader.names == {0xAABBCCDDEEFF: "phone"}
+    store = device_store.DeviceStore(capacity=4)
+    reader.load_into(store)
+    assert store.series(0xAABBCCDDEEFF)[1].tolist() == [-50, -55]
+    del reader
+
+@pytest.mark.parametrize("content", [b"RSSI", b"x" * 64])
+def test_rejects_files_that_are_not_recordings(tmp_path, content):
+    path = tmp_path / "other.rssi"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        recording.Reader(str(path))
+    with pytest.raises(ValueError):
+        recording.Recorder(str(path))
+    assert path.read_bytes() == content #left alone
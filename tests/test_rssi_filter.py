@@ -0,0 +1,39 @@
+import pytest # type: ignore
+import rssi_filter
+
+
+def test_ema_smooths_each_device_in_order():
+    smoother = rssi_filter.RssiFilter("ema", alpha=0.5)
+    smoothed, _ = smoother.update([1, 2, 1], [-60, -70, -40], 0.0)
+    assert smoothed.tolist() == [-60, -70, -50] #device 1's second sample in the same batch sees its first
+    assert smoother.smoothed(1) == -50
+
+@pytest.mark.parametrize("method", rssi_filter.METHODS)
+def test_methods_follow_a_constant_signal(method):
+    smoother = rssi_filter.RssiFilter(method)
+    for i in range(20):
+        smoothed, _ = smoother.update([1], [-55], float(i))
+    assert smoothed.tolist() == [-55]
+
+def test_presence_has_hysteresis_and_times_out():
+    smoother = rssi_filter.RssiFilter("ema", alpha=1.0, enter=-80, leave=-90, timeout=30)
+    assert smoother.update([1], [-70], 0.0)[1] == [(0.0, 1, "arrived")]
+    assert smoother.update([1], [-85], 1.0)[1] == [] #between leave and enter
+    assert smoother.update([1], [-95], 2.0)[1] == [(2.0, 1, "departed")]
+    smoother.update([1], [-70], 3.0)
+    assert smoother.expire(20.0) == []
+    assert smoother.expire(40.0) == [(40.0, 1, "departed")]
+
+def test_expire_forgets_old_devices():
+    smoother = rssi_filter.RssiFilter("ema", timeout=30, capacity=4)
+    for i in range(100): #randomized addresses, each seen once
+        smoother.update([1000 + i], [-60], float(i))
+        smoother.expire(float(i))
+    assert len(smoother.slots) <= 31
+    assert smoother.capacity <= 64
+    assert smoother.smoothed(1099) == -60
+    assert smoother.smoothed(1000) is None
+
+def test_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        rssi_filter.RssiFilter("mean")
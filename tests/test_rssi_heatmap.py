@@ -0,0 +1,21 @@
+import numpy as np # type: ignore
+import rssi_heatmap
+
+
+def test_bin_rows_means_per_row_and_bin():
+    series = [
+        (np.array([0.0, 1.0, 2.0, 6.0, 9.5]), np.array([-40, -50, -60, -70, -80], dtype=np.int8)),
+        (np.array([], dtype=np.float64), np.array([], dtype=np.int8)), #nothing at all
+        (np.array([-5.0, 4.0, 12.0]), np.array([-30, -90, -20], dtype=np.int8)), #one sample before and one after the window
+    ]
+    image = rssi_heatmap.bin_rows(series, 0.0, 10.0, 5)
+    assert image.shape == (3, 5)
+    assert image.dtype == np.float32
+    assert image[0, 0] == -45 #mean of 0.0 and 1.0
+    assert image[0, 1] == -60
+    assert image[0, 3] == -70
+    assert image[0, 4] == -80
+    assert np.isnan(image[0, 2])
+    assert np.isnan(image[1]).all()
+    assert image[2, 2] == -90
+    assert np.isnan(image[2, [0, 1, 3, 4]]).all()
@@ -0,0 +1,83 @@
+import time
+import numpy as np # type: ignore
+import pytest # type: ignore
+import shm_pipeline
+
+
+@pytest.fixture
+def ring():
+    ring = shm_pipeline.SightingRing(capacity=8)
+    yield ring
+    ring.close()
+
+def write(ring, t, addresses, observer=0):
+    return ring.write(t, np.array(addresses, dtype=np.uint64), np.full(len(addresses), -50, dtype=np.int8), observer)
+
+def read(ring):
+    parts = ring.pending()
+    records = np.concatenate(parts) if parts else np.empty(0, dtype=shm_pipeline.RECORD_DTYPE)
+    ring.release(len(records))
+    return records
+
+def test_records_come_out_in_order_across_the_wrap(ring):
+    assert write(ring, 1.0, [1, 2, 3, 4, 5, 6]) == 6
+    assert read(ring)["address"].tolist() == [1, 2, 3, 4, 5, 6]
+    assert write(ring, 2.0, [7, 8, 9, 10], observer=1) == 4 #wraps to the front
+    assert len(ring.pending()) == 2
+    records = read(ring)
+    assert records["address"].tolist() == [7, 8, 9, 10]
+    assert records["t"].tolist() == [2.0] * 4
+    assert records["observer"].tolist() == [1] * 4
+    assert ring.pending() == []
+
+def test_full_ring_drops_the_newest(ring):
+    assert write(ring, 1.0, range(6)) == 6
+    assert write(ring, 2.0, range(10, 15)) == 2
+    assert ring.dropped == 3
+    assert read(ring)["address"].tolist() == [0, 1, 2, 3, 4, 5, 10, 11]
+
+def test_consumer_attaches_by_name(ring):
+    other = shm_pipeline.SightingRing(name=ring.name)
+    try:
+        assert other.capacity == 8
+        write(ring, 1.0, [42])
+        ring.names_queued()
+        assert other.names_sent == 1
+        assert read(other)["address"].tolist() == [42]
+        assert ring.pending() == []
+    finally:
+        other.close()
+
+def test_receiver_reports_why_it_stopped(monkeypatch):
+    monkeypatch.setenv("BLE_TRANSPORT", "simulated")
+    receiver = shm_pipeline.ReceiverProcess(capacity=8, adapter_index=5) #no such adapter
+    receiver.start()
+    try:
+        receiver.process.join(30)
+        assert not receiver.process.is_alive()
+        assert receiver.drain() == []
+        events = receiver.poll()
+        assert events[-1][0] == "status" and events[-1][1].startswith("Receiver stopped: ")
+    finally:
+        receiver.stop()
+
+def test_forgotten_names_are_sent_again(monkeypatch):
+    monkeypatch.setenv("BLE_TRANSPORT", "simulated")
+    receiver = shm_pipeline.ReceiverProcess(connect_all=False) #stops scanning at the first observer
+    receiver.start()
+    try:
+        deadline = time.monotonic() + 30
+        while not receiver.names and time.monotonic() < deadline:
+            receiver.poll()
+            receiver.drain()
+            time.sleep(0.05)
+        address = next(iter(receiver.names))
+        receiver.forget([address])
+        assert address not in receiver.names
+        while address not in receiver.names and time.monotonic() < deadline:
+            receiver.poll()
+            receiver.drain()
+            time.sleep(0.05)
+        assert address in receiver.names
+    finally:
+        receiver.stop()
@@ -0,0 +1,67 @@
+import struct
+import numpy as np # type: ignore
+import pytest # type: ignore
+import sighting_frames as sf
+
+ADDRESSES = [0xAABBCCDDEEFF, 0x112233445566, 0xAABBCCDDEEFF]
+RSSIS = [-40, -75, -41]
+NAMES = ["phone", "None", "phone"]
+
+
+def test_v2_round_trip():
+    frames = list(sf.encode_frames(ADDRESSES, RSSIS, NAMES, seq=7, ticks=1234))
+    assert len(frames) == 1
+    frame = sf.decode_frame(frames[0])
+    assert (frame.version, frame.kind, frame.seq, frame.ticks) == (2, sf.FRAME_SIGHTINGS, 7, 1234)
+    assert frame.names == ["phone"]
+    assert frame.sightings["address"].tolist() == ADDRESSES
+    assert frame.sightings["rssi"].tolist() == RSSIS
+    assert sf.frame_names(frame) == NAMES
+
+def test_frames_split_at_payload_max():
+    count = 100
+    frames = list(sf.encode_frames(range(count), [-50] * count, ["None"] * count, payload_max=64, seq=65535))
+    assert all(len(f) <= 64 for f in frames)
+    decoded = [sf.decode_frame(f) for f in frames]
+    assert [f.seq for f in decoded[:2]] == [65535, 0] #wraps like the Pico's counter
+    assert np.concatenate([f.sightings["address"] for f in decoded]).tolist() == list(range(count))
+
+def test_v1_has_no_seq_or_ticks():
+    data = struct.pack("<BBBB", 1, sf.FRAME_SIGHTINGS, 1, 1) + b"\x03abc" + (0x010203040506).to_bytes(6, "big") + struct.pack("<bB", -60, 0)
+    frame = sf.decode_frame(data)
+    assert (frame.version, frame.seq, frame.ticks) == (1, None, None)
+    assert frame.sightings["address"].tolist() == [0x010203040506]
+    assert sf.frame_names(frame) == ["abc"]
+
+def test_aggregates_and_stats():
+    aggregates, names = sf.aggregate(ADDRESSES, RSSIS, NAMES, offsets_ms=[10, 20, 30])
+    frame = sf.decode_frame(next(sf.encode_aggregate_frames(aggregates, names)))
+    assert frame.kind == sf.FRAME_AGGREGATES
+    row = frame.aggregates[frame.aggregates["address"] == 0xAABBCCDDEEFF][0]
+    assert (row["count"], row["rssi_min"], row["rssi_max"], row["rssi_mean"], row["last_seen"]) == (2, -41, -40, -41, 30)
+    assert frame.sightings["rssi"].tolist() == frame.aggregates["rssi_mean"].tolist()
+    stats = sf.decode_frame(sf.encode_stats_frame(100, 3, mem_free=5000, gc_ms=4))
+    assert len(stats.sightings) == 0
+    assert stats.stats[["results", "dropped", "mem_free", "gc_ms"]].tolist() == [(100, 3, 5000, 4)]
+
+def test_legacy_text():
+    frame = sf.decode_frame(b"phone,Device(ADDR_PUBLIC, aa:bb:cc:dd:ee:ff),-55")
+    assert frame.version == 0
+    assert frame.sightings["address"].tolist() == [0xAABBCCDDEEFF]
+    assert frame.sightings["rssi"].tolist() == [-55]
+    assert sf.frame_names(frame) == ["phone"]
+
+@pytest.mark.parametrize("data", [
+    b"", b"abc", b"\x01", b"\x01\x00\x01", #empty, short text, short v1 header
+    b"\x02\x00\x00\x01\x00", #short v2 header
+    sf.HEADER.pack(2, sf.FRAME_SIGHTINGS, 1, 0, 0, 0), #name table missing
+    sf.HEADER.pack(2, sf.FRAME_SIGHTINGS, 1, 0, 0, 0) + b"\x05ab", #name cut short
+    sf.HEADER.pack(2, sf.FRAME_SIGHTINGS, 0, 2, 0, 0) + bytes(8), #second record missing
+    sf.HEADER.pack(2, 9, 0, 0, 0, 0), #unknown kind
+    sf.HEADER.pack(2, sf.FRAME_SIGHTINGS, 0, 1, 0, 0) + bytes(6) + b"\xc4\x05", #name index past the table
+    b"phone,Device(ADDR_PUBLIC", b"\xff\xfe",
+    b"phone,Device(ADDR_PUBLIC, aa:bb:cc:dd:ee:ff),300", #RSSI out of int8
+])
+def test_malformed_raises_value_error(data):
+    with pytest.raises(ValueError):
+        sf.decode_frame(data)